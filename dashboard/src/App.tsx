@@ -1,14 +1,7 @@
-import { useState, useEffect } from "react";
-import type {
-  OverviewData,
-  DataQualityData,
-  PopulationData,
-  BehaviourData,
-  RiskData,
-  TimingData,
-  MonetisationData,
-  OutreachData,
-} from "./types";
+import { useState, useEffect, useMemo, useCallback, useRef } from "react";
+import { loadPayload, type PayloadName, type Payloads } from "./data";
+import { applyCubeFilters, hasActiveFilters, type CubeFilters } from "./cube";
+import { FilterBar } from "./FilterBar";
 import { Overview } from "./views/Overview";
 import { PopulationView } from "./views/PopulationView";
 import { BehaviourView } from "./views/BehaviourView";
@@ -37,59 +30,70 @@ const TABS: { id: TabId; label: string }[] = [
   { id: "outreach", label: "Outreach" },
 ];
 
-async function loadJson<T>(path: string): Promise<T> {
-  const r = await fetch(path);
-  if (!r.ok) throw new Error(`Failed to load ${path}`);
-  return r.json() as Promise<T>;
-}
+// Payloads each tab renders; only the current tab's are fetched
+const TAB_PAYLOADS: Record<TabId, PayloadName[]> = {
+  overview: ["overview", "data_quality"],
+  population: ["population"],
+  behaviour: ["behaviour"],
+  risk: ["risk"],
+  timing: ["timing"],
+  monetisation: ["monetisation"],
+  outreach: ["outreach"],
+};
+const FILTERABLE_TABS = new Set<TabId>(["overview", "population", "behaviour", "risk", "timing"]);
+// A cube filter rewrites all of these together (applyCubeFilters)
+const FILTERED_PAYLOADS: PayloadName[] = ["overview", "population", "behaviour", "risk", "timing"];
+// Data generated before the cube existed still loads, just without filters
+const OPTIONAL_PAYLOADS = new Set<PayloadName>(["cube"]);
 
 export default function App() {
   const [tab, setTab] = useState<TabId>("overview");
-  const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
-  const [dataQuality, setDataQuality] = useState<DataQualityData | null>(null);
-  const [overview, setOverview] = useState<OverviewData | null>(null);
-  const [population, setPopulation] = useState<PopulationData | null>(null);
-  const [behaviour, setBehaviour] = useState<BehaviourData | null>(null);
-  const [risk, setRisk] = useState<RiskData | null>(null);
-  const [timing, setTiming] = useState<TimingData | null>(null);
-  const [monetisation, setMonetisation] = useState<MonetisationData | null>(null);
-  const [outreach, setOutreach] = useState<OutreachData | null>(null);
+  const [data, setData] = useState<Partial<Payloads>>({});
+  const [filters, setFilters] = useState<CubeFilters>({});
+  const requested = useRef(new Set<PayloadName>());
 
-  useEffect(() => {
-    // Use Vite base so it works on localhost (\"/\") and GitHub Pages (\"/scrub/\")
-    const base = `${import.meta.env.BASE_URL}data`;
-    Promise.all([
-      loadJson<OverviewData>(`${base}/overview.json`),
-      loadJson<DataQualityData>(`${base}/data_quality.json`),
-      loadJson<PopulationData>(`${base}/population.json`),
-      loadJson<BehaviourData>(`${base}/behaviour.json`),
-      loadJson<RiskData>(`${base}/risk.json`),
-      loadJson<TimingData>(`${base}/timing.json`),
-      loadJson<MonetisationData>(`${base}/monetisation.json`),
-      loadJson<OutreachData>(`${base}/outreach.json`),
-    ])
-      .then(([o, dq, p, b, r, t, m, u]) => {
-        setOverview(o);
-        setDataQuality(dq);
-        setPopulation(p);
-        setBehaviour(b);
-        setRisk(r);
-        setTiming(t);
-        setMonetisation(m);
-        setOutreach(u);
-      })
-      .catch((e) => setError(e instanceof Error ? e.message : "Failed to load data"))
-      .finally(() => setLoading(false));
+  const request = useCallback((names: PayloadName[]) => {
+    const load = <K extends PayloadName>(name: K) =>
+      loadPayload(name)
+        .then((payload) =>
+          setData((prev) => {
+            const next: Partial<Payloads> = { ...prev };
+            next[name] = payload;
+            return next;
+          }),
+        )
+        .catch((e) => {
+          if (!OPTIONAL_PAYLOADS.has(name)) setError(e instanceof Error ? e.message : "Failed to load data");
+        });
+    for (const name of names) {
+      if (requested.current.has(name)) continue;
+      requested.current.add(name);
+      load(name);
+    }
   }, []);
 
-  if (loading) {
-    return (
-      <div className="app-loading">
-        <p>Loading dashboard data…</p>
-      </div>
-    );
-  }
+  const filtering = FILTERABLE_TABS.has(tab) && hasActiveFilters(filters);
+  const needed = useMemo(
+    () => (filtering ? [...new Set([...TAB_PAYLOADS[tab], ...FILTERED_PAYLOADS])] : TAB_PAYLOADS[tab]),
+    [tab, filtering],
+  );
+  useEffect(() => request(needed), [needed, request]);
+
+  // The filter bar's cube is fetched once the first view is up, not before it
+  const { overview, data_quality: dataQuality, population, behaviour, risk, timing, monetisation, outreach, cube } = data;
+  const started = overview !== undefined;
+  useEffect(() => {
+    if (started) request(["cube"]);
+  }, [started, request]);
+
+  // Filtered slices are summed from the cube in the browser; no re-run needed
+  const filtered = useMemo(() => {
+    if (!cube || !hasActiveFilters(filters) || !overview || !population || !behaviour || !risk || !timing) return null;
+    return applyCubeFilters(cube, filters, { overview, population, behaviour, risk, timing });
+  }, [cube, filters, overview, population, behaviour, risk, timing]);
+
+  const loading = needed.some((name) => data[name] === undefined);
 
   if (error) {
     return (
@@ -106,6 +110,12 @@ export default function App() {
       <header className="app-header">
         <h1>Bureau Scrub – Lending Dashboard</h1>
         <p className="app-subtitle">Population, behaviour, risk, timing &amp; monetisation (RUN 1–5).</p>
+        {overview?.sampleRate != null && (
+          <p className="app-sample-note">
+            Preview from a {+(overview.sampleRate * 100).toFixed(2)}% customer sample: counts are scaled-up estimates (see sample.json for
+            confidence intervals).
+          </p>
+        )}
       </header>
 
       <nav className="tabs">
@@ -120,14 +130,26 @@ export default function App() {
         ))}
       </nav>
 
+      {cube && FILTERABLE_TABS.has(tab) && (
+        <FilterBar cube={cube} filters={filters} onChange={setFilters} />
+      )}
+
       <main className="main">
-        {tab === "overview" && <Overview data={overview} dataQuality={dataQuality} />}
-        {tab === "population" && <PopulationView data={population} />}
-        {tab === "behaviour" && <BehaviourView data={behaviour} />}
-        {tab === "risk" && <RiskView data={risk} />}
-        {tab === "timing" && <TimingView data={timing} />}
-        {tab === "monetisation" && <MonetisationView data={monetisation} />}
-        {tab === "outreach" && <OutreachView data={outreach} />}
+        {loading ? (
+          <div className="app-loading">
+            <p>Loading dashboard data…</p>
+          </div>
+        ) : (
+          <>
+            {tab === "overview" && <Overview data={filtered?.overview ?? overview ?? null} dataQuality={dataQuality ?? null} />}
+            {tab === "population" && <PopulationView data={filtered?.population ?? population ?? null} />}
+            {tab === "behaviour" && <BehaviourView data={filtered?.behaviour ?? behaviour ?? null} />}
+            {tab === "risk" && <RiskView data={filtered?.risk ?? risk ?? null} />}
+            {tab === "timing" && <TimingView data={filtered?.timing ?? timing ?? null} />}
+            {tab === "monetisation" && <MonetisationView data={monetisation ?? null} />}
+            {tab === "outreach" && <OutreachView data={outreach ?? null} />}
+          </>
+        )}
       </main>
     </div>
   );
@@ -0,0 +1,54 @@
+import type { CubeData } from "./types";
+import { hasActiveFilters, type CubeFilters } from "./cube";
+
+const DIMENSION_LABELS: Record<string, string> = {
+  lenderType: "Lender type",
+  bucket: "Bucket",
+  riskTier: "Risk tier",
+  timingFlag: "Timing flag",
+  affordabilityTier: "Affordability",
+};
+
+interface Props {
+  cube: CubeData;
+  filters: CubeFilters;
+  onChange: (filters: CubeFilters) => void;
+}
+
+export function FilterBar({ cube, filters, onChange }: Props) {
+  const toggle = (dimension: string, index: number) => {
+    const selected = filters[dimension] ?? [];
+    const next = selected.includes(index) ? selected.filter((i) => i !== index) : [...selected, index];
+    onChange({ ...filters, [dimension]: next });
+  };
+
+  return (
+    <div className="filter-bar">
+      {cube.dimensions.map(({ name, values }) => (
+        <div key={name} className="filter-group">
+          <span className="filter-label">{DIMENSION_LABELS[name] ?? name}</span>
+          {values.map((value, i) => (
+            <button
+              key={value}
+              className={`filter-chip ${(filters[name] ?? []).includes(i) ? "active" : ""}`}
+              onClick={() => toggle(name, i)}
+            >
+              {value.replace(/_/g, " ")}
+            </button>
+          ))}
+        </div>
+      ))}
+      {hasActiveFilters(filters) && (
+        <div className="filter-group">
+          <button className="filter-chip" onClick={() => onChange({})}>
+            Clear filters
+          </button>
+          <span className="filter-note">
+            Filters apply to customer counts, buckets, tiers, timing and PL curves; account-type, repayment, monetisation
+            and outreach figures stay book-wide.
+          </span>
+        </div>
+      )}
+    </div>
+  );
+}
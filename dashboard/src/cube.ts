@@ -0,0 +1,144 @@
+import type {
+  CubeData,
+  OverviewData,
+  PopulationData,
+  BehaviourData,
+  RiskData,
+  TimingData,
+} from "./types";
+
+/** Selected value indexes per cube dimension name; a missing or empty list means "all". */
+export type CubeFilters = Record<string, number[]>;
+
+export interface FilterableData {
+  overview: OverviewData;
+  population: PopulationData;
+  behaviour: BehaviourData;
+  risk: RiskData;
+  timing: TimingData;
+}
+
+interface CubeTotals {
+  measures: Record<string, number>;
+  /** customers per dimension value, by dimension name */
+  dimensions: Record<string, Record<string, number>>;
+  histograms: Record<string, number[]>;
+}
+
+export function hasActiveFilters(filters: CubeFilters): boolean {
+  return Object.values(filters).some((selected) => selected.length > 0);
+}
+
+/** Sum the cube cells that match every filter. */
+function aggregate(cube: CubeData, filters: CubeFilters): CubeTotals {
+  const nDims = cube.dimensions.length;
+  const nMeasures = cube.measures.length;
+  const allowed = cube.dimensions.map(({ name }) => {
+    const selected = filters[name];
+    return selected && selected.length > 0 ? new Set(selected) : null;
+  });
+
+  const measureSums = new Array<number>(nMeasures).fill(0);
+  const dimCounts = cube.dimensions.map(({ values }) => new Array<number>(values.length).fill(0));
+  const histSums = cube.histograms.map(({ bins }) => new Array<number>(bins).fill(0));
+
+  for (const cell of cube.cells) {
+    let match = true;
+    for (let d = 0; d < nDims; d++) {
+      const set = allowed[d];
+      if (set && !set.has(cell[d] as number)) {
+        match = false;
+        break;
+      }
+    }
+    if (!match) continue;
+    const customers = cell[nDims] as number;
+    for (let d = 0; d < nDims; d++) dimCounts[d][cell[d] as number] += customers;
+    for (let m = 0; m < nMeasures; m++) measureSums[m] += cell[nDims + m] as number;
+    for (let h = 0; h < histSums.length; h++) {
+      const sparse = cell[nDims + nMeasures + h] as number[];
+      for (let i = 0; i < sparse.length; i += 2) histSums[h][sparse[i]] += sparse[i + 1];
+    }
+  }
+
+  const measures: Record<string, number> = {};
+  cube.measures.forEach((name, m) => (measures[name] = measureSums[m]));
+  const dimensions: Record<string, Record<string, number>> = {};
+  cube.dimensions.forEach(({ name, values }, d) => {
+    dimensions[name] = {};
+    values.forEach((value, i) => (dimensions[name][value] = dimCounts[d][i]));
+  });
+  const histograms: Record<string, number[]> = {};
+  cube.histograms.forEach(({ name }, h) => (histograms[name] = histSums[h]));
+  return { measures, dimensions, histograms };
+}
+
+const pct = (part: number, whole: number) => (whole ? Math.round((10000 * part) / whole) / 100 : 0);
+
+/**
+ * Re-derive the customer-level views for the filtered slice of the book.
+ * Fields the cube does not carry (account types, repayment bands, velocity)
+ * keep their book-wide values.
+ */
+export function applyCubeFilters(cube: CubeData, filters: CubeFilters, data: FilterableData): FilterableData {
+  const { measures, dimensions, histograms } = aggregate(cube, filters);
+  const n0 = measures.customers;
+  const buckets = dimensions.bucket;
+  const timingFlags = dimensions.timingFlag;
+
+  const overview: OverviewData = {
+    ...data.overview,
+    totalCustomers: n0,
+    avgTradelinesPerCustomer: n0 ? Math.round((100 * measures.tradelines) / n0) / 100 : 0,
+    serviceableBase: Math.max(0, n0 - buckets.D - measures.thinFile),
+    plPenetrationRate: pct(measures.hasPl, n0),
+    goldenWindowCurveA: measures.goldenWindowA,
+    goldenWindowCurveB: measures.goldenWindowB,
+    customersInGoldenWindowNow: timingFlags.golden_window,
+  };
+
+  const vehicle = measures.vehicleAndPl + measures.vehicleOnly;
+  const population: PopulationData = {
+    ...data.population,
+    bucketDistribution: Object.entries(buckets).map(([bucket, customers]) => ({
+      bucket: `Bucket ${bucket}`,
+      customers,
+      pct: pct(customers, n0),
+    })),
+    lenderTypeDistribution: Object.entries(dimensions.lenderType)
+      .filter(([, customers]) => customers > 0)
+      .map(([lenderType, customers]) => ({ lenderType, customers })),
+    productMix: [
+      { mix: "vehicle_and_pl", customers: measures.vehicleAndPl },
+      { mix: "vehicle_only", customers: measures.vehicleOnly },
+      { mix: "other", customers: n0 - vehicle },
+    ],
+  };
+
+  const behaviour: BehaviourData = {
+    ...data.behaviour,
+    timeToNextPLCurveA: histograms.curveA.map((count, months) => ({ months, count })),
+    timeToNextPLCurveB: histograms.curveB.map((count, months) => ({ months, count })),
+  };
+
+  const risk: RiskData = {
+    ...data.risk,
+    riskTierDistribution: Object.entries(dimensions.riskTier).map(([tier, customers]) => ({ tier, customers })),
+    affordabilityDistribution: Object.entries(dimensions.affordabilityTier).map(([tier, customers]) => ({ tier, customers })),
+  };
+
+  const plOpens = histograms.plOpenMonth.reduce((a, b) => a + b, 0) || 1;
+  const timing: TimingData = {
+    ...data.timing,
+    timingFlagDistribution: Object.entries(timingFlags)
+      .filter(([flag]) => flag !== "none")
+      .map(([flag, customers]) => ({ flag, customers })),
+    monthsSinceCarLoan: histograms.monthsSinceCarLoan.map((customers, months) => ({ months, customers })),
+    seasonalIndex: data.timing.seasonalIndex.map((s) => ({
+      ...s,
+      index: Math.round((100 * 12 * histograms.plOpenMonth[s.month - 1]) / plOpens) / 100,
+    })),
+  };
+
+  return { overview, population, behaviour, risk, timing };
+}
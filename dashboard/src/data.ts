@@ -0,0 +1,88 @@
+import type {
+  OverviewData,
+  DataQualityData,
+  PopulationData,
+  BehaviourData,
+  RiskData,
+  TimingData,
+  MonetisationData,
+  OutreachData,
+  CubeData,
+} from "./types";
+
+/** The payloads compute_dashboard_data.py writes, by name. */
+export interface Payloads {
+  overview: OverviewData;
+  data_quality: DataQualityData;
+  population: PopulationData;
+  behaviour: BehaviourData;
+  risk: RiskData;
+  timing: TimingData;
+  monetisation: MonetisationData;
+  outreach: OutreachData;
+  cube: CubeData;
+}
+
+export type PayloadName = keyof Payloads;
+
+/** manifest.json: each payload's content-hashed file under bundle/ (see write_bundle in compute_dashboard_data.py). */
+interface Manifest {
+  version: number;
+  files: Record<string, { file: string; bytes: number }>;
+}
+
+const MANIFEST_VERSION = 1;
+const CACHE_NAME = "scrub-data";
+
+// Use Vite base so it works on localhost ("/") and GitHub Pages ("/scrub/");
+// VITE_DATA_URL points it at scripts/serve_dashboard_data.py instead (e.g. http://127.0.0.1:8765/data)
+const BASE: string = import.meta.env.VITE_DATA_URL || `${import.meta.env.BASE_URL}data`;
+
+let manifest: Promise<Manifest | null> | undefined;
+
+/** The manifest, revalidated once per page load; null without one (older data or the query server). */
+function loadManifest(): Promise<Manifest | null> {
+  manifest ??= fetch(`${BASE}/manifest.json`, { cache: "no-cache" })
+    .then((r) => (r.ok ? (r.json() as Promise<Manifest>) : null))
+    .then((m) => {
+      if (!m || m.version !== MANIFEST_VERSION) return null;
+      pruneCache(m).catch(() => undefined);
+      return m;
+    })
+    .catch(() => null);
+  return manifest;
+}
+
+function openCache(): Promise<Cache | null> {
+  // The Cache API only exists in secure contexts (https, localhost)
+  return "caches" in window ? caches.open(CACHE_NAME).catch(() => null) : Promise.resolve(null);
+}
+
+/** Drop cached bundle files the current manifest no longer lists. */
+async function pruneCache(m: Manifest): Promise<void> {
+  const cache = await openCache();
+  if (!cache) return;
+  const current = new Set(Object.values(m.files).map(({ file }) => new URL(`${BASE}/${file}`, location.href).href));
+  for (const request of await cache.keys()) {
+    if (!current.has(request.url)) await cache.delete(request);
+  }
+}
+
+/** A content-hashed file: never changes, so once cached it is never downloaded again. */
+async function fetchImmutable(url: string): Promise<Response> {
+  const cache = await openCache();
+  const hit = await cache?.match(url);
+  if (hit) return hit;
+  const r = await fetch(url);
+  if (r.ok && cache) await cache.put(url, r.clone()).catch(() => undefined);
+  return r;
+}
+
+/** One payload: its hashed bundle file when there is a manifest, `<name>.json` otherwise. */
+export async function loadPayload<K extends PayloadName>(name: K): Promise<Payloads[K]> {
+  const entry = (await loadManifest())?.files[name];
+  const url = entry ? `${BASE}/${entry.file}` : `${BASE}/${name}.json`;
+  const r = entry ? await fetchImmutable(url) : await fetch(url);
+  if (!r.ok) throw new Error(`Failed to load ${url}`);
+  return r.json() as Promise<Payloads[K]>;
+}
@@ -7,6 +7,8 @@ export interface OverviewData {
   goldenWindowCurveB: number;
   customersInGoldenWindowNow: number;
   bureauDate: string;
+  /** Set when the data was computed with --sample: counts are scaled-up estimates */
+  sampleRate?: number;
 }
 
 export interface DataQualityRow {
@@ -38,6 +40,8 @@ export interface DataQualityData {
     month37: number;
   };
   table: DataQualityRow[];
+  /** Blank / unparseable shares (%) of rows with a CUSTOMER_ID; absent in older data */
+  columnQuality?: { column: string; blankPct: number; unparseablePct: number }[];
 }
 
 export interface PopulationData {
@@ -52,11 +56,14 @@ export interface BehaviourData {
   timeToNextPLCurveB: { months: number; count: number }[];
   repaymentQualityDistribution: { bucket: string; customers: number }[];
   creditVelocity: { segment: string; customers: number }[];
+  recentRepaymentQualityDistribution?: { bucket: string; customers: number }[];
 }
 
 export interface RiskData {
   riskTierDistribution: { tier: string; customers: number }[];
   affordabilityDistribution: { tier: string; customers: number }[];
+  delinquentStreakDistribution?: { streak: string; customers: number }[];
+  worstDpdBucketDistribution?: { bucket: number; customers: number }[];
 }
 
 export interface TimingData {
@@ -105,3 +112,14 @@ export interface MonetisationData {
 export interface OutreachData {
   outreachCohortDistribution: { cohort: string; customers: number }[];
 }
+
+/** Pre-aggregated cube (cube.json) for client-side filtering; see CubeMetric in compute_dashboard_data.py. */
+export interface CubeData {
+  version: number;
+  bureauDate: string;
+  dimensions: { name: string; values: string[] }[];
+  measures: string[];
+  histograms: { name: string; bins: number }[];
+  /** [...dimension value indexes, ...measures, ...sparse histograms ([bin, count, bin, count, ...])] */
+  cells: (number | number[])[][];
+}
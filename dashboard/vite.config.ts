@@ -1,10 +1,33 @@
-import { defineConfig } from 'vite'
+import { defineConfig, type Plugin } from 'vite'
 import react from '@vitejs/plugin-react'
+import { join, sep } from 'node:path'
+
+// Reload the page when scripts/watch_dashboard_data.py (or a manual run)
+// rewrites the JSON in public/data. A refresh swaps several files, so wait
+// until they have stopped changing.
+function reloadOnData(): Plugin {
+  return {
+    name: 'scrub-reload-on-data',
+    apply: 'serve',
+    configureServer(server) {
+      const dataDir = join(server.config.publicDir, 'data') + sep
+      let timer: ReturnType<typeof setTimeout> | undefined
+      const onChange = (file: string) => {
+        if (!file.startsWith(dataDir) || !file.endsWith('.json')) return
+        clearTimeout(timer)
+        timer = setTimeout(() => server.ws.send({ type: 'full-reload' }), 300)
+      }
+      server.watcher.add(dataDir)
+      server.watcher.on('add', onChange)
+      server.watcher.on('change', onChange)
+    },
+  }
+}
 
 // https://vite.dev/config/
 // For GitHub Pages project site at https://ajey-bhai.github.io/scrub/
 // we set base to /scrub/ so assets resolve correctly.
 export default defineConfig({
-  plugins: [react()],
+  plugins: [react(), reloadOnData()],
   base: '/scrub/',
 })
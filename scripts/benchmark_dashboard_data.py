@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for compute_dashboard_data.py.
+
+    python3 scripts/benchmark_dashboard_data.py memory [--csv PATH] [--rows N]
+    python3 scripts/benchmark_dashboard_data.py ingest [--csv PATH]
+    python3 scripts/benchmark_dashboard_data.py grid [--csv PATH]
+    python3 scripts/benchmark_dashboard_data.py passes [--csv PATH]
+    python3 scripts/benchmark_dashboard_data.py resume [--csv PATH] [--interval SECONDS ...] [--repeat N]
+    python3 scripts/benchmark_dashboard_data.py scale [--rows N ...] [--workdir DIR] [-- ARGS]
+
+memory: retained and peak Python heap (tracemalloc) of the per-customer tradeline
+store, old list-of-row-dicts approach vs the array-backed TradelineStore.
+ingest: read + parse throughput, DictReader/strptime vs the column-projected path.
+grid: PAYMENT_HISTORY_GRID scoring, per-character loop vs score_payment_grid().
+passes: post-ingest finalization, one pass over the customers per metric vs the
+fused single pass of the metric registry.
+resume: ingest throughput of a plain ingest_csv() vs ingest_resumable(), which
+reads in line-aligned ranges and saves its byte offset and partial state every
+--interval seconds (0 = after every range); reports the best of --repeat runs,
+the overhead and the save count and time.
+scale: end-to-end main() on synthetic CSVs (generate_synthetic_scrub.py) of
+100k, 1M and 10M rows by default; each size runs in a fresh process with
+--profile and reports wall time, rows/sec, peak RSS and per-stage seconds.
+Generated CSVs are kept in --workdir and reused. Arguments after "--" are
+passed through to compute_dashboard_data.py (e.g. -- --workers 4).
+"""
+import argparse
+import csv
+import gc
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(__file__))
+import compute_dashboard_data as cdd  # noqa: E402
+import generate_synthetic_scrub as synth  # noqa: E402
+
+SCALE_ROWS = (100_000, 1_000_000, 10_000_000)
+
+def _mb(n):
+    return n / (1024 * 1024)
+
+def _measure(label, build):
+    gc.collect()
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    obj = build()
+    elapsed = time.perf_counter() - t0
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<24} retained {_mb(current):9.1f} MB  peak {_mb(peak):9.1f} MB  {elapsed:6.1f}s")
+    del obj
+    gc.collect()
+    return current, peak
+
+def bench_memory(csv_path, max_rows):
+    def rows():
+        with open(csv_path, "r", newline="", encoding="utf-8") as f:
+            for i, row in enumerate(csv.DictReader(f)):
+                if max_rows and i >= max_rows:
+                    break
+                yield row
+
+    def build_dicts():
+        cust_tradelines = defaultdict(list)
+        for row in rows():
+            cid = (row.get("CUSTOMER_ID") or "").strip()
+            if cid:
+                cust_tradelines[cid].append(row)
+        return cust_tradelines
+
+    def build_store():
+        store = cdd.TradelineStore()
+        for row in rows():
+            cid = (row.get("CUSTOMER_ID") or "").strip()
+            if cid:
+                store.add(
+                    cid,
+                    (row.get("ACCT_TYPE_CD") or "").strip(),
+                    cdd.parse_dt_ddmmyyyy(row.get("OPEN_DT")),
+                    int(cdd.safe_float(row.get("DAYS_PAST_DUE"), 0)),
+                )
+        return store
+
+    old, _ = _measure("list-of-row-dicts", build_dicts)
+    new, _ = _measure("TradelineStore", build_store)
+    if new:
+        print(f"retained memory reduction: {old / new:.1f}x")
+
+def bench_ingest(csv_path):
+    def dict_reader():
+        n = 0
+        with open(csv_path, "r", newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                cdd.parse_dt_ddmmyyyy(row.get("OPEN_DT"))
+                cdd.parse_dt_yyyymmdd(row.get("BUREAU_DATE"))
+                cdd.parse_dt_ddmmyyyy(row.get("CLOSED_DT"))
+                int(cdd.safe_float(row.get("DAYS_PAST_DUE"), 0))
+                cdd.safe_float(row.get("CHARGE_OFF_AM"), 0)
+                cdd.safe_float(row.get("ORIG_LOAN_AM"))
+                cdd.safe_float(row.get("CREDIT_LIMIT_AM"))
+                n += 1
+        return n
+
+    def projected():
+        n = 0
+        with open(csv_path, "r", newline="", encoding="utf-8") as f:
+            for row in cdd.iter_projected_rows(f):
+                cdd.parse_open_dt_cached(row[1])
+                cdd.parse_bureau_dt_cached(row[2])
+                cdd.parse_open_dt_cached(row[8])
+                cdd.parse_dpd_cached(row[5])
+                for v in (row[6], row[9], row[10]):
+                    try:
+                        float(v)
+                    except ValueError:
+                        pass
+                n += 1
+        return n
+
+    for label, fn in (("DictReader + strptime", dict_reader), ("projected + cached", projected)):
+        t0 = time.perf_counter()
+        n = fn()
+        elapsed = time.perf_counter() - t0
+        print(f"{label:<24} {n} rows  {elapsed:6.2f}s  {n / elapsed if elapsed else 0:,.0f} rows/s")
+
+def bench_grid(csv_path):
+    with open(csv_path, "r", newline="", encoding="utf-8") as f:
+        grids = [row[0].strip() for row in cdd.iter_projected_rows(f, columns=("PAYMENT_HISTORY_GRID",))]
+
+    def char_loop():
+        for grid in grids:
+            total = 0
+            on_time = 0
+            for c in grid:
+                if c == "?":
+                    continue
+                total += 1
+                if c == "0":
+                    on_time += 1
+
+    def scorer():
+        cdd.score_payment_grid.cache_clear()
+        for grid in grids:
+            if grid:
+                cdd.score_payment_grid(grid)
+
+    for label, fn in (("per-character loop", char_loop), ("score_payment_grid", scorer)):
+        t0 = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - t0
+        print(f"{label:<24} {len(grids)} grids  {elapsed:6.2f}s")
+    info = cdd.score_payment_grid.cache_info()
+    print(f"grid cache hit rate: {info.hits / max(1, info.hits + info.misses):.0%}")
+
+def bench_passes(csv_path):
+    state = cdd.ingest_csv(csv_path)
+    ctx = cdd.FinalizeContext(state.bureau_date or cdd.datetime.now().date())
+    timing_engine = cdd.TimingEngine(state.tradelines)
+    n = len(state.tradelines)
+
+    def views():
+        return cdd.iter_customer_views(state, timing_engine, ctx.bureau_ord)
+
+    def separate():
+        for cls in cdd.METRICS:
+            cdd.run_metrics(views(), [cls(ctx)])
+
+    def fused():
+        cdd.run_metrics(views(), [cls(ctx) for cls in cdd.METRICS])
+
+    for label, passes, fn in (("pass per metric", len(cdd.METRICS), separate), ("fused registry", 1, fused)):
+        t0 = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - t0
+        print(f"{label:<24} {passes:2d} passes x {n} customers  {elapsed:6.2f}s")
+
+def bench_resume(csv_path, intervals, repeat):
+    def plain():
+        return cdd.ingest_csv(csv_path)
+
+    base = None
+    saves = []
+    save_resume_point = cdd.save_resume_point
+
+    def counted_save(*args):
+        t0 = time.perf_counter()
+        save_resume_point(*args)
+        saves.append(time.perf_counter() - t0)
+
+    cdd.save_resume_point = counted_save
+    with tempfile.TemporaryDirectory() as tmp:
+        resume_path = os.path.join(tmp, "resume.pkl")
+        runs = [("ingest_csv", plain)] + [
+            (f"resumable every {interval:g}s", lambda interval=interval: cdd.ingest_resumable(csv_path, resume_path, interval)[0])
+            for interval in intervals
+        ]
+        try:
+            for label, fn in runs:
+                elapsed = None
+                for _ in range(repeat):
+                    saves.clear()
+                    if os.path.exists(resume_path):
+                        os.remove(resume_path)
+                    for cached in (cdd.parse_open_dt_cached, cdd.parse_bureau_dt_cached, cdd.parse_dpd_checked, cdd.score_payment_grid):
+                        cached.cache_clear()
+                    gc.collect()
+                    t0 = time.perf_counter()
+                    state = fn()
+                    run = time.perf_counter() - t0
+                    elapsed = run if elapsed is None else min(elapsed, run)
+                rows = state.ingest_counts["rows"]
+                base = base or elapsed
+                size = f"  file {_mb(os.path.getsize(resume_path)):.1f} MB" if saves else ""
+                print(
+                    f"{label:<24} {rows} rows  {elapsed:6.2f}s  {rows / elapsed if elapsed else 0:,.0f} rows/s  "
+                    f"overhead {100 * (elapsed / base - 1):+5.1f}%  {len(saves)} saves {sum(saves):5.2f}s "
+                    f"({100 * sum(saves) / elapsed:.1f}% of the run){size}"
+                )
+                del state
+        finally:
+            cdd.save_resume_point = save_resume_point
+
+def bench_scale(sizes, workdir, seed, extra_args, json_path=None):
+    os.makedirs(workdir, exist_ok=True)
+    results = []
+    for rows in sizes:
+        csv_path = os.path.join(workdir, f"synthetic_{rows}_s{seed}.csv")
+        if not os.path.exists(csv_path):
+            t0 = time.perf_counter()
+            tmp = f"{csv_path}.tmp"
+            synth.write_csv(tmp, rows=rows, seed=seed)
+            os.replace(tmp, csv_path)
+            print(f"generated {csv_path} in {time.perf_counter() - t0:.1f}s")
+        with tempfile.TemporaryDirectory(dir=workdir) as out_dir:
+            stats_path = os.path.join(out_dir, "run_stats.json")
+            cmd = [
+                sys.executable,
+                os.path.join(os.path.dirname(os.path.abspath(__file__)), "compute_dashboard_data.py"),
+                "--input",
+                csv_path,
+                "--out-dir",
+                out_dir,
+                "--profile",
+                stats_path,
+                *extra_args,
+            ]
+            t0 = time.perf_counter()
+            subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL)
+            elapsed = time.perf_counter() - t0
+            with open(stats_path) as f:
+                stats = json.load(f)
+        rss = [v for v in (stats["peakRssMb"], stats["peakChildRssMb"]) if v is not None]
+        peak = max(rss) if rss else None
+        stages = {s["stage"]: s["seconds"] for s in stats["stages"]}
+        results.append({"rows": rows, "seconds": round(elapsed, 2), "peakRssMb": peak, "stages": stages, "counters": stats["counters"]})
+        stage_str = "  ".join(f"{name} {sec:.2f}s" for name, sec in stages.items())
+        peak_str = f"{peak:8.1f} MB" if peak is not None else "       ? MB"
+        print(f"{rows:>11,} rows  {elapsed:8.2f}s  {rows / elapsed:10,.0f} rows/s  peak RSS {peak_str}  |  {stage_str}")
+    for prev, cur in zip(results, results[1:]):
+        print(
+            f"{prev['rows']:,} -> {cur['rows']:,} rows: time x{cur['seconds'] / prev['seconds']:.1f}"
+            + (f", peak RSS x{cur['peakRssMb'] / prev['peakRssMb']:.1f}" if cur["peakRssMb"] and prev["peakRssMb"] else "")
+        )
+    if json_path:
+        with open(json_path, "w") as f:
+            json.dump({"seed": seed, "args": extra_args, "runs": results}, f, indent=2)
+        print("Wrote", json_path)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="bench", required=True)
+    p_mem = sub.add_parser("memory", help="tradeline store memory footprint")
+    p_mem.add_argument("--csv", default=cdd.CSV_PATH, help="input CSV (default: AR_sample.csv)")
+    p_mem.add_argument("--rows", type=int, default=0, help="limit rows read (0 = all)")
+    p_ingest = sub.add_parser("ingest", help="CSV read + parse throughput")
+    p_ingest.add_argument("--csv", default=cdd.CSV_PATH, help="input CSV (default: AR_sample.csv)")
+    p_grid = sub.add_parser("grid", help="PAYMENT_HISTORY_GRID scoring cost")
+    p_grid.add_argument("--csv", default=cdd.CSV_PATH, help="input CSV (default: AR_sample.csv)")
+    p_passes = sub.add_parser("passes", help="finalization passes over the customers")
+    p_passes.add_argument("--csv", default=cdd.CSV_PATH, help="input CSV (default: AR_sample.csv)")
+    p_resume = sub.add_parser("resume", help="resumable ingest checkpoint overhead")
+    p_resume.add_argument("--csv", default=cdd.CSV_PATH, help="input CSV (default: AR_sample.csv)")
+    p_resume.add_argument(
+        "--interval",
+        type=float,
+        nargs="+",
+        default=[cdd.RESUME_INTERVAL, 1.0, 0.0],
+        help=f"seconds between saves to compare (default: {cdd.RESUME_INTERVAL:g} 1 0)",
+    )
+    p_resume.add_argument("--repeat", type=int, default=3, help="runs per setting, best time kept (default: 3)")
+    p_scale = sub.add_parser("scale", help="end-to-end main() on synthetic CSVs of growing size")
+    p_scale.add_argument("--rows", type=int, nargs="+", default=list(SCALE_ROWS), help="CSV sizes in rows (default: 100k 1M 10M)")
+    p_scale.add_argument("--workdir", default=os.path.join(tempfile.gettempdir(), "scrub-bench"), help="where generated CSVs are kept")
+    p_scale.add_argument("--seed", type=int, default=7, help="generator seed (default: 7)")
+    p_scale.add_argument("--json", metavar="PATH", help="also write the results as JSON (for tracking regressions)")
+    argv = sys.argv[1:] if argv is None else list(argv)
+    extra_args = []
+    if "--" in argv:
+        extra_args = argv[argv.index("--") + 1 :]
+        argv = argv[: argv.index("--")]
+    args = parser.parse_args(argv)
+
+    if args.bench == "memory":
+        bench_memory(args.csv, args.rows)
+    elif args.bench == "ingest":
+        bench_ingest(args.csv)
+    elif args.bench == "grid":
+        bench_grid(args.csv)
+    elif args.bench == "passes":
+        bench_passes(args.csv)
+    elif args.bench == "resume":
+        bench_resume(args.csv, args.interval, args.repeat)
+    elif args.bench == "scale":
+        bench_scale(args.rows, args.workdir, args.seed, extra_args, args.json)
+
+if __name__ == "__main__":
+    main()
@@ -8,12 +8,44 @@ Product mapping follows the latest skill spec:
 - Personal loan (PL)   = ACCT_TYPE_CD 191
 - Credit card          = ACCT_TYPE_CD 123
 """
+import argparse
 import csv
+import glob
+import gzip
+import hashlib
+import heapq
+import io
 import json
+import math
+import mmap
 import os
+import pickle
+import queue
+import sqlite3
+import struct
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from array import array
 from collections import defaultdict
-from datetime import datetime
-from math import floor
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack, contextmanager
+from datetime import date, datetime
+from functools import lru_cache, partial
+from itertools import accumulate, compress, groupby, islice
+from operator import itemgetter, ne
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+try:
+    import brotli
+except ImportError:  # optional: the bundle is precompressed with gzip only
+    brotli = None
 
 CSV_PATH = os.path.join(os.path.dirname(__file__), "..", "AR_sample.csv")
 OUT_DIR = os.path.join(os.path.dirname(__file__), "..", "dashboard", "public", "data")
@@ -22,6 +54,22 @@ OUT_DIR = os.path.join(os.path.dirname(__file__), "..", "dashboard", "public", "
 PL_CODES = {"191"}
 VEHICLE_CODES = {"241", "242"}
 
+# Columns the RUNs read; everything else in the scrub is skipped at ingest.
+INGEST_COLUMNS = (
+    "CUSTOMER_ID",
+    "OPEN_DT",
+    "BUREAU_DATE",
+    "ACCT_TYPE_CD",
+    "M_SUB_ID",
+    "DAYS_PAST_DUE",
+    "CHARGE_OFF_AM",
+    "WRITE_OFF_STATUS_DT",
+    "CLOSED_DT",
+    "ORIG_LOAN_AM",
+    "CREDIT_LIMIT_AM",
+    "PAYMENT_HISTORY_GRID",
+)
+
 def parse_dt_ddmmyyyy(s):
     s = (s or "").strip()
     if not s:
@@ -47,321 +95,3070 @@ def safe_float(v, default=0.0):
     except Exception:
         return default
 
-def main():
-    os.makedirs(OUT_DIR, exist_ok=True)
-
-    # Per-customer aggregates (we'll fill these in one pass)
-    cust_tradelines = defaultdict(list)  # list of dicts per row
-    cust_has_pl = set()
-    cust_has_vehicle = set()
-    cust_vehicle_open_dts = defaultdict(list)  # all vehicle OPEN_DT per customer
-    cust_pl_open_dts = defaultdict(list)
-    cust_first_tradeline_dt = {}  # min OPEN_DT across all accounts
-    cust_acct_types = defaultdict(set)
-    cust_m_sub_ids = defaultdict(set)
-    cust_max_dpd = defaultdict(int)
-    cust_has_charge_off = set()
-    cust_has_write_off = set()
-    cust_closed_dt = defaultdict(list)
-    cust_repayment_quality = {}  # customer_id -> (on_time_count, total_count)
-    cust_max_credit = defaultdict(float)  # max(ORIG_LOAN_AM, CREDIT_LIMIT_AM)
-    cust_open_last_12m = defaultdict(int)  # count of tradelines opened in last 12m from bureau
-    cust_bucket = {}  # will be filled after we see full customer behaviour
-    bureau_date_global = None
-
-    with open(CSV_PATH, "r", newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            cid = (row.get("CUSTOMER_ID") or "").strip()
-            if not cid:
-                continue
+# Dates and DPD values repeat heavily across tradelines, so the ingest path
+# parses each distinct string once.
+parse_open_dt_cached = lru_cache(maxsize=1 << 16)(parse_dt_ddmmyyyy)
+parse_bureau_dt_cached = lru_cache(maxsize=1 << 10)(parse_dt_yyyymmdd)
 
-            open_dt = parse_dt_ddmmyyyy(row.get("OPEN_DT"))
-            bureau_dt = parse_dt_yyyymmdd(row.get("BUREAU_DATE"))
-            if bureau_dt:
-                bureau_date_global = bureau_dt
+@lru_cache(maxsize=1 << 12)
+def parse_dpd_cached(s):
+    return int(safe_float(s, 0))
 
-            acct_type = (row.get("ACCT_TYPE_CD") or "").strip()
-            m_sub = (row.get("M_SUB_ID") or "").strip() or "Unknown"
-            cust_acct_types[cid].add(acct_type)
-            cust_m_sub_ids[cid].add(m_sub)
+DPD_OK, DPD_BLANK, DPD_UNPARSEABLE = 0, 1, 2
 
-            dpd = int(safe_float(row.get("DAYS_PAST_DUE"), 0))
-            cust_max_dpd[cid] = max(cust_max_dpd[cid], dpd)
-            if safe_float(row.get("CHARGE_OFF_AM"), 0) > 0:
-                cust_has_charge_off.add(cid)
-            if (row.get("WRITE_OFF_STATUS_DT") or "").strip():
-                cust_has_write_off.add(cid)
+@lru_cache(maxsize=1 << 12)
+def parse_dpd_checked(s):
+    """(DAYS_PAST_DUE as int, DPD_OK / DPD_BLANK / DPD_UNPARSEABLE); blank and unparseable read as 0."""
+    s = s.strip()
+    if not s:
+        return 0, DPD_BLANK
+    try:
+        return int(float(s)), DPD_OK
+    except (ValueError, OverflowError):
+        return 0, DPD_UNPARSEABLE
+
+def iter_projected_rows(f, columns=INGEST_COLUMNS, header=None):
+    """
+    Yield one tuple per CSV row holding only `columns`, in that order.
+
+    Column positions are resolved once from the header (read from `f` unless
+    given); columns missing from the header read as "" (same as DictReader's
+    None after `or ""`).
+    """
+    reader = csv.reader(f)
+    if header is None:
+        header = next(reader, None)
+    if header is None:
+        return
+    positions = {name.strip(): i for i, name in enumerate(header)}
+    width = len(header)
+    idx = [positions.get(c, width) for c in columns]
+    need = max(idx) + 1
+    pad = [""] * need
+    get = itemgetter(*idx) if len(idx) > 1 else (lambda row, i=idx[0]: (row[i],))
+    for row in reader:
+        if len(row) < need:
+            row = row + pad[len(row):]
+        yield get(row)
+
+RECENT_GRID_MONTHS = 12  # PAYMENT_HISTORY_GRID lists the most recent month first
+NO_GRID_SCORE = (0, 0, 0, 0, 0, 0)
+_ON_TIME_OR_UNKNOWN = bytes.maketrans(b"0?", b"\0\0")
+_NOT_DPD_DIGIT = bytes(c for c in range(256) if not 0x31 <= c <= 0x39)
+
+@lru_cache(maxsize=1 << 16)
+def score_payment_grid(grid):
+    """
+    Score a PAYMENT_HISTORY_GRID with bulk string ops (count/translate/split).
+
+    '0' is an on-time month, '?' an unreported month (skipped) and anything else
+    a delinquent month; a digit 1-9 is its DPD bucket. Returns
+    (on_time, total, recent_on_time, recent_total, longest_delinquent_streak,
+    worst_dpd_bucket) where "recent" is the first RECENT_GRID_MONTHS months.
+    Grids repeat a lot (all-zero histories especially), hence the cache.
+    """
+    on_time = grid.count("0")
+    total = len(grid) - grid.count("?")
+    recent = grid[:RECENT_GRID_MONTHS]
+    recent_on_time = recent.count("0")
+    recent_total = len(recent) - recent.count("?")
+    if on_time == total:
+        return (on_time, total, recent_on_time, recent_total, 0, 0)
+    b = grid.encode("utf-8")
+    streak = max(map(len, b.translate(_ON_TIME_OR_UNKNOWN).split(b"\0")))
+    digits = b.translate(None, _NOT_DPD_DIGIT)
+    return (on_time, total, recent_on_time, recent_total, streak, max(digits) - 0x30 if digits else 0)
+
+# Per-row data-quality counters of new_ingest_counts() that can be traced to a customer
+ROW_ISSUES = (
+    "blankOpenDt",
+    "unparseableOpenDt",
+    "unparseableClosedDt",
+    "blankBureauDate",
+    "unparseableBureauDate",
+    "blankDaysPastDue",
+    "unparseableDaysPastDue",
+)
+
+def new_ingest_counts():
+    return {
+        "rows": 0,
+        "emptyCustomerId": 0,
+        "blankOpenDt": 0,
+        "unparseableOpenDt": 0,
+        "unparseableClosedDt": 0,
+        "blankBureauDate": 0,
+        "unparseableBureauDate": 0,
+        "blankDaysPastDue": 0,
+        "unparseableDaysPastDue": 0,
+    }
 
-            closed_dt = parse_dt_ddmmyyyy(row.get("CLOSED_DT"))
-            if closed_dt:
-                cust_closed_dt[cid].append(closed_dt)
+def iter_tradelines(rows, counts=None, gate=None, issues=None):
+    """
+    Parse projected rows (see iter_projected_rows) into typed tradeline tuples:
+
+        (cid, open_dt, bureau_dt, acct_type, m_sub, dpd, charge_off_am,
+         write_off, closed_dt, orig_loan_am, credit_limit_am, grid_score)
+
+    grid_score is score_payment_grid()'s tuple (NO_GRID_SCORE for an empty grid).
+
+    Rows without a CUSTOMER_ID are dropped. When `counts` (see new_ingest_counts)
+    is given, rows read, empty CUSTOMER_IDs and blank or unparseable dates and
+    DPDs are added to it once the rows are exhausted. A QualityGate `gate` is
+    handed the running counts every time the row count reaches its next_check.
+    With an `issues` dict, the same blank / unparseable counts are also kept
+    per CUSTOMER_ID, as lists in ROW_ISSUES order, for customers that have any
+    (see CustomerState.row_issues).
+    """
+    n_rows = n_empty = blank_open = bad_open = bad_closed = blank_bureau = bad_bureau = blank_dpd = bad_dpd = 0
+
+    def tally(rows):
+        """The counters so far as a new_ingest_counts() dict, with `rows` rows read."""
+        return {
+            "rows": rows,
+            "emptyCustomerId": n_empty,
+            "blankOpenDt": blank_open,
+            "unparseableOpenDt": bad_open,
+            "unparseableClosedDt": bad_closed,
+            "blankBureauDate": blank_bureau,
+            "unparseableBureauDate": bad_bureau,
+            "blankDaysPastDue": blank_dpd,
+            "unparseableDaysPastDue": bad_dpd,
+        }
+
+    def note(cid, i):
+        entry = issues.get(cid)
+        if entry is None:
+            entry = issues[cid] = [0] * len(ROW_ISSUES)
+        entry[i] += 1
+
+    # The gate runs as row next_check + 1 comes in, i.e. on the counts of next_check rows
+    next_check = gate.next_check + 1 if gate else -1
+    for (
+        cid,
+        open_s,
+        bureau_s,
+        acct_type,
+        m_sub,
+        dpd_s,
+        charge_off_s,
+        write_off_s,
+        closed_s,
+        orig_s,
+        limit_s,
+        grid,
+    ) in rows:
+        n_rows += 1
+        if n_rows == next_check:
+            running = dict(counts or new_ingest_counts())
+            for k, v in tally(n_rows - 1).items():
+                running[k] += v
+            next_check = gate.check(running, parse_bureau_dt_cached(bureau_s)) + 1
+        cid = cid.strip()
+        if not cid:
+            n_empty += 1
+            continue
+        open_dt = parse_open_dt_cached(open_s)
+        if open_dt is None:
+            if open_s and open_s.strip():
+                bad_open += 1
+                if issues is not None:
+                    note(cid, 1)
+            else:
+                blank_open += 1
+                if issues is not None:
+                    note(cid, 0)
+        bureau_dt = parse_bureau_dt_cached(bureau_s)
+        if bureau_dt is None:
+            if bureau_s and bureau_s.strip():
+                bad_bureau += 1
+                if issues is not None:
+                    note(cid, 4)
+            else:
+                blank_bureau += 1
+                if issues is not None:
+                    note(cid, 3)
+        closed_dt = parse_open_dt_cached(closed_s)
+        if closed_dt is None and closed_s and closed_s.strip():
+            bad_closed += 1
+            if issues is not None:
+                note(cid, 2)
+        dpd, dpd_status = parse_dpd_checked(dpd_s)
+        if dpd_status:
+            if dpd_status == DPD_BLANK:
+                blank_dpd += 1
+                if issues is not None:
+                    note(cid, 5)
+            else:
+                bad_dpd += 1
+                if issues is not None:
+                    note(cid, 6)
+        try:
+            charge_off = float(charge_off_s)
+        except ValueError:
+            charge_off = 0.0
+        try:
+            orig = float(orig_s)
+        except ValueError:
+            orig = 0.0
+        try:
+            limit = float(limit_s)
+        except ValueError:
+            limit = 0.0
+        # Repayment quality from PAYMENT_HISTORY_GRID
+        grid = grid.strip()
+        grid_score = score_payment_grid(grid) if grid else NO_GRID_SCORE
+        yield (
+            cid,
+            open_dt,
+            bureau_dt,
+            acct_type.strip(),
+            m_sub.strip() or "Unknown",
+            dpd,
+            charge_off,
+            bool(write_off_s.strip()),
+            closed_dt,
+            orig,
+            limit,
+            grid_score,
+        )
+    if counts is not None:
+        for k, v in tally(n_rows).items():
+            counts[k] += v
+
+@lru_cache(maxsize=1 << 16)
+def _customer_hash(cid):
+    return int.from_bytes(hashlib.blake2b(cid.encode("utf-8"), digest_size=8).digest(), "big")
+
+def sample_rows(rows, rate):
+    """
+    Keep the projected rows (see iter_projected_rows) of a `rate` share of
+    customers, chosen by a hash of CUSTOMER_ID: all tradelines of a kept
+    customer are kept, and the same customers are kept on every run and in every
+    worker. Rows without a CUSTOMER_ID pass through so iter_tradelines counts them.
+    """
+    threshold = int(rate * (1 << 64))
+    for row in rows:
+        cid = row[0].strip()
+        if not cid or _customer_hash(cid) < threshold:
+            yield row
+
+class TradelineStore:
+    """
+    Compact, array-backed tradeline store.
+
+    Customers get a dense integer index in first-seen order. Each tradeline keeps
+    only the typed fields the RUNs read (customer index, account type code,
+    OPEN_DT as a day ordinal, DAYS_PAST_DUE) instead of the full CSV row.
+    """
+
+    def __init__(self):
+        self.index = {}  # CUSTOMER_ID -> dense customer index
+        self.cids = []  # dense customer index -> CUSTOMER_ID
+        self.counts = array("I")  # tradelines per customer
+        self.acct_codes = {}  # ACCT_TYPE_CD -> small int code
+        self.acct_names = []  # small int code -> ACCT_TYPE_CD
+        # Per-tradeline columns
+        self.cust = array("I")
+        self.acct_type = array("H")
+        self.open_ord = array("i")  # 0 = missing OPEN_DT
+        self.dpd = array("q")
+
+    def __len__(self):
+        return len(self.cids)
+
+    def __iter__(self):
+        return iter(self.cids)
+
+    def __contains__(self, cid):
+        return cid in self.index
+
+    def customer(self, cid):
+        """Dense index of `cid`, assigned on first sight."""
+        idx = self.index.get(cid)
+        if idx is None:
+            idx = self.index[cid] = len(self.cids)
+            self.cids.append(cid)
+            self.counts.append(0)
+        return idx
+
+    def acct_code(self, acct_type):
+        """Small int code of an ACCT_TYPE_CD, assigned on first sight."""
+        code = self.acct_codes.get(acct_type)
+        if code is None:
+            code = self.acct_codes[acct_type] = len(self.acct_names)
+            self.acct_names.append(acct_type)
+        return code
+
+    def add(self, cid, acct_type, open_dt, dpd):
+        idx = self.customer(cid)
+        self.counts[idx] += 1
+        self.cust.append(idx)
+        self.acct_type.append(self.acct_code(acct_type))
+        self.open_ord.append(open_dt.toordinal() if open_dt else 0)
+        self.dpd.append(dpd)
+        return idx
+
+    def count(self, cid):
+        return self.counts[self.index[cid]]
+
+    @property
+    def n_tradelines(self):
+        return len(self.cust)
+
+    def merge(self, other):
+        """
+        Append `other`'s tradelines, remapping its customer and account type
+        codes. Returns the array mapping other's customer indexes to ours.
+        """
+        cust_map = array("I", map(self.customer, other.cids))
+        for idx, n in zip(cust_map, other.counts):
+            self.counts[idx] += n
+        acct_map = [self.acct_code(name) for name in other.acct_names]
+        self.cust.extend(cust_map[i] for i in other.cust)
+        self.acct_type.extend(acct_map[c] for c in other.acct_type)
+        self.open_ord.extend(other.open_ord)
+        self.dpd.extend(other.dpd)
+        return cust_map
+
+    def acct_masks(self):
+        """Per-customer bitmask of the account types held (bit i = acct_names[i])."""
+        masks = [0] * len(self.cids)
+        for c, a in zip(self.cust, self.acct_type):
+            masks[c] |= 1 << a
+        return masks
+
+    def clear(self):
+        """Drop every customer and tradeline, keeping the account type codes."""
+        self.index.clear()
+        del self.cids[:]
+        del self.counts[:]
+        del self.cust[:]
+        del self.acct_type[:]
+        del self.open_ord[:]
+        del self.dpd[:]
+
+    def group(self):
+        """
+        Reorder the tradelines by customer index (stable), so each customer's
+        are one slice starting at the sum of the counts before it. A no-op if
+        they already are; saved checkpoints are kept grouped for upsert().
+        """
+        if _is_grouped(self):
+            return
+        order = sorted(range(len(self.cust)), key=self.cust.__getitem__)
+        for name in ("cust", "acct_type", "open_ord", "dpd"):
+            col = getattr(self, name)
+            setattr(self, name, array(col.typecode, map(col.__getitem__, order)))
+
+    def upsert(self, other):
+        """
+        Replace the tradelines of every customer in `other` with other's and
+        append its new customers, keeping both stores grouped. Kept tradelines
+        are copied in slices between the replaced customers' ranges, so the
+        Python work scales with `other`. Returns the array mapping other's
+        customer indexes to ours, as merge() does.
+        """
+        self.group()
+        other.group()
+        starts = list(accumulate(self.counts, initial=0))
+        other_starts = list(accumulate(other.counts, initial=0))
+        n_old = len(self.cids)
+        cust_map = array("I", map(self.customer, other.cids))
+        acct_map = [self.acct_code(name) for name in other.acct_names]
+        # Slices (ours, start, end) of the new columns: the book with each replaced
+        # customer's range swapped for other's, then the new customers in index order
+        slices = []
+        prev = 0
+        for idx, i in sorted((idx, i) for i, idx in enumerate(cust_map) if idx < n_old):
+            slices += ((True, prev, starts[idx]), (False, other_starts[i], other_starts[i + 1]))
+            prev = starts[idx + 1]
+        slices.append((True, prev, starts[n_old]))
+        slices += ((False, other_starts[i], other_starts[i + 1]) for i, idx in enumerate(cust_map) if idx >= n_old)
+        for name, remap in (("cust", cust_map), ("acct_type", acct_map), ("open_ord", None), ("dpd", None)):
+            col = getattr(self, name)
+            other_col = getattr(other, name)
+            if remap is not None:
+                other_col = array(col.typecode, map(remap.__getitem__, other_col))
+            new_col = array(col.typecode)
+            for ours, start, end in slices:
+                new_col += (col if ours else other_col)[start:end]
+            setattr(self, name, new_col)
+        for idx, n in zip(cust_map, other.counts):
+            self.counts[idx] = n
+        return cust_map
+
+class TimingEngine:
+    """
+    Vehicle-anchor / PL timing for every customer, computed in two linear passes
+    over the TradelineStore's flat columns (no per-customer date lists or sorts).
+
+    Per customer index:
+    - anchor_ord: OPEN_DT ordinal of the most recent vehicle loan (0 = no dated vehicle)
+    - first_pl_ord: earliest PL opened >= 1 month (30 days) after the anchor (0 = none)
+    - pl_flags: HAS_PL (a dated PL exists), PRE_EXISTING_PL (a PL opened before
+      anchor + 30 days), MONTH0_PL (a PL opened within 30 days from the anchor)
+    """
+
+    HAS_PL = 1
+    PRE_EXISTING_PL = 2
+    MONTH0_PL = 4
+
+    @staticmethod
+    def acct_kinds(acct_names):
+        """(is_vehicle, is_pl) bytes indexed by account type code."""
+        return bytes(name in VEHICLE_CODES for name in acct_names), bytes(name in PL_CODES for name in acct_names)
+
+    def __init__(self, tradelines, kinds=None):
+        """`kinds` is acct_kinds(tradelines.acct_names), when the caller keeps it."""
+        n = len(tradelines)
+        is_vehicle, is_pl = kinds or self.acct_kinds(tradelines.acct_names)
+        cust = tradelines.cust
+        open_ord = tradelines.open_ord
+
+        anchor_ord = array("i", bytes(4 * n))
+        for c, o in compress(zip(cust, open_ord), map(is_vehicle.__getitem__, tradelines.acct_type)):
+            if o > anchor_ord[c]:
+                anchor_ord[c] = o
+
+        first_pl_ord = array("i", bytes(4 * n))
+        pl_flags = bytearray(n)
+        for c, o in compress(zip(cust, open_ord), map(is_pl.__getitem__, tradelines.acct_type)):
+            anchor = anchor_ord[c]
+            if not o or not anchor:
+                continue
+            delta_days = o - anchor
+            if delta_days < 30:
+                pl_flags[c] |= 3 if delta_days < 0 else 7  # HAS_PL | PRE_EXISTING_PL [| MONTH0_PL]
+            else:
+                pl_flags[c] |= 1
+                if not first_pl_ord[c] or o < first_pl_ord[c]:
+                    first_pl_ord[c] = o
+
+        self.anchor_ord = anchor_ord
+        self.first_pl_ord = first_pl_ord
+        self.pl_flags = pl_flags
+        self.vehicle_customers = [i for i, o in enumerate(anchor_ord) if o]
+
+class CustomerState:
+    """
+    Per-customer partial aggregates over a set of tradelines.
+
+    Everything here is mergeable: two states built from disjoint slices of the
+    scrub combine with merge() into the state of the concatenated slices, so
+    ingest can be sharded and RUN 1-5 finalize on the merged result.
+
+    Aggregates are typed arrays (CUSTOMER_COLUMNS) indexed by the
+    TradelineStore's dense customer index, so a CUSTOMER_ID string is hashed
+    once per row and stored once. Yes/no facts share one byte of bit flags,
+    including which of NBF / PVT / PUB appear among the customer's M_SUB_IDs.
+    """
+
+    HAS_PL = 1
+    HAS_VEHICLE = 2
+    CHARGE_OFF = 4
+    WRITE_OFF = 8
+    HAS_CLOSED = 16
+    NBF = 32
+    PVT = 64
+    PUB = 128
+    LENDER_SHIFT = 5  # flags >> LENDER_SHIFT = NBF | PVT | PUB bits, see LENDER_TYPES
+
+    def __init__(self):
+        self.tradelines = TradelineStore()
+        for name, typecode in CUSTOMER_COLUMNS:
+            setattr(self, name, array(typecode))
+        self.bureau_date = None  # last BUREAU_DATE seen
+        self.ingest_counts = new_ingest_counts()
+        # CUSTOMER_ID -> its rows' blank / unparseable counts (ROW_ISSUES order), only for customers
+        # with any; lets apply_delta take a replaced customer's rows out of ingest_counts
+        self.row_issues = {}
+
+    def _columns(self):
+        return [getattr(self, name) for name, _ in CUSTOMER_COLUMNS]
+
+    def clear(self):
+        """Empty the state for reuse, keeping its arrays and account type codes."""
+        self.tradelines.clear()
+        for col in self._columns():
+            del col[:]
+
+    def _grow(self):
+        """Extend the aggregate columns with zeros up to the number of customers."""
+        n = len(self.tradelines) - len(self.flags)
+        if n > 0:
+            for col in self._columns():
+                col.frombytes(bytes(n * col.itemsize))
+
+    def ingest(self, rows):
+        """Fold typed tradeline tuples (see iter_tradelines) into the aggregates."""
+        tradelines = self.tradelines
+        index = tradelines.index
+        counts = tradelines.counts
+        tl_cust = tradelines.cust.append
+        tl_acct_type = tradelines.acct_type.append
+        tl_open_ord = tradelines.open_ord.append
+        tl_dpd = tradelines.dpd.append
+        columns = self._columns()
+        new_customer = [col.append for col in columns]
+        (
+            flags,
+            first_open_ord,
+            max_dpd,
+            max_credit,
+            open_last_12m,
+            rq_on_time,
+            rq_total,
+            recent_on_time,
+            recent_total,
+            delinquent_streak,
+            worst_dpd_bucket,
+        ) = columns
+        lender_flags = LENDER_FLAGS
+        has_pl, has_vehicle = self.HAS_PL, self.HAS_VEHICLE
+        charge_off_flag, write_off_flag, closed_flag = self.CHARGE_OFF, self.WRITE_OFF, self.HAS_CLOSED
+        acct_info = {}  # ACCT_TYPE_CD -> (code, PL / vehicle flags)
+        bureau_date_global = self.bureau_date
+
+        for (
+            cid,
+            open_dt,
+            bureau_dt,
+            acct_type,
+            m_sub,
+            dpd,
+            charge_off,
+            write_off,
+            closed_dt,
+            orig,
+            limit,
+            grid_score,
+        ) in rows:
+            if bureau_dt:
+                bureau_date_global = bureau_dt
 
-            orig = safe_float(row.get("ORIG_LOAN_AM"))
-            limit = safe_float(row.get("CREDIT_LIMIT_AM"))
-            cust_max_credit[cid] = max(cust_max_credit[cid], orig, limit)
+            idx = index.get(cid)
+            if idx is None:
+                idx = tradelines.customer(cid)
+                for append in new_customer:
+                    append(0)
+            info = acct_info.get(acct_type)
+            if info is None:
+                info = acct_info[acct_type] = (
+                    tradelines.acct_code(acct_type),
+                    (has_pl if acct_type in PL_CODES else 0) | (has_vehicle if acct_type in VEHICLE_CODES else 0),
+                )
+
+            f = info[1] | lender_flags.get(m_sub, 0)
+            if charge_off > 0:
+                f |= charge_off_flag
+            if write_off:
+                f |= write_off_flag
+            if closed_dt:
+                f |= closed_flag
+            flags[idx] |= f
 
-            if acct_type in PL_CODES:
-                cust_has_pl.add(cid)
-                if open_dt:
-                    cust_pl_open_dts[cid].append(open_dt)
-            if acct_type in VEHICLE_CODES:
-                cust_has_vehicle.add(cid)
-                if open_dt:
-                    cust_vehicle_open_dts[cid].append(open_dt)
+            if dpd > max_dpd[idx]:
+                max_dpd[idx] = dpd
+            max_credit[idx] = max(max_credit[idx], orig, limit)
 
             if open_dt:
-                if cid not in cust_first_tradeline_dt or open_dt < cust_first_tradeline_dt[cid]:
-                    cust_first_tradeline_dt[cid] = open_dt
+                open_ord = open_dt.toordinal()
+                if not first_open_ord[idx] or open_ord < first_open_ord[idx]:
+                    first_open_ord[idx] = open_ord
                 if bureau_dt and (bureau_dt - open_dt).days <= 365:
-                    cust_open_last_12m[cid] += 1
-
-            # Repayment quality from PAYMENT_HISTORY_GRID
-            grid = (row.get("PAYMENT_HISTORY_GRID") or "").strip()
-            if grid:
-                total = 0
-                on_time = 0
-                for c in grid:
-                    if c == "?":
-                        continue
-                    total += 1
-                    if c == "0":
-                        on_time += 1
-                if total > 0 and cid:
-                    prev = cust_repayment_quality.get(cid, (0, 0))
-                    cust_repayment_quality[cid] = (prev[0] + on_time, prev[1] + total)
-
-            cust_tradelines[cid].append(row)
+                    open_last_12m[idx] += 1
+            else:
+                open_ord = 0
+
+            if grid_score[1] > 0:
+                on_time, total, recent_on, recent_tot, streak, worst = grid_score
+                rq_on_time[idx] += on_time
+                rq_total[idx] += total
+                recent_on_time[idx] += recent_on
+                recent_total[idx] += recent_tot
+                if streak > delinquent_streak[idx]:
+                    delinquent_streak[idx] = streak
+                if worst > worst_dpd_bucket[idx]:
+                    worst_dpd_bucket[idx] = worst
+
+            counts[idx] += 1
+            tl_cust(idx)
+            tl_acct_type(info[0])
+            tl_open_ord(open_ord)
+            tl_dpd(dpd)
+
+        self.bureau_date = bureau_date_global
+
+    def merge(self, other):
+        """Fold another partial state (built from a later slice of the input) into this one."""
+        return self._fold(other, self.tradelines.merge(other.tradelines))
+
+    def _fold(self, other, cust_map):
+        """Fold other's aggregates into ours, its customer indexes mapped by `cust_map`."""
+        self._grow()
+        (
+            flags,
+            first_open_ord,
+            max_dpd,
+            max_credit,
+            open_last_12m,
+            rq_on_time,
+            rq_total,
+            recent_on_time,
+            recent_total,
+            delinquent_streak,
+            worst_dpd_bucket,
+        ) = self._columns()
+        for i, f, first, dpd, credit, n12, on, tot, r_on, r_tot, streak, worst in zip(cust_map, *other._columns()):
+            flags[i] |= f
+            if first and (not first_open_ord[i] or first < first_open_ord[i]):
+                first_open_ord[i] = first
+            if dpd > max_dpd[i]:
+                max_dpd[i] = dpd
+            max_credit[i] = max(max_credit[i], credit)
+            open_last_12m[i] += n12
+            rq_on_time[i] += on
+            rq_total[i] += tot
+            recent_on_time[i] += r_on
+            recent_total[i] += r_tot
+            if streak > delinquent_streak[i]:
+                delinquent_streak[i] = streak
+            if worst > worst_dpd_bucket[i]:
+                worst_dpd_bucket[i] = worst
+        if other.bureau_date:
+            self.bureau_date = other.bureau_date
+        for k, v in other.ingest_counts.items():
+            self.ingest_counts[k] = self.ingest_counts.get(k, 0) + v
+        row_issues = self.row_issues
+        for cid, entry in other.row_issues.items():
+            mine = row_issues.get(cid)
+            row_issues[cid] = list(entry) if mine is None else [a + b for a, b in zip(mine, entry)]
+        return self
+
+    def apply_delta(self, delta):
+        """
+        Upsert customers from a delta state.
+
+        Every customer present in `delta` has its aggregates replaced by the
+        delta's (so the delta must carry all current tradelines of each customer
+        it touches); new customers are appended and everyone else is untouched.
+        ingest_counts follow: a replaced customer's old rows and their blank /
+        unparseable values are taken out before the delta's are added, so they
+        match a full run over the updated book. Rows without a CUSTOMER_ID
+        can't be replaced and keep adding up (emptyCustomerId).
+        """
+        index = self.tradelines.index
+        touched = [(cid, index[cid]) for cid in delta.tradelines.cids if cid in index]
+        counts = self.ingest_counts
+        for cid, i in touched:
+            counts["rows"] -= self.tradelines.counts[i]
+            for name, n in zip(ROW_ISSUES, self.row_issues.pop(cid, ())):
+                counts[name] -= n
+        for col in self._columns():
+            for _, i in touched:
+                col[i] = 0
+        return self._fold(delta, self.tradelines.upsert(delta.tradelines))
+
+# Per-customer aggregates on CustomerState: (attribute, array typecode), indexed like TradelineStore.cids
+CUSTOMER_COLUMNS = (
+    ("flags", "B"),  # CustomerState.HAS_PL / HAS_VEHICLE / CHARGE_OFF / WRITE_OFF / HAS_CLOSED / NBF / PVT / PUB
+    ("first_open_ord", "i"),  # min OPEN_DT ordinal across all accounts, 0 = none
+    ("max_dpd", "q"),
+    ("max_credit", "d"),  # max(ORIG_LOAN_AM, CREDIT_LIMIT_AM)
+    ("open_last_12m", "I"),  # count of tradelines opened in last 12m from bureau
+    # score_payment_grid() fields summed (months) or maxed (streak, bucket) over tradelines with a grid
+    ("rq_on_time", "I"),
+    ("rq_total", "I"),  # 0 = no payment grid
+    ("recent_on_time", "I"),
+    ("recent_total", "I"),
+    ("delinquent_streak", "I"),
+    ("worst_dpd_bucket", "B"),
+)
+
+LENDER_FLAGS = {"NBF": CustomerState.NBF, "PVT": CustomerState.PVT, "PUB": CustomerState.PUB}
+
+# A checkpoint is a pickled {"version", "state"} with grouped tradelines (TradelineStore.group),
+# followed by a log of --delta states, each a u64 length then the pickled state fields
+CHECKPOINT_VERSION = 7
+CHECKPOINT_LOG_SHARE = 0.5  # rewrite the whole checkpoint once its delta log would pass this share of it
+
+def _state_fields(state):
+    # Plain containers only, so the file doesn't depend on how this module was imported
+    return dict(vars(state), tradelines=vars(state.tradelines))
+
+def _state_from_fields(fields):
+    fields = dict(fields)
+    state = CustomerState()
+    vars(state.tradelines).update(fields.pop("tradelines"))
+    vars(state).update(fields)
+    return state
+
+def _pickle_atomic(data, path):
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+def save_checkpoint(state, path):
+    """Pickle the aggregate state to `path` (written atomically), with an empty delta log."""
+    state.tradelines.group()
+    _pickle_atomic({"version": CHECKPOINT_VERSION, "state": _state_fields(state)}, path)
+
+def read_checkpoint(path):
+    """
+    Load a checkpoint and apply its logged deltas. Returns (state, base size,
+    end of the log); a record cut short by an interrupted --delta is ignored
+    and overwritten by the next append_checkpoint().
+    """
+    with open(path, "rb") as f:
+        data = pickle.load(f)
+        if data.get("version") != CHECKPOINT_VERSION:
+            raise SystemExit(f"{path}: checkpoint version {data.get('version')} != {CHECKPOINT_VERSION}; re-run without --delta")
+        state = _state_from_fields(data["state"])
+        base_size = end = f.tell()
+        while len(head := f.read(8)) == 8:
+            (size,) = struct.unpack("<Q", head)
+            record = f.read(size)
+            if len(record) < size:
+                break
+            state.apply_delta(_state_from_fields(pickle.loads(record)))
+            end = f.tell()
+    return state, base_size, end
+
+def load_checkpoint(path):
+    return read_checkpoint(path)[0]
+
+def append_checkpoint(state, delta, path, base_size, end):
+    """
+    Record `delta`, just applied to `state`, at the end (`end`) of the
+    checkpoint read from `path`, so a --delta writes what it changed rather
+    than the whole book. Once the log would pass CHECKPOINT_LOG_SHARE of the
+    checkpoint, the whole of `state` is saved instead and the log starts over.
+    """
+    record = pickle.dumps(_state_fields(delta), protocol=pickle.HIGHEST_PROTOCOL)
+    if end + 8 + len(record) - base_size > CHECKPOINT_LOG_SHARE * (end + 8 + len(record)):
+        save_checkpoint(state, path)
+        return
+    with open(path, "r+b") as f:
+        f.seek(end)
+        f.write(struct.pack("<Q", len(record)) + record)
+        f.truncate()
+
+class _RangeReader(io.RawIOBase):
+    """Raw reader over bytes [start, end) of a binary file."""
+
+    def __init__(self, f, start, end):
+        self._f = f
+        self._remaining = end - start
+        f.seek(start)
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        if self._remaining <= 0:
+            return 0
+        view = memoryview(b)[: self._remaining]
+        n = self._f.readinto(view)
+        self._remaining -= n
+        return n
+
+# --- Input: a CSV path or a glob of plain / compressed parts, read through a pipelined reader ---
+
+INPUT_BUFFER_BYTES = 4 << 20  # bytes per buffer handed from the reader thread to the parser
+INPUT_QUEUE_DEPTH = 8  # buffers in flight, so at most ~32 MB of read-ahead
+COMPRESSED_SUFFIXES = (".gz", ".zst", ".zstd")
+
+def resolve_inputs(pattern):
+    """The input files for --input: the path itself if it exists, else the sorted matches of it as a glob."""
+    if os.path.exists(pattern):
+        return [pattern]
+    paths = sorted(glob.glob(pattern))
+    if not paths:
+        raise SystemExit(f"{pattern}: no such file (or no files match)")
+    return paths
+
+def is_plain_input(paths):
+    """True for a single uncompressed file, which byte-range sharding, --cache and --resume need."""
+    return len(paths) == 1 and not paths[0].endswith(COMPRESSED_SUFFIXES)
+
+def _open_binary(path):
+    """Binary stream of a part's CSV bytes, decompressing .gz / .zst on the fly."""
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    if path.endswith((".zst", ".zstd")):
+        try:
+            from compression import zstd  # Python 3.14+
+        except ImportError:
+            try:
+                import zstandard
+            except ImportError:
+                raise SystemExit(f"{path}: reading .zst input needs Python 3.14+ or the zstandard package") from None
+            reader = zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), read_across_frames=True, closefd=True)
+            return io.BufferedReader(reader, 1 << 20)
+        return zstd.open(path, "rb")
+    return open(path, "rb")
+
+def iter_input_chunks(paths, buffer_bytes=INPUT_BUFFER_BYTES):
+    """
+    Yield the bytes of the concatenated CSV parts in `paths`, `buffer_bytes` at
+    a time. Every part must start with the same header line; the repeats are
+    dropped, and a part not ending in a newline gets one.
+    """
+    header = None
+    for path in paths:
+        with _open_binary(path) as f:
+            first = f.readline()
+            if header is None:
+                header = first
+                yield first
+            elif first.rstrip(b"\r\n") != header.rstrip(b"\r\n"):
+                raise ValueError(f"{path}: header differs from the first input part's")
+            last = b"\n"
+            while chunk := f.read(buffer_bytes):
+                yield chunk
+                last = chunk[-1:]
+            if last != b"\n":
+                yield b"\n"
+
+class PipelinedInput(io.RawIOBase):
+    """
+    Raw reader over iter_input_chunks(paths). When `threaded` (by default, with
+    more than one CPU) a background thread reads and decompresses into a queue
+    of at most `depth` buffers, so I/O and zlib / zstd, which release the GIL,
+    overlap with parsing. On a single CPU nothing can overlap and the thread
+    only adds GIL hand-offs, so the chunks are then read inline.
+    """
+
+    def __init__(self, paths, buffer_bytes=INPUT_BUFFER_BYTES, depth=INPUT_QUEUE_DEPTH, threaded=None):
+        self._chunks = iter_input_chunks(paths, buffer_bytes)
+        self._buf = memoryview(b"")
+        self._done = False
+        self._queue = self._thread = None
+        if (os.cpu_count() or 1) > 1 if threaded is None else threaded:
+            self._queue = queue.Queue(depth)
+            self._stop = threading.Event()
+            self._thread = threading.Thread(target=self._produce, daemon=True)
+            self._thread.start()
+
+    def _put(self, item):
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _produce(self):
+        try:
+            for chunk in self._chunks:
+                if not self._put(chunk):
+                    return
+            self._put(None)
+        except BaseException as e:  # handed to the reading thread
+            self._put(e)
+
+    def _next_chunk(self):
+        if self._queue is None:
+            return next(self._chunks, None)
+        item = self._queue.get()
+        if isinstance(item, BaseException):
+            raise item
+        return item
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while not self._buf:
+            if self._done:
+                return 0
+            try:
+                item = self._next_chunk()
+            except BaseException:
+                self._done = True
+                raise
+            if item is None:
+                self._done = True
+                return 0
+            self._buf = memoryview(item)
+        n = min(len(b), len(self._buf))
+        b[:n] = self._buf[:n]
+        self._buf = self._buf[n:]
+        return n
+
+    def close(self):
+        if not self.closed:
+            if self._thread is not None:
+                self._stop.set()
+                self._thread.join()
+            self._chunks.close()  # closes the open part
+        super().close()
+
+def open_input(pattern_or_paths):
+    """Text stream over an --input (path, glob or list of parts) for csv, via PipelinedInput."""
+    paths = resolve_inputs(pattern_or_paths) if isinstance(pattern_or_paths, str) else pattern_or_paths
+    raw = io.BufferedReader(PipelinedInput(paths), 1 << 20)
+    return io.TextIOWrapper(raw, encoding="utf-8", newline="")
+
+def split_byte_ranges(path, n_chunks):
+    """
+    Split the data rows of a CSV into up to `n_chunks` line-aligned byte ranges.
+
+    Returns (header_bytes, [(start, end), ...]). Assumes no quoted field spans a
+    line break, which holds for bureau scrub exports.
+    """
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        header = f.readline()
+        data_start = f.tell()
+        bounds = [data_start]
+        step = max(1, (size - data_start) // max(1, n_chunks))
+        for i in range(1, n_chunks):
+            target = data_start + i * step
+            if target <= bounds[-1]:
+                continue
+            f.seek(target - 1)
+            f.readline()  # finish the line containing target - 1
+            pos = f.tell()
+            if pos >= size:
+                break
+            if pos > bounds[-1]:
+                bounds.append(pos)
+        bounds.append(size)
+    return header, list(zip(bounds[:-1], bounds[1:]))
+
+def ingest_range(path, header, start, end, sample=None, gate=None, snapshots=False):
+    """
+    Build a CustomerState from the rows in bytes [start, end) of `path`, or with
+    `snapshots` one per BUREAU_DATE (see ingest_snapshot_rows).
+    """
+    state = CustomerState()
+    if gate:
+        gate.state = state
+    with open(path, "rb") as raw:
+        f = io.TextIOWrapper(io.BufferedReader(_RangeReader(raw, start, end), 1 << 20), encoding="utf-8", newline="")
+        rows = iter_projected_rows(f, header=next(csv.reader([header.decode("utf-8")])))
+        if snapshots:
+            return ingest_snapshot_rows(rows)
+        if sample:
+            rows = sample_rows(rows, sample)
+        state.ingest(iter_tradelines(rows, state.ingest_counts, gate, state.row_issues))
+    return state
+
+def ingest_part(paths, sample=None, gate=None, snapshots=False):
+    """
+    Build a CustomerState from input parts `paths` (see open_input), or with
+    `snapshots` one per BUREAU_DATE (see ingest_snapshot_rows).
+    """
+    with open_input(paths) as f:
+        rows = iter_projected_rows(f)
+        if snapshots:
+            return ingest_snapshot_rows(rows)
+        state = CustomerState()
+        if gate:
+            gate.state = state
+        if sample:
+            rows = sample_rows(rows, sample)
+        state.ingest(iter_tradelines(rows, state.ingest_counts, gate, state.row_issues))
+    return state
+
+def _shard_tasks(paths, workers, **kwargs):
+    """
+    Process pool tasks covering `paths` in input order: byte ranges of a single
+    plain CSV, else one task per part (a compressed file can't be split).
+    """
+    if is_plain_input(paths):
+        header, ranges = split_byte_ranges(paths[0], workers)
+        return [partial(ingest_range, paths[0], header, start, end, **kwargs) for start, end in ranges]
+    return [partial(ingest_part, [path], **kwargs) for path in paths]
+
+def ingest_csv(path, workers=1, sample=None, gate=None):
+    """
+    Ingest a scrub CSV, or a glob of plain / gzip / zstd parts (see
+    resolve_inputs), sharding byte ranges of a plain file or the parts over a
+    process pool when workers > 1. With `sample` (a rate in (0, 1]), only that
+    share of customers is kept (see sample_rows). A QualityGate `gate` checks
+    the rows as they are read (each worker checks its own shard) and once more
+    on the merged state, and may raise QualityGateAbort.
+    """
+    paths = resolve_inputs(path)
+    tasks = _shard_tasks(paths, workers, sample=sample, gate=gate) if workers > 1 else []
+    if len(tasks) <= 1:
+        state = ingest_part(paths, sample, gate)
+    else:
+        state = CustomerState()
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(task) for task in tasks]
+            # Merge in input order so first-seen customer order matches a single-process run
+            for fut in futures:
+                state.merge(fut.result())
+    if gate:
+        gate.finish(state.ingest_counts, state)
+    return state
+
+RESUME_VERSION = 2
+RESUME_INTERVAL = 60.0  # seconds between ingest checkpoints
+RESUME_CHUNK_BYTES = 16 << 20  # ingest checkpoints fall on these line-aligned boundaries
+
+def iter_line_ranges(path, start, chunk_bytes=RESUME_CHUNK_BYTES):
+    """Yield consecutive line-aligned (start, end) byte ranges of about `chunk_bytes`, from `start` to EOF."""
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        while start < size:
+            f.seek(min(size, start + chunk_bytes) - 1)
+            f.readline()  # finish the line containing the target - 1
+            end = f.tell()
+            yield start, end
+            start = end
+
+def _input_identity(path):
+    st = os.stat(path)
+    return {"path": os.path.abspath(path), "size": st.st_size, "mtimeNs": st.st_mtime_ns}
+
+def save_resume_point(state, path, source, offset):
+    """Pickle a partial state with the input byte offset it covers up to (written atomically)."""
+    _pickle_atomic({"version": RESUME_VERSION, "source": source, "offset": offset, "state": _state_fields(state)}, path)
+
+def ingest_resumable(path, resume_path, interval=RESUME_INTERVAL, chunk_bytes=RESUME_CHUNK_BYTES):
+    """
+    Single-process ingest that can survive being killed.
+
+    The input is read in line-aligned ranges of `chunk_bytes`. After a range,
+    once `interval` seconds have passed since the last save, the partial state
+    and the byte offset reached are saved to `resume_path`, and once more when
+    ingest is done. If `resume_path` already holds a resume point for this same
+    input (path, size and mtime), ingest continues from its offset. Returns
+    (state, offset resumed from, or None for a fresh start).
+    """
+    source = _input_identity(path)
+    with open(path, "rb") as f:
+        header = next(csv.reader([f.readline().decode("utf-8")]))
+        offset = f.tell()
+    resumed_from = None
+    if os.path.exists(resume_path):
+        with open(resume_path, "rb") as f:
+            data = pickle.load(f)
+        if data.get("version") != RESUME_VERSION:
+            raise SystemExit(f"{resume_path}: resume version {data.get('version')} != {RESUME_VERSION}; delete it to start over")
+        if data["source"] != source:
+            raise SystemExit(f"{resume_path}: saved for {data['source']['path']} as it was then; delete it to start over")
+        state = _state_from_fields(data["state"])
+        offset = resumed_from = data["offset"]
+    else:
+        state = CustomerState()
+    last_save = time.perf_counter()
+    with open(path, "rb") as raw:
+        for start, end in iter_line_ranges(path, offset, chunk_bytes):
+            f = io.TextIOWrapper(io.BufferedReader(_RangeReader(raw, start, end), 1 << 20), encoding="utf-8", newline="")
+            state.ingest(iter_tradelines(iter_projected_rows(f, header=header), state.ingest_counts, issues=state.row_issues))
+            offset = end
+            if time.perf_counter() - last_save >= interval:
+                save_resume_point(state, resume_path, source, offset)
+                last_save = time.perf_counter()
+    save_resume_point(state, resume_path, source, offset)
+    return state, resumed_from
+
+def ingest_snapshot_rows(rows):
+    """
+    Ingest projected rows into one CustomerState per BUREAU_DATE.
+
+    A row without a parseable BUREAU_DATE goes to the snapshot of the last row
+    that had one (key None until the first). Runs of rows from one snapshot are
+    ingested in a single call, so a concatenation of monthly files costs about
+    what one combined run does. Returns ({bureau date: state}, last bureau date).
+    """
+    states = {}
+    current = None
+
+    def snapshot_of(row):
+        nonlocal current
+        current = parse_bureau_dt_cached(row[2]) or current
+        return current
+
+    for bureau_dt, run in groupby(rows, key=snapshot_of):
+        state = states.get(bureau_dt)
+        if state is None:
+            state = states[bureau_dt] = CustomerState()
+        state.ingest(iter_tradelines(run, state.ingest_counts, issues=state.row_issues))
+    return states, current
+
+def ingest_snapshots(path, workers=1):
+    """
+    Partition a scrub CSV (or parts, see ingest_csv) holding several bureau
+    pulls by BUREAU_DATE, in one pass (sharded over a process pool when
+    workers > 1). Returns
+    {bureau date: CustomerState}, oldest first. Rows before the first dated
+    row join the first snapshot; a file without any BUREAU_DATE gives {None: state}.
+    """
+    paths = resolve_inputs(path)
+    tasks = _shard_tasks(paths, workers, snapshots=True) if workers > 1 else []
+    if len(tasks) <= 1:
+        states, _ = ingest_part(paths, snapshots=True)
+    else:
+        states = {}
+        last = None
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(task) for task in tasks]
+            for fut in futures:
+                part, part_last = fut.result()
+                for bureau_dt, state in part.items():
+                    # Undated rows at the start of a shard belong to where the previous one left off
+                    bureau_dt = bureau_dt or last
+                    if bureau_dt in states:
+                        states[bureau_dt].merge(state)
+                    else:
+                        states[bureau_dt] = state
+                last = part_last or last
+    if None in states and len(states) > 1:
+        first = next(bureau_dt for bureau_dt in states if bureau_dt is not None)
+        states[first].merge(states.pop(None))
+    return dict(sorted(states.items(), key=lambda item: item[0] or date.min))
+
+# --- Data-quality gate: running checks during ingest, abort once clearly bad ---
+
+# --quality-gate limits: a share (%) or, for bureauAgeDays, days. None = not checked.
+# Only the column blank / unparseable rates are checked by default. The customer-level
+# shares and bureau age describe the book as much as the data (a real scrub can hold
+# mostly customers without a vehicle loan, or be months old), so they are opt-in via
+# --quality-threshold, e.g. anchorNonePct=90 or bureauAgeDays=400.
+QUALITY_THRESHOLDS = {
+    "blankOpenDtPct": 10.0,
+    "unparseableOpenDtPct": 5.0,
+    "blankBureauDatePct": 10.0,
+    "unparseableBureauDatePct": 5.0,
+    "blankDaysPastDuePct": 10.0,
+    "unparseableDaysPastDuePct": 5.0,
+    "anchorNonePct": None,
+    "month0PlPct": None,
+    "bucketDHighQualityPct": None,
+    "bureauAgeDays": None,
+}
+QUALITY_COLUMNS = (("OPEN_DT", "OpenDt"), ("BUREAU_DATE", "BureauDate"), ("DAYS_PAST_DUE", "DaysPastDue"))
+QUALITY_GATE_MIN_ROWS = 50_000  # first check; then every time the row count doubles
+
+def running_quality(counts, state=None, bureau_date=None, today=None):
+    """
+    Data-quality estimates so far: {check: (hits, out of)} for the shares in
+    QUALITY_THRESHOLDS, plus bureauAgeDays. Column rates come from ingest
+    `counts` (rows with a CUSTOMER_ID); the customer-level checks need a
+    CustomerState, whose BUREAU_DATE then overrides `bureau_date`.
+    """
+    parsed = counts.get("rows", 0) - counts.get("emptyCustomerId", 0)
+    estimates = {}
+    for _, suffix in QUALITY_COLUMNS:
+        for kind in ("blank", "unparseable"):
+            estimates[f"{kind}{suffix}Pct"] = (counts.get(f"{kind}{suffix}", 0), parsed)
+    if state is not None and len(state.tradelines):
+        flags = state.flags
+        estimates["anchorNonePct"] = (sum(1 for f in flags if not f & CustomerState.HAS_VEHICLE), len(flags))
+        pl_flags = TimingEngine(state.tradelines).pl_flags
+        estimates["month0PlPct"] = (
+            sum(1 for f in pl_flags if f & TimingEngine.MONTH0_PL),
+            sum(1 for f in pl_flags if f & TimingEngine.HAS_PL),
+        )
+        derogatory = CustomerState.CHARGE_OFF | CustomerState.WRITE_OFF
+        d_total = d_high_quality = 0
+        for f, max_dpd, on_time, total in zip(flags, state.max_dpd, state.rq_on_time, state.rq_total):
+            if f & derogatory or max_dpd >= BUCKET_D_MIN_DPD:  # Bucket D
+                d_total += 1
+                if total and 100.0 * on_time / total >= 80.0:
+                    d_high_quality += 1
+        estimates["bucketDHighQualityPct"] = (d_high_quality, d_total)
+        bureau_date = state.bureau_date or bureau_date
+    if bureau_date:
+        estimates["bureauAgeDays"] = ((today or datetime.now().date()) - bureau_date).days
+    return estimates
+
+def _wilson_low(k, n, z):
+    """Lower bound of the Wilson score interval for k successes out of n."""
+    p = k / n
+    zz = z * z / n
+    return (p + zz / 2 - z * math.sqrt(p * (1 - p) / n + zz / (4 * n))) / (1 + zz)
+
+class QualityGateAbort(Exception):
+    """A running data-quality estimate is clearly past its CHECK limit."""
+
+    def __init__(self, rows, failures):
+        super().__init__(rows, failures)
+        self.rows = rows
+        self.failures = failures  # [{"check", "value", "limit"}]
+
+    def __str__(self):
+        failed = ", ".join(f"{f['check']} {f['value']} > {f['limit']}" for f in self.failures)
+        return f"data-quality gate failed after {self.rows} rows: {failed}"
+
+class QualityGate:
+    """
+    Data-quality checks evaluated while ingest runs (see iter_tradelines), at
+    QUALITY_GATE_MIN_ROWS rows and then each time the row count doubles, so
+    the checks cost about as much as running them once at the end.
+
+    A share aborts the run when the lower bound of its Wilson interval at Z
+    sigma is above the limit, i.e. when it is clearly, not just noisily, past
+    it; bureauAgeDays aborts as soon as it is over. The customer-level checks
+    (CUSTOMER_CHECKS, on the attached `state`) only abort while the rows read
+    so far are grouped by CUSTOMER_ID: otherwise customers may still be missing
+    tradelines and their estimates are biased, so they are only recorded.
+    Without a state (streaming), only column rates and bureau age are checked.
+    finish() runs the checks once more on the whole input.
+    """
+
+    Z = 3.0
+    CUSTOMER_CHECKS = frozenset({"anchorNonePct", "month0PlPct", "bucketDHighQualityPct"})
+
+    def __init__(self, thresholds=None, min_rows=QUALITY_GATE_MIN_ROWS, today=None, bureau_date=None):
+        thresholds = QUALITY_THRESHOLDS if thresholds is None else thresholds
+        self.thresholds = {k: v for k, v in thresholds.items() if v is not None}
+        self.next_check = min_rows
+        self.today = today or datetime.now().date()
+        self.bureau_date = bureau_date
+        self.state = None
+        self.history = []  # {"rows", "grouped", "estimates"} per check
+
+    def check(self, counts, bureau_date=None, complete=False):
+        """
+        Evaluate the running `counts` (and state) with the BUREAU_DATE seen at
+        this point; returns the next check's row count or raises QualityGateAbort.
+        With `complete`, every customer's tradelines are in, so the customer-level
+        checks count whatever the row order.
+        """
+        self.bureau_date = bureau_date or self.bureau_date
+        state = self.state
+        estimates = running_quality(counts, state, self.bureau_date, self.today)
+        grouped = state is not None and (complete or _is_grouped(state.tradelines))
+        values = {}
+        failures = []
+        for name, limit in self.thresholds.items():
+            estimate = estimates.get(name)
+            if estimate is None:
+                continue
+            if name == "bureauAgeDays":
+                value = estimate
+                clearly_over = value > limit
+            else:
+                k, n = estimate
+                if not n:
+                    continue
+                value = round(100.0 * k / n, 2)
+                clearly_over = 100.0 * _wilson_low(k, n, self.Z) > limit
+            values[name] = value
+            if clearly_over and (grouped or name not in self.CUSTOMER_CHECKS):
+                failures.append({"check": name, "value": value, "limit": limit})
+        self.history.append({"rows": counts["rows"], "grouped": grouped, "estimates": values})
+        if failures:
+            raise QualityGateAbort(counts["rows"], failures)
+        self.next_check *= 2
+        return self.next_check
+
+    def finish(self, counts, state=None):
+        """The last check, once ingest is done: on the final `counts` and the whole `state`."""
+        self.state = state
+        self.check(counts, complete=True)
+
+class _GateCounts:
+    """
+    Stands in for a QualityGate while a columnar cache is built: keeps the
+    running counts and BUREAU_DATE iter_tradelines() hands each default-schedule
+    check, so ingest_cached() can replay them.
+    """
+
+    def __init__(self):
+        self.next_check = QUALITY_GATE_MIN_ROWS
+        self.checks = []
+
+    def check(self, counts, bureau_date=None):
+        self.checks.append({"counts": counts, "bureauDate": bureau_date and bureau_date.isoformat()})
+        self.next_check *= 2
+        return self.next_check
+
+def _is_grouped(tradelines):
+    """True if every customer's tradelines so far were read as one consecutive run."""
+    cust = tradelines.cust
+    runs = sum(map(ne, cust, islice(cust, 1, None))) + 1 if len(cust) else 0
+    return runs == len(tradelines)
+
+# --- Binary columnar cache of the projected tradeline columns ---
+# Layout: CACHE_MAGIC, u64 header length, JSON header, then one 8-byte aligned
+# native-endian array per column. Dates are day ordinals (0 = missing) and
+# ACCT_TYPE_CD / M_SUB_ID / CUSTOMER_ID are small-int codes into header tables.
+CACHE_MAGIC = b"SCRUBCOL"
+CACHE_VERSION = 6
+CACHE_COLUMNS = (  # (name, array typecode), in iter_tradelines tuple order
+    ("cust", "I"),
+    ("open_ord", "i"),
+    ("bureau_ord", "i"),
+    ("acct_type", "H"),
+    ("m_sub", "H"),
+    ("dpd", "q"),
+    ("charge_off", "d"),
+    ("write_off", "B"),
+    ("closed_ord", "i"),
+    ("orig", "d"),
+    ("limit", "d"),
+    # score_payment_grid() fields
+    ("on_time", "I"),
+    ("total", "I"),
+    ("recent_on_time", "B"),
+    ("recent_total", "B"),
+    ("delinquent_streak", "I"),
+    ("worst_dpd_bucket", "B"),
+)
+
+def default_cache_path(csv_path):
+    return f"{csv_path}.colcache"
+
+def _file_digest(path):
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _source_key(path):
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "blake2b": _file_digest(path)}
+
+@lru_cache(maxsize=1 << 16)
+def _date_from_ordinal(n):
+    return date.fromordinal(n) if n else None
+
+def build_columnar_cache(csv_path, cache_path):
+    """Parse `csv_path` once and write its projected columns to `cache_path`."""
+    source = _source_key(csv_path)
+    cols = [array(typecode) for _, typecode in CACHE_COLUMNS]
+    appends = [c.append for c in cols]
+    codes = ({}, {}, {})  # CUSTOMER_ID, ACCT_TYPE_CD, M_SUB_ID -> code
+    cust_codes, acct_codes, m_sub_codes = codes
+
+    def code(table, value):
+        c = table.get(value)
+        if c is None:
+            c = table[value] = len(table)
+        return c
+
+    ingest_counts = new_ingest_counts()
+    row_issues = {}
+    gate_counts = _GateCounts()
+    with open(csv_path, "r", newline="", encoding="utf-8") as f:
+        for row in iter_tradelines(iter_projected_rows(f), ingest_counts, gate_counts, row_issues):
+            cid, open_dt, bureau_dt, acct_type, m_sub, dpd, charge_off, write_off, closed_dt = row[:9]
+            values = (
+                code(cust_codes, cid),
+                open_dt.toordinal() if open_dt else 0,
+                bureau_dt.toordinal() if bureau_dt else 0,
+                code(acct_codes, acct_type),
+                code(m_sub_codes, m_sub),
+                dpd,
+                charge_off,
+                1 if write_off else 0,
+                closed_dt.toordinal() if closed_dt else 0,
+                row[9],
+                row[10],
+            ) + row[11]
+            for append, v in zip(appends, values):
+                append(v)
+
+    columns = []
+    offset = 0
+    for (name, typecode), col in zip(CACHE_COLUMNS, cols):
+        nbytes = len(col) * col.itemsize
+        columns.append([name, typecode, offset, nbytes])
+        offset += (nbytes + 7) & ~7
+    header = json.dumps(
+        {
+            "version": CACHE_VERSION,
+            "byteorder": sys.byteorder,
+            "source": source,
+            "rows": len(cols[0]),
+            "ingestCounts": ingest_counts,
+            "rowIssues": row_issues,
+            "gateChecks": gate_counts.checks,
+            "columns": columns,
+            "customerIds": list(cust_codes),
+            "acctTypes": list(acct_codes),
+            "mSubIds": list(m_sub_codes),
+        }
+    ).encode("utf-8")
+
+    tmp = f"{cache_path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(CACHE_MAGIC + struct.pack("<Q", len(header)) + header)
+        f.write(b"\0" * (-f.tell() & 7))
+        for col in cols:
+            col.tofile(f)
+            f.write(b"\0" * (-f.tell() & 7))
+    os.replace(tmp, cache_path)
+
+class ColumnarCache:
+    """Memory-mapped view of a cache written by build_columnar_cache()."""
+
+    def __init__(self, cache_path):
+        self._file = open(cache_path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:8] != CACHE_MAGIC:
+            self.close()
+            raise ValueError(f"{cache_path}: not a columnar cache")
+        (header_len,) = struct.unpack_from("<Q", self._mm, 8)
+        self.header = json.loads(self._mm[16 : 16 + header_len])
+        data_start = (16 + header_len + 7) & ~7
+        self.rows = self.header["rows"]
+        self.customer_ids = self.header["customerIds"]
+        self.acct_types = self.header["acctTypes"]
+        self.m_sub_ids = self.header["mSubIds"]
+        self._view = memoryview(self._mm)
+        self.columns = [
+            self._view[data_start + offset : data_start + offset + nbytes].cast(typecode)
+            for _, typecode, offset, nbytes in self.header["columns"]
+        ]
+
+    def is_fresh_for(self, csv_path):
+        """True if the cache was built from the current contents of `csv_path`."""
+        h = self.header
+        if h.get("version") != CACHE_VERSION or h.get("byteorder") != sys.byteorder:
+            return False
+        src = h["source"]
+        st = os.stat(csv_path)
+        if st.st_size != src["size"]:
+            return False
+        # Same size and mtime: trust it. Touched/copied file: confirm by content hash.
+        return st.st_mtime_ns == src["mtime_ns"] or _file_digest(csv_path) == src["blake2b"]
+
+    def iter_tradelines(self, start=0, stop=None):
+        """Yield rows [start, stop) as iter_tradelines() tuples."""
+        cids = self.customer_ids
+        accts = self.acct_types
+        m_subs = self.m_sub_ids
+        from_ord = _date_from_ordinal
+        for c, o, b, a, m, dpd, co, wo, cl, orig, limit, g0, g1, g2, g3, g4, g5 in zip(
+            *(col[start:stop] for col in self.columns)
+        ):
+            yield (
+                cids[c],
+                from_ord(o),
+                from_ord(b),
+                accts[a],
+                m_subs[m],
+                dpd,
+                co,
+                wo == 1,
+                from_ord(cl),
+                orig,
+                limit,
+                (g0, g1, g2, g3, g4, g5),
+            )
+
+    def close(self):
+        for col in getattr(self, "columns", ()):
+            col.release()
+        if hasattr(self, "_view"):
+            self._view.release()
+        self._mm.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def open_columnar_cache(csv_path, cache_path):
+    """Open `cache_path`, (re)building it first if missing or stale for `csv_path`."""
+    if os.path.exists(cache_path):
+        try:
+            cache = ColumnarCache(cache_path)
+        except (ValueError, KeyError, struct.error):
+            cache = None
+        if cache is not None:
+            if cache.is_fresh_for(csv_path):
+                return cache
+            cache.close()
+    build_columnar_cache(csv_path, cache_path)
+    return ColumnarCache(cache_path)
+
+def ingest_cache_range(cache_path, start, stop):
+    state = CustomerState()
+    with ColumnarCache(cache_path) as cache:
+        state.ingest(cache.iter_tradelines(start, stop))
+    return state
+
+def ingest_cached(csv_path, cache_path, workers=1, gate=None):
+    """
+    Ingest from the columnar cache of `csv_path`, sharding row ranges when
+    workers > 1. A QualityGate `gate` replays the checks a single-process
+    ingest_csv() would run, from the running counts and BUREAU_DATEs recorded
+    in the cache. Single-process, the customer-level checks see the same
+    partial state; with workers, the recorded checks run before the shards
+    (column rates and bureau age only), as a cache's shards are not the CSV's.
+    """
+    with open_columnar_cache(csv_path, cache_path) as cache:
+        ingest_counts = dict(cache.header["ingestCounts"])
+        row_issues = cache.header["rowIssues"]
+        state = CustomerState()
+        start = 0
+        for check in cache.header["gateChecks"] if gate else ():
+            counts = check["counts"]
+            if counts["rows"] != gate.next_check:  # a gate on another schedule than the recorded one
+                break
+            if workers <= 1:
+                gate.state = state
+                stop = counts["rows"] - counts["emptyCustomerId"]
+                state.ingest(cache.iter_tradelines(start, stop))
+                start = stop
+            bureau_date = check["bureauDate"]
+            gate.check(counts, bureau_date and date.fromisoformat(bureau_date))
+        if workers <= 1:
+            state.ingest(cache.iter_tradelines(start))
+        rows = cache.rows
+    state.ingest_counts = ingest_counts
+    state.row_issues = row_issues
+    if workers > 1:
+        step = -(-rows // workers) or 1
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(ingest_cache_range, cache_path, i, i + step) for i in range(0, rows, step)]
+            for fut in futures:
+                state.merge(fut.result())
+    if gate:
+        gate.finish(ingest_counts, state)
+    return state
+
+# --- Finalization: one fused pass of registered per-customer metrics ---
+
+RQ_BANDS = ("0-60", "60-70", "70-80", "80-90", "90-100")  # repayment quality %, right-closed
+
+def rq_band(pct):
+    """Index into RQ_BANDS for an on-time percentage."""
+    if pct <= 60:
+        return 0
+    if pct <= 70:
+        return 1
+    if pct <= 80:
+        return 2
+    if pct <= 90:
+        return 3
+    return 4
+
+# Lender type by the NBF / PVT / PUB bits of CustomerState.flags >> LENDER_SHIFT: one of
+# them alone among a customer's M_SUB_IDs gives that type, anything else is Mixed
+LENDER_TYPES = ("Mixed", "NBF", "PVT", "Mixed", "PUB", "Mixed", "Mixed", "Mixed")
+# Order of lender types in the cube, whatever order customers arrive in
+LENDER_TYPE_ORDER = ("NBF", "PVT", "PUB", "Mixed")
+
+# RUN 2 buckets: D with a charge-off, write-off or max DPD of BUCKET_D_MIN_DPD+, C with max DPD
+# BUCKET_C_MIN_DPD+, otherwise B with a closed account and A without
+BUCKET_D_MIN_DPD = 180
+BUCKET_C_MIN_DPD = 31
+
+def customer_bucket(max_dpd, charge_off, write_off, has_closed):
+    if charge_off or write_off or max_dpd >= BUCKET_D_MIN_DPD:
+        return "D"
+    if max_dpd >= BUCKET_C_MIN_DPD:
+        return "C"
+    if has_closed:
+        return "B"
+    return "A"
+
+# RUN 3 risk score: RISK_SCORE_BASE plus the points of each rule in risk_score_rules(), clamped to 0-100
+# (the score_payment_grid() streak / recent / worst-bucket features are reported in behaviour.json, not scored)
+RISK_SCORE_BASE = 50
+RISK_SCORE_POINTS = {
+    "clean": 40,  # max DPD 0 and no charge-off / write-off
+    "highRepaymentQuality": 20,  # repayment quality above RISK_SCORE_HIGH_RQ_PCT
+    "singleTradeline": -10,
+    "chargeOffWriteOff": -40,
+    "severeDpd": -30,  # otherwise, max DPD of RISK_SCORE_SEVERE_DPD+
+    "anyDpd": -10,  # otherwise, any DPD
+}
+RISK_SCORE_HIGH_RQ_PCT = 90
+RISK_SCORE_SEVERE_DPD = 90
+
+def risk_score_rules(max_dpd, charge_off, write_off, rq_pct, n_tradelines):
+    """The RISK_SCORE_POINTS rules that apply to a customer; rq_pct is None without a payment grid."""
+    rules = []
+    if max_dpd == 0 and not charge_off and not write_off:
+        rules.append("clean")
+    if rq_pct is not None and rq_pct > RISK_SCORE_HIGH_RQ_PCT:
+        rules.append("highRepaymentQuality")
+    if n_tradelines == 1:
+        rules.append("singleTradeline")
+    if charge_off or write_off:
+        rules.append("chargeOffWriteOff")
+    elif max_dpd >= RISK_SCORE_SEVERE_DPD:
+        rules.append("severeDpd")
+    elif max_dpd > 0:
+        rules.append("anyDpd")
+    return rules
+
+def customer_risk_score(max_dpd, charge_off, write_off, rq_pct, n_tradelines):
+    """RUN 3 simplified composite risk score (0-100); rq_pct is None without a payment grid."""
+    score = RISK_SCORE_BASE
+    for rule in risk_score_rules(max_dpd, charge_off, write_off, rq_pct, n_tradelines):
+        score += RISK_SCORE_POINTS[rule]
+    return max(0, min(100, score))
+
+def risk_tier(score):
+    if score < 40:
+        return "0-39"
+    if score < 70:
+        return "40-69"
+    return "70-100"
+
+def affordability_tier(max_credit):
+    if max_credit < 50000:
+        return "micro"
+    if max_credit < 200000:
+        return "mid"
+    if max_credit < 1000000:
+        return "mass"
+    return "affluent"
+
+# Timing flags by whole months since the anchor, in order: a customer gets the first one whose
+# last month (inclusive; None = no limit) they haven't passed
+TIMING_WINDOWS = (("early", 1), ("golden_window", 10), ("milestone", 18), ("dormant", None))
+
+def timing_flag(months_since_anchor):
+    for flag, last_month in TIMING_WINDOWS:
+        if last_month is None or months_since_anchor <= last_month:
+            return flag
+
+# RUN 5 assumptions. Scenario runs (scripts/run5_scenarios.py) override any of these.
+RUN5_ASSUMPTIONS = {
+    # SAM: non-D customers with min_tradelines+ tradelines, segmented by risk score
+    "min_tradelines": 3,
+    "pl_min_risk_score": 70,
+    "lac_min_risk_score": 40,
+    # LAC only for vehicle holders whose anchor is [lo, hi] months old (None = any)
+    "lac_timing_months": None,
+    "demand_rate_pl": 0.32,
+    "take_rate_pl": 0.25,
+    "demand_rate_lac": 0.20,
+    "take_rate_lac": 0.35,
+    # Revenue model (skill: PL 75K, 18mo, yield 24%, credit 5%, opex 3% → net 16%; LAC 1.5L, 24mo, 20%, 2%, net 15%)
+    "avg_ticket_pl": 75000,
+    "avg_tenor_pl_months": 18,
+    "yield_pl_pct": 24,
+    "credit_cost_pl_pct": 5,
+    "prepayment_adj_pl": 0.75,
+    "net_margin_pl": 0.16,
+    "avg_ticket_lac": 150000,
+    "avg_tenor_lac_months": 24,
+    "yield_lac_pct": 20,
+    "credit_cost_lac_pct": 2,
+    "prepayment_adj_lac": 0.80,
+    "net_margin_lac": 0.15,
+}
+
+def sam_segment(bucket, n_tradelines, risk_score, has_vehicle, months_since_anchor, assumptions=RUN5_ASSUMPTIONS):
+    """RUN 5 SAM segment of a customer: pl_eligible / lac_eligible / deferred / excluded, or None outside SAM."""
+    a = assumptions
+    if bucket == "D" or n_tradelines < a["min_tradelines"]:
+        return None
+    if risk_score >= a["pl_min_risk_score"]:
+        return "pl_eligible"
+    if risk_score >= a["lac_min_risk_score"]:
+        window = a["lac_timing_months"]
+        if has_vehicle and (window is None or (months_since_anchor is not None and window[0] <= months_since_anchor <= window[1])):
+            return "lac_eligible"
+        return "deferred"
+    return "excluded"
+
+class CustomerView:
+    """
+    Everything RUN 1-5 derive for one customer, filled once per customer by
+    iter_customer_views(). The same object is reused for every customer, so a
+    metric must copy whatever it keeps.
+    """
+
+    __slots__ = (
+        "idx",
+        "first_seen",  # sorts customers in the order of their first row in the input
+        "cid",
+        "n_tradelines",
+        "acct_types",  # ACCT_TYPE_CDs held, in first-seen order
+        "lender_type",
+        "has_pl",
+        "has_vehicle",
+        "max_dpd",
+        "charge_off",
+        "write_off",
+        "has_closed",
+        "bucket",
+        "repayment",  # (on_time, total) or None without a payment grid
+        "rq_pct",
+        "grid_features",  # (recent_on_time, recent_total, delinquent_streak, worst_dpd_bucket) or None
+        "risk_score",
+        "max_credit",
+        "open_last_12m",
+        "anchor_ord",  # 0 = no dated vehicle loan
+        "first_timer",
+        "first_pl_ord",  # first PL >= 1 month after the anchor, 0 = none
+        "first_pl_delta_m",  # months from anchor to first_pl_ord, None = none
+        "pl_flags",  # TimingEngine.HAS_PL / PRE_EXISTING_PL / MONTH0_PL
+        "months_since_anchor",  # None without an anchor or for an anchor after the bureau date
+        "timing_flag",
+    )
+
+def iter_customer_views(state, timing_engine, bureau_ord, first_seen=0):
+    """
+    Yield a (reused) CustomerView per customer, in first-seen order; a view's
+    first_seen is `first_seen` plus its index in the state.
+    """
+    tradelines = state.tradelines
+    acct_names = tradelines.acct_names
+    acct_types_of = {}  # account type bitmask -> names, masks repeat a lot
+    lender_shift = state.LENDER_SHIFT
+    has_pl_flag, has_vehicle_flag = state.HAS_PL, state.HAS_VEHICLE
+    charge_off_flag, write_off_flag, closed_flag = state.CHARGE_OFF, state.WRITE_OFF, state.HAS_CLOSED
+    anchor_ords = timing_engine.anchor_ord
+    first_pl_ords = timing_engine.first_pl_ord
+    pl_flags = timing_engine.pl_flags
+
+    c = CustomerView()
+    for idx, (cid, n_tradelines, mask, flags, first_open, max_dpd, max_credit, open_last_12m, on_time, total, *grid) in enumerate(
+        zip(
+            tradelines.cids,
+            tradelines.counts,
+            tradelines.acct_masks(),
+            state.flags,
+            state.first_open_ord,
+            state.max_dpd,
+            state.max_credit,
+            state.open_last_12m,
+            state.rq_on_time,
+            state.rq_total,
+            state.recent_on_time,
+            state.recent_total,
+            state.delinquent_streak,
+            state.worst_dpd_bucket,
+        )
+    ):
+        c.idx = idx
+        c.first_seen = first_seen + idx
+        c.cid = cid
+        c.n_tradelines = n_tradelines
+        acct_types = acct_types_of.get(mask)
+        if acct_types is None:
+            acct_types = acct_types_of[mask] = tuple(name for i, name in enumerate(acct_names) if mask >> i & 1)
+        c.acct_types = acct_types
+        c.lender_type = LENDER_TYPES[flags >> lender_shift]
+        c.has_pl = bool(flags & has_pl_flag)
+        c.has_vehicle = bool(flags & has_vehicle_flag)
+        c.max_dpd = max_dpd
+        c.charge_off = charge_off = bool(flags & charge_off_flag)
+        c.write_off = write_off = bool(flags & write_off_flag)
+        c.has_closed = has_closed = bool(flags & closed_flag)
+        c.bucket = customer_bucket(max_dpd, charge_off, write_off, has_closed)
+        if total:
+            c.repayment = (on_time, total)
+            c.rq_pct = rq_pct = 100.0 * on_time / total
+            c.grid_features = tuple(grid)
+        else:
+            c.repayment = c.rq_pct = rq_pct = c.grid_features = None
+        c.risk_score = customer_risk_score(max_dpd, charge_off, write_off, rq_pct, n_tradelines)
+        c.max_credit = max_credit
+        c.open_last_12m = open_last_12m
+
+        c.anchor_ord = anchor = anchor_ords[idx]
+        if anchor:
+            c.first_timer = first_open == anchor
+            c.first_pl_ord = first_pl = first_pl_ords[idx]
+            c.first_pl_delta_m = (first_pl - anchor) // 30 if first_pl else None
+            c.pl_flags = pl_flags[idx]
+            since = bureau_ord - anchor
+            if since >= 0:
+                c.months_since_anchor = since // 30
+                c.timing_flag = timing_flag(since // 30)
+            else:
+                c.months_since_anchor = c.timing_flag = None
+        else:
+            c.first_timer = False
+            c.first_pl_ord = c.pl_flags = 0
+            c.first_pl_delta_m = c.months_since_anchor = c.timing_flag = None
+        yield c
+
+class FinalizeContext:
+    """
+    Run-wide inputs metrics may need when finishing (bureau date, today, the
+    customer sampling rate when the input was sampled, and the ingest counts
+    when known).
+    """
+
+    def __init__(self, bureau_date, today=None, sample_rate=None, ingest_counts=None):
+        self.bureau_date = bureau_date
+        self.bureau_ord = bureau_date.toordinal()
+        self.today = today or datetime.now().date()
+        self.sample_rate = sample_rate
+        self.ingest_counts = ingest_counts
+
+METRICS = []  # registered Metric classes, run in registration order
+
+def register_metric(cls):
+    """Class decorator adding a Metric to the fused finalization pass."""
+    METRICS.append(cls)
+    return cls
+
+class Metric:
+    """
+    Per-customer accumulator for the fused finalization pass.
+
+    observe() is called once per customer with a CustomerView; finish() returns
+    the metric's results. When `output` is set, finish()'s result is also written
+    as `<output>.json` next to the dashboard payloads.
+    """
+
+    name = None
+    output = None
+
+    def __init__(self, ctx):
+        self.ctx = ctx
+
+    def observe(self, c):
+        raise NotImplementedError
+
+    def finish(self):
+        raise NotImplementedError
+
+    def close(self):
+        """Release what observe() / finish() opened; run_metrics() calls it after the pass, even a failed one."""
+
+    def scale(self, result, rate):
+        """finish()'s result scaled up from a `rate` customer sample; by default every int is a count."""
+        return scale_counts(result, rate)
+
+def scale_counts(obj, rate):
+    """Copy of `obj` with every int in its (nested) dict values and lists divided by `rate`, rounded."""
+    if isinstance(obj, bool):
+        return obj
+    if isinstance(obj, int):
+        return round(obj / rate)
+    if isinstance(obj, list):
+        return [scale_counts(v, rate) for v in obj]
+    if isinstance(obj, dict):
+        scaled = obj.copy()  # keeps a defaultdict's default
+        for k, v in obj.items():
+            scaled[k] = scale_counts(v, rate)
+        return scaled
+    return obj
+
+@register_metric
+class PopulationMetric(Metric):
+    """RUN 1: buckets, lender type, product mix, tradeline totals."""
+
+    name = "population"
+
+    def __init__(self, ctx):
+        super().__init__(ctx)
+        self.n0 = 0
+        self.n_tradelines = 0
+        self.bucket_counts = defaultdict(int)
+        self.lender_type_counts = defaultdict(int)
+        self.product_mix = defaultdict(int)  # vehicle_only, vehicle_pl, multi
+        # lender type / product mix -> first_seen of its first customer
+        self.lender_type_first = {}
+        self.product_mix_first = {}
+        self.has_pl = 0
+        self.has_vehicle = 0
+        self.thin_file = 0
+
+    def observe(self, c):
+        self.n0 += 1
+        self.n_tradelines += c.n_tradelines
+        self.bucket_counts[c.bucket] += 1
+        if c.has_vehicle and c.has_pl:
+            mix = "vehicle_and_pl"
+        elif c.has_vehicle:
+            mix = "vehicle_only"
+        else:
+            mix = "other"
+        self.lender_type_counts[c.lender_type] += 1
+        self.product_mix[mix] += 1
+        first = c.first_seen
+        if self.lender_type_first.get(c.lender_type, first) >= first:
+            self.lender_type_first[c.lender_type] = first
+        if self.product_mix_first.get(mix, first) >= first:
+            self.product_mix_first[mix] = first
+        self.has_pl += c.has_pl
+        self.has_vehicle += c.has_vehicle
+        if c.n_tradelines < 3:
+            self.thin_file += 1
+
+    def finish(self):
+        result = vars(self).copy()
+        # Listed in the order the input first shows each value, whatever order customers were finalized in
+        for name, first_name in (("lender_type_counts", "lender_type_first"), ("product_mix", "product_mix_first")):
+            first = result.pop(first_name)
+            result[name] = {k: result[name][k] for k in sorted(first, key=first.get)}
+        return result
+
+@register_metric
+class AcctTypeMetric(Metric):
+    """Customers holding each ACCT_TYPE_CD."""
+
+    name = "acct_types"
+
+    def __init__(self, ctx):
+        super().__init__(ctx)
+        self.counts = defaultdict(int)
+
+    def observe(self, c):
+        counts = self.counts
+        for t in c.acct_types:
+            counts[t] += 1
+
+    def finish(self):
+        return self.counts
+
+@register_metric
+class TimeToNextPLMetric(Metric):
+    """RUN 2: time-to-next-PL Curve A (all vehicle customers) and Curve B (first-timers)."""
+
+    name = "time_to_next_pl"
+
+    def __init__(self, ctx):
+        super().__init__(ctx)
+        self.curve_a = defaultdict(int)  # delta months (>0 only, post-vehicle PL) -> customers
+        self.curve_b = defaultdict(int)
+        self.golden_window_a = 0
+        self.golden_window_b = 0
+        self.month0_customers = 0
+        self.pre_existing_pl_customers = 0
+        self.vehicle_pl_base = 0
+        self.first_pl_post_vehicle_ords = defaultdict(int)  # ordinal of first PL after vehicle -> customers
+
+    def observe(self, c):
+        flags = c.pl_flags
+        if not flags & TimingEngine.HAS_PL:
+            return
+        self.vehicle_pl_base += 1
+        if flags & TimingEngine.MONTH0_PL:
+            self.month0_customers += 1
+        if flags & TimingEngine.PRE_EXISTING_PL:
+            self.pre_existing_pl_customers += 1
+        delta_m = c.first_pl_delta_m
+        if delta_m is None:
+            return
+        self.first_pl_post_vehicle_ords[c.first_pl_ord] += 1
+        self.curve_a[delta_m] += 1
+        if c.first_timer:
+            self.curve_b[delta_m] += 1
+        if 2 <= delta_m <= 10:
+            if c.first_timer:
+                self.golden_window_b += 1
+            self.golden_window_a += 1
+
+    def finish(self):
+        return vars(self)
+
+@register_metric
+class RepaymentMetric(Metric):
+    """Repayment quality bands (all-time and recent), grid delinquency, Bucket D consistency."""
+
+    name = "repayment"
+
+    def __init__(self, ctx):
+        super().__init__(ctx)
+        self.rq_bands = [0] * len(RQ_BANDS)
+        self.recent_rq_bands = [0] * len(RQ_BANDS)
+        self.streak_buckets = {"0": 0, "1": 0, "2-3": 0, "4-6": 0, "7+": 0}
+        self.worst_bucket_counts = [0] * 10
+        self.bucket_d_total = 0
+        self.bucket_d_high_quality = 0
+
+    def observe(self, c):
+        pct = c.rq_pct
+        if pct is not None:
+            self.rq_bands[rq_band(pct)] += 1
+        if c.bucket == "D":
+            self.bucket_d_total += 1
+            if pct is not None and pct >= 80.0:
+                self.bucket_d_high_quality += 1
+        feats = c.grid_features
+        if feats is None:
+            return
+        recent_on_time, recent_total, streak, worst = feats
+        if recent_total:
+            self.recent_rq_bands[rq_band(100.0 * recent_on_time / recent_total)] += 1
+        if streak == 0:
+            self.streak_buckets["0"] += 1
+        elif streak == 1:
+            self.streak_buckets["1"] += 1
+        elif streak <= 3:
+            self.streak_buckets["2-3"] += 1
+        elif streak <= 6:
+            self.streak_buckets["4-6"] += 1
+        else:
+            self.streak_buckets["7+"] += 1
+        self.worst_bucket_counts[worst] += 1
+
+    def finish(self):
+        return vars(self)
+
+@register_metric
+class CreditVelocityMetric(Metric):
+    """Tradelines opened in the 12 months before BUREAU_DATE."""
+
+    name = "credit_velocity"
+
+    def __init__(self, ctx):
+        super().__init__(ctx)
+        self.counts = [0, 0, 0]  # 0, 1, 2+ accounts
+
+    def observe(self, c):
+        self.counts[min(c.open_last_12m, 2)] += 1
+
+    def finish(self):
+        return self.counts
+
+@register_metric
+class RiskMetric(Metric):
+    """RUN 3: risk tiers and affordability tiers."""
+
+    name = "risk"
+
+    def __init__(self, ctx):
+        super().__init__(ctx)
+        self.risk_buckets = {"0-39": 0, "40-69": 0, "70-100": 0}
+        self.affordability_buckets = {"micro": 0, "mid": 0, "mass": 0, "affluent": 0}
+
+    def observe(self, c):
+        self.risk_buckets[risk_tier(c.risk_score)] += 1
+        self.affordability_buckets[affordability_tier(c.max_credit)] += 1
 
+    def finish(self):
+        return vars(self)
+
+@register_metric
+class TimingMetric(Metric):
+    """RUN 4: months since the vehicle anchor and timing flags at BUREAU_DATE."""
+
+    name = "timing"
+
+    def __init__(self, ctx):
+        super().__init__(ctx)
+        self.anchor_ords = defaultdict(int)  # anchor ordinal -> customers; resolved against the bureau date in finish()
+
+    def observe(self, c):
+        if c.anchor_ord:
+            self.anchor_ords[c.anchor_ord] += 1
+
+    def finish(self):
+        bureau_ord = self.ctx.bureau_ord
+        timing_flags = {"golden_window": 0, "milestone": 0, "early": 0, "dormant": 0}
+        months_since_car_hist = defaultdict(int)
+        for anchor_ord, n in self.anchor_ords.items():
+            delta_days = bureau_ord - anchor_ord
+            if delta_days < 0:
+                continue
+            delta_m = delta_days // 30
+            months_since_car_hist[min(delta_m, 36)] += n
+            timing_flags[timing_flag(delta_m)] += n
+        return {"timing_flags": timing_flags, "months_since_car_hist": months_since_car_hist}
+
+@register_metric
+class ServiceableMetric(Metric):
+    """RUN 5: SAM segments (non-D customers with 3+ tradelines) by risk score and vehicle holding."""
+
+    name = "serviceable"
+
+    def __init__(self, ctx):
+        super().__init__(ctx)
+        self.pl_eligible = 0
+        self.lac_eligible = 0
+        self.deferred = 0
+        self.excluded = 0
+
+    def observe(self, c):
+        segment = sam_segment(c.bucket, c.n_tradelines, c.risk_score, c.has_vehicle, c.months_since_anchor)
+        if segment is not None:
+            setattr(self, segment, getattr(self, segment) + 1)
+
+    def finish(self):
+        return vars(self)
+
+@register_metric
+class CubeMetric(Metric):
+    """
+    Pre-aggregated cube for client-side filtering: counts and histograms per
+    combination of lender type, bucket, risk tier, timing flag and
+    affordability tier. Only non-empty cells are kept, so its size is bounded by
+    the dimension product, not the customer count.
+    """
+
+    name = "cube"
+    output = "cube"
+    DIMENSIONS = (
+        ("lenderType", LENDER_TYPE_ORDER),
+        ("bucket", ("A", "B", "C", "D")),
+        ("riskTier", ("0-39", "40-69", "70-100")),
+        ("timingFlag", ("golden_window", "milestone", "early", "dormant", "none")),
+        ("affordabilityTier", ("micro", "mid", "mass", "affluent")),
+    )
+    MEASURES = ("customers", "tradelines", "thinFile", "hasPl", "vehicleAndPl", "vehicleOnly", "goldenWindowA", "goldenWindowB")
+    # name -> number of bins; months are capped like timing.json / behaviour.json, PL opens by calendar month
+    HISTOGRAMS = (("monthsSinceCarLoan", 37), ("curveA", 37), ("curveB", 37), ("plOpenMonth", 12))
+
+    def __init__(self, ctx):
+        super().__init__(ctx)
+        self.index = [{v: i for i, v in enumerate(values)} for _, values in self.DIMENSIONS]
+        self.cells = {}
+
+    def observe(self, c):
+        lender_i, bucket_i, risk_i, timing_i, afford_i = self.index
+        key = (
+            lender_i[c.lender_type],
+            bucket_i[c.bucket],
+            risk_i[risk_tier(c.risk_score)],
+            timing_i[c.timing_flag or "none"],
+            afford_i[affordability_tier(c.max_credit)],
+        )
+        cell = self.cells.get(key)
+        if cell is None:
+            cell = self.cells[key] = [0] * len(self.MEASURES) + [defaultdict(int) for _ in self.HISTOGRAMS]
+        cell[0] += 1
+        cell[1] += c.n_tradelines
+        if c.n_tradelines < 3:
+            cell[2] += 1
+        if c.has_pl:
+            cell[3] += 1
+        if c.has_vehicle:
+            cell[4 if c.has_pl else 5] += 1
+        months = c.months_since_anchor
+        if months is not None:
+            cell[8][min(months, 36)] += 1
+        delta_m = c.first_pl_delta_m
+        if delta_m is not None and c.pl_flags & TimingEngine.HAS_PL:
+            if delta_m <= 36:
+                cell[9][delta_m] += 1
+                if c.first_timer:
+                    cell[10][delta_m] += 1
+            if 2 <= delta_m <= 10:
+                cell[6] += 1
+                if c.first_timer:
+                    cell[7] += 1
+            cell[11][_date_from_ordinal(c.first_pl_ord).month - 1] += 1
+
+    def finish(self):
+        n_measures = len(self.MEASURES)
+        cells = []
+        for key in sorted(self.cells):
+            cell = self.cells[key]
+            # histograms as sparse [bin, count, bin, count, ...]
+            hists = [[x for b in sorted(h) for x in (b, h[b])] for h in cell[n_measures:]]
+            cells.append([*key, *cell[:n_measures], *hists])
+        return {
+            "version": 1,
+            "bureauDate": self.ctx.bureau_date.isoformat(),
+            "dimensions": [{"name": name, "values": list(values)} for name, values in self.DIMENSIONS],
+            "measures": list(self.MEASURES),
+            "histograms": [{"name": name, "bins": bins} for name, bins in self.HISTOGRAMS],
+            "cells": cells,
+        }
+
+    def scale(self, result, rate):
+        # Only the measures and histogram counts; dimension indexes and histogram bins stay
+        n_dims, n_measures = len(self.DIMENSIONS), len(self.MEASURES)
+        cells = [
+            [
+                *cell[:n_dims],
+                *(round(v / rate) for v in cell[n_dims : n_dims + n_measures]),
+                *([x if i % 2 == 0 else round(x / rate) for i, x in enumerate(h)] for h in cell[n_dims + n_measures :]),
+            ]
+            for cell in result["cells"]
+        ]
+        return dict(result, cells=cells)
+
+SIG2_MAX = 10**15  # sig2_bin() clamps values from here up into the last bin below it
+
+def sig2_bin(value):
+    """
+    (lo, hi) of the bin holding `value` (>= 0) when bins keep two significant
+    digits: width 1 below 100, then [10, 11) * 10**k ... [99, 100) * 10**k, so
+    at most 10% wide and every edge with two significant digits (50k, 200k, 1M)
+    is a bin edge. Negative values and NaN fall in the first bin, values of
+    SIG2_MAX or more (inf included) in the last, [99, 100) * 10**13.
+    """
+    if not value >= 0:
+        value = 0
+    elif value >= SIG2_MAX:
+        value = SIG2_MAX - 1
+    if value < 100:
+        lo = int(value)
+        return lo, lo + 1
+    step = 10 ** (len(str(int(value))) - 2)
+    lo = int(value) // step * step
+    return lo, lo + step
+
+@register_metric
+class DistributionsMetric(Metric):
+    """
+    Fine-grained, mergeable histograms of the per-customer quantities that
+    dashboard tiers and bands are cut from, so edges can be moved and
+    percentiles read without a re-run (scripts/rebucket_distributions.py).
+    Each distribution has `points` ([value, count]: customers at exactly that
+    value) and `ranges` ([lo, hi, count]: customers with lo <= value < hi, other
+    than those in points). Integer quantities are all points (max DPD above
+    DPD_EXACT_MAX in sig2_bin ranges), repayment quality has points at whole
+    percentages and the open intervals between them, max credit is sig2_bin
+    ranges. The size is bounded by the bin grid, not the customer count.
+    """
+
+    name = "distributions"
+    output = "distributions"
+    VERSION = 1
+    DPD_EXACT_MAX = 999
+    LOW_IN_POINTS = frozenset({"repaymentQualityPct"})  # ranges exclude their lo, which is a point
+    # name -> (what, tier / band functions cut from it)
+    DISTRIBUTIONS = {
+        "riskScore": ("RUN 3 composite risk score (0-100)", "risk_tier"),
+        "maxDpd": ("max DAYS_PAST_DUE over the customer's tradelines", "customer_bucket, customer_risk_score"),
+        "repaymentQualityPct": ("on-time % of PAYMENT_HISTORY_GRID months (customers with a grid)", "rq_band"),
+        "maxCredit": ("max(ORIG_LOAN_AM, CREDIT_LIMIT_AM)", "affordability_tier"),
+        "monthsSinceAnchor": ("months since the most recent dated vehicle loan (customers with an anchor)", "timing_flag"),
+    }
+
+    def __init__(self, ctx):
+        super().__init__(ctx)
+        self.points = {name: defaultdict(int) for name in self.DISTRIBUTIONS}
+        self.ranges = {name: defaultdict(int) for name in self.DISTRIBUTIONS}  # keyed by (lo, hi)
+
+    def observe(self, c):
+        points, ranges = self.points, self.ranges
+        points["riskScore"][c.risk_score] += 1
+        dpd = c.max_dpd
+        if dpd <= self.DPD_EXACT_MAX:
+            points["maxDpd"][dpd] += 1
+        else:
+            ranges["maxDpd"][sig2_bin(dpd)] += 1
+        pct = c.rq_pct
+        if pct is not None:
+            whole = int(pct)
+            if pct == whole:
+                points["repaymentQualityPct"][whole] += 1
+            else:
+                ranges["repaymentQualityPct"][whole, whole + 1] += 1
+        ranges["maxCredit"][sig2_bin(max(0.0, c.max_credit))] += 1
+        if c.months_since_anchor is not None:
+            points["monthsSinceAnchor"][c.months_since_anchor] += 1
+
+    def finish(self):
+        distributions = {}
+        for name, (what, used_by) in self.DISTRIBUTIONS.items():
+            points, ranges = self.points[name], self.ranges[name]
+            distributions[name] = {
+                "description": what,
+                "usedBy": used_by,
+                "customers": sum(points.values()) + sum(ranges.values()),
+                "lowInRange": name not in self.LOW_IN_POINTS,
+                "points": [[v, points[v]] for v in sorted(points)],
+                "ranges": [[lo, hi, ranges[lo, hi]] for lo, hi in sorted(ranges)],
+            }
+        return {"version": self.VERSION, "bureauDate": self.ctx.bureau_date.isoformat(), "distributions": distributions}
+
+    def scale(self, result, rate):
+        # Counts only; values and bin edges stay
+        distributions = {
+            name: dict(
+                d,
+                customers=round(d["customers"] / rate),
+                points=[[v, round(n / rate)] for v, n in d["points"]],
+                ranges=[[lo, hi, round(n / rate)] for lo, hi, n in d["ranges"]],
+            )
+            for name, d in result["distributions"].items()
+        }
+        return dict(result, distributions=distributions)
+
+class FeatureTableMetric(Metric):
+    """
+    Per-customer RUN 5 inputs as typed columns, persisted with --features so
+    what-if scenarios (scripts/run5_scenarios.py) can skip ingest. Not
+    registered: compute_outputs() runs it as an extra metric on request.
+    Holds no CUSTOMER_IDs.
+    """
+
+    name = "features"
+    BUCKETS = "ABCD"
+    HAS_VEHICLE = 1
+    HAS_PL = 2
+
+    def __init__(self, ctx):
+        super().__init__(ctx)
+        self.columns = {
+            "bucket": array("B"),  # index into BUCKETS
+            "n_tradelines": array("I"),
+            "risk_score": array("B"),
+            "max_credit": array("d"),
+            "flags": array("B"),  # HAS_VEHICLE | HAS_PL
+            "months_since_anchor": array("i"),  # -1 = none
+            "first_pl_delta_m": array("i"),  # -1 = no PL after the anchor
+        }
+
+    def observe(self, c):
+        cols = self.columns
+        cols["bucket"].append(self.BUCKETS.index(c.bucket))
+        cols["n_tradelines"].append(c.n_tradelines)
+        cols["risk_score"].append(c.risk_score)
+        cols["max_credit"].append(c.max_credit)
+        cols["flags"].append((self.HAS_VEHICLE if c.has_vehicle else 0) | (self.HAS_PL if c.has_pl else 0))
+        cols["months_since_anchor"].append(-1 if c.months_since_anchor is None else c.months_since_anchor)
+        cols["first_pl_delta_m"].append(-1 if c.first_pl_delta_m is None else c.first_pl_delta_m)
+
+    def finish(self):
+        return {"bureauDate": self.ctx.bureau_date.isoformat(), "columns": self.columns}
+
+    def scale(self, result, rate):
+        raise ValueError("a feature table holds one row per customer and can't be scaled from a sample")
+
+FEATURES_VERSION = 1
+
+def save_feature_table(table, path):
+    """Pickle a FeatureTableMetric result to `path` (written atomically)."""
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump(dict(table, version=FEATURES_VERSION), f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+def load_feature_table(path):
+    with open(path, "rb") as f:
+        table = pickle.load(f)
+    if table.get("version") != FEATURES_VERSION:
+        raise SystemExit(f"{path}: feature table version {table.get('version')} != {FEATURES_VERSION}; re-run with --features")
+    return table
+
+OUTREACH_COHORTS = ("Immediate (top 20%)", "Next 30 days", "Next 90 days", "Hold")
+OUTREACH_TIMING_RANK = {"golden_window": 4, "milestone": 3, "early": 2, "dormant": 1, None: 0}
+OUTREACH_AFFORDABILITY_RANK = {"affluent": 3, "mass": 2, "mid": 1, "micro": 0}
+OUTREACH_COLUMNS = ("rank", "customer_id", "cohort", "risk_score", "risk_tier", "timing_flag", "affordability_tier")
+OUTREACH_BATCH_ROWS = 10_000
+
+class OutreachMetric(Metric):
+    """
+    Customers ranked for outreach, written by --outreach: by risk score, then
+    timing flag (golden window first), then affordability, ties in first-seen
+    order. The three fit one small integer priority key (at most ~2k distinct
+    values), so the full ranking is a counting sort into per-key CUSTOMER_ID
+    lists rather than a sort of the book; with `top` only the best `top`
+    customers are kept, in a bounded heap (so --stream stays bounded too).
+    Cohorts are cuts of the ranking: the first min(70-100 tier, N0 // 5)
+    customers are Immediate, the rest with a score of 40+ Next 30 days,
+    everyone else Next 90 days. Immediate and Next 90 days match
+    outreach.json; its Next 30 days is the 40-69 tier only, without the
+    70-100 customers beyond the Immediate cap that the export puts there.
+    Not registered: holds CUSTOMER_IDs.
+    """
+
+    name = "outreach_export"
+
+    def __init__(self, ctx, top=None):
+        super().__init__(ctx)
+        self.top = top
+        self.buckets = defaultdict(list)  # priority key -> CUSTOMER_IDs in first-seen order
+        self.heap = []  # (key, -seq, cid), worst first
+        self.n0 = self.top_tier = 0
+
+    @staticmethod
+    def priority(c):
+        return (
+            c.risk_score * 100
+            + OUTREACH_TIMING_RANK[c.timing_flag] * 10
+            + OUTREACH_AFFORDABILITY_RANK[affordability_tier(c.max_credit)]
+        )
+
+    def observe(self, c):
+        key = self.priority(c)
+        self.n0 += 1
+        if c.risk_score >= 70:
+            self.top_tier += 1
+        if self.top is None:
+            self.buckets[key].append(c.cid)
+        elif len(self.heap) < self.top:
+            heapq.heappush(self.heap, (key, -self.n0, c.cid))
+        elif key > self.heap[0][0]:
+            heapq.heappushpop(self.heap, (key, -self.n0, c.cid))
+
+    def finish(self):
+        if self.top is None:
+            buckets = self.buckets
+            ranked = ((key, cid) for key in sorted(buckets, reverse=True) for cid in buckets[key])
+        else:
+            ranked = [(key, cid) for key, _, cid in sorted(self.heap, reverse=True)]
+        return {"n0": self.n0, "immediate": min(self.top_tier, self.n0 // 5), "ranked": ranked}
+
+    def scale(self, result, rate):
+        raise ValueError("an outreach list holds one row per customer and can't be scaled from a sample")
+
+def iter_outreach_rows(ranking):
+    """Yield OUTREACH_COLUMNS rows for an OutreachMetric result."""
+    immediate = ranking["immediate"]
+    timing_names = {rank: name or "none" for name, rank in OUTREACH_TIMING_RANK.items()}
+    afford_names = {rank: name for name, rank in OUTREACH_AFFORDABILITY_RANK.items()}
+    for rank, (key, cid) in enumerate(ranking["ranked"], 1):
+        score = key // 100
+        if rank <= immediate:
+            cohort = OUTREACH_COHORTS[0]
+        else:
+            cohort = OUTREACH_COHORTS[1] if score >= 40 else OUTREACH_COHORTS[2]
+        yield rank, cid, cohort, score, risk_tier(score), timing_names[key // 10 % 10], afford_names[key % 10]
+
+def save_outreach_list(ranking, path):
+    """Write an OutreachMetric result to `path` as CSV, in batches (written atomically). Returns the row count."""
+    rows = iter_outreach_rows(ranking)
+    n = 0
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(OUTREACH_COLUMNS)
+        while batch := list(islice(rows, OUTREACH_BATCH_ROWS)):
+            writer.writerows(batch)
+            n += len(batch)
+    os.replace(tmp, path)
+    return n
+
+CUSTOMER_STORE_VERSION = 3
+CUSTOMER_STORE_BATCH_ROWS = 10_000
+CUSTOMER_STORE_COLUMNS = (
+    ("customer_id", "TEXT NOT NULL"),
+    ("bucket", "TEXT NOT NULL"),
+    ("n_tradelines", "INTEGER NOT NULL"),
+    ("acct_types", "TEXT NOT NULL"),  # comma-separated ACCT_TYPE_CDs, in numeric order
+    ("lender_type", "TEXT NOT NULL"),
+    ("max_dpd", "INTEGER NOT NULL"),
+    ("charge_off", "INTEGER NOT NULL"),
+    ("write_off", "INTEGER NOT NULL"),
+    ("has_closed", "INTEGER NOT NULL"),
+    ("risk_score", "INTEGER NOT NULL"),
+    ("risk_tier", "TEXT NOT NULL"),
+    ("risk_rules", "TEXT NOT NULL"),  # comma-separated RISK_SCORE_POINTS rules that gave risk_score
+    ("repayment_quality_pct", "REAL"),  # NULL without a payment grid; unrounded, as risk_rules compared it
+    ("max_credit", "REAL NOT NULL"),
+    ("affordability_tier", "TEXT NOT NULL"),
+    ("has_vehicle", "INTEGER NOT NULL"),
+    ("has_pl", "INTEGER NOT NULL"),
+    ("anchor_date", "TEXT"),  # most recent dated vehicle loan
+    ("first_timer", "INTEGER NOT NULL"),
+    ("pre_existing_pl", "INTEGER NOT NULL"),  # a PL opened before anchor + 30 days
+    ("first_pl_date", "TEXT"),  # first PL >= 1 month after the anchor
+    ("first_pl_delta_m", "INTEGER"),
+    ("months_since_anchor", "INTEGER"),
+    ("timing_flag", "TEXT"),
+)
+CUSTOMER_STORE_INDEXES = {
+    "customers_id": "UNIQUE INDEX customers_id ON customers (customer_id)",
+    "customers_bucket": "INDEX customers_bucket ON customers (bucket, timing_flag, risk_score)",
+    "customers_timing": "INDEX customers_timing ON customers (timing_flag, risk_score)",
+    "customers_lender": "INDEX customers_lender ON customers (lender_type, bucket)",
+}
+
+class CustomerStoreMetric(Metric):
+    """
+    Per-customer derived state written to an indexed SQLite file by
+    --customer-store, for "why is customer X in Bucket D?" lookups and segment
+    scans (scripts/query_customer_store.py). Rows are bulk-inserted in batches
+    of CUSTOMER_STORE_BATCH_ROWS as customers are observed, so memory stays
+    bounded (and --stream works); the indexes are built once at the end, which
+    is much faster than maintaining them per insert. The file is written next
+    to `path` (opened with the first batch) and swapped in by finish(); close()
+    removes it if the run stops before that. Not registered: holds CUSTOMER_IDs.
+    """
+
+    name = "customer_store"
+
+    def __init__(self, ctx, path):
+        super().__init__(ctx)
+        self.path = path
+        self.tmp = f"{path}.tmp"
+        self.db = None
+        self.insert = f"INSERT INTO customers VALUES ({', '.join('?' * len(CUSTOMER_STORE_COLUMNS))})"
+        self.batch = []
+        self.rows = 0
+
+    def _open(self):
+        if os.path.exists(self.tmp):
+            os.remove(self.tmp)
+        self.db = sqlite3.connect(self.tmp)
+        # A fresh file swapped in at the end: no journal or fsync needed while building it
+        self.db.execute("PRAGMA journal_mode = OFF")
+        self.db.execute("PRAGMA synchronous = OFF")
+        self.db.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self.db.execute(f"CREATE TABLE customers ({', '.join(f'{name} {kind}' for name, kind in CUSTOMER_STORE_COLUMNS)})")
+
+    def observe(self, c):
+        anchor = c.anchor_ord
+        self.batch.append(
+            (
+                c.cid,
+                c.bucket,
+                c.n_tradelines,
+                ",".join(sorted(c.acct_types, key=lambda code: (len(code), code))),
+                c.lender_type,
+                c.max_dpd,
+                c.charge_off,
+                c.write_off,
+                c.has_closed,
+                c.risk_score,
+                risk_tier(c.risk_score),
+                ",".join(risk_score_rules(c.max_dpd, c.charge_off, c.write_off, c.rq_pct, c.n_tradelines)),
+                c.rq_pct,
+                c.max_credit,
+                affordability_tier(c.max_credit),
+                c.has_vehicle,
+                c.has_pl,
+                _date_from_ordinal(anchor).isoformat() if anchor else None,
+                c.first_timer,
+                bool(c.pl_flags & TimingEngine.PRE_EXISTING_PL),
+                _date_from_ordinal(c.first_pl_ord).isoformat() if c.first_pl_ord else None,
+                c.first_pl_delta_m,
+                c.months_since_anchor,
+                c.timing_flag,
+            )
+        )
+        if len(self.batch) >= CUSTOMER_STORE_BATCH_ROWS:
+            self.flush()
+
+    def flush(self):
+        if self.db is None:
+            self._open()
+        self.db.executemany(self.insert, self.batch)
+        self.rows += len(self.batch)
+        self.batch.clear()
+
+    def finish(self):
+        self.flush()
+        meta = {"version": CUSTOMER_STORE_VERSION, "bureauDate": self.ctx.bureau_date.isoformat(), "customers": self.rows}
+        self.db.executemany("INSERT INTO meta VALUES (?, ?)", [(k, str(v)) for k, v in meta.items()])
+        for index in CUSTOMER_STORE_INDEXES.values():
+            self.db.execute(f"CREATE {index}")
+        self.db.execute("ANALYZE")
+        self.db.commit()
+        self.db.close()
+        self.db = None
+        os.replace(self.tmp, self.path)
+        return {"path": self.path, "customers": self.rows}
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+        if os.path.exists(self.tmp):
+            os.remove(self.tmp)
+
+    def scale(self, result, rate):
+        raise ValueError("a customer store holds one row per customer and can't be built from a sample")
+
+class SnapshotMetric(Metric):
+    """
+    Bucket and golden-window membership per CUSTOMER_ID, for the month-over-month
+    changes between BUREAU_DATE snapshots (see snapshot_changes). Not
+    registered: compute_snapshots() runs it on every snapshot.
+    """
+
+    name = "snapshot"
+    BUCKETS = "ABCD"
+    GOLDEN = 1  # code = bucket index << 1 | GOLDEN
+
+    def __init__(self, ctx):
+        super().__init__(ctx)
+        self.codes = {}
+
+    def observe(self, c):
+        self.codes[c.cid] = self.BUCKETS.index(c.bucket) << 1 | (self.GOLDEN if c.timing_flag == "golden_window" else 0)
+
+    def finish(self):
+        return self.codes
+
+def snapshot_summary(codes):
+    """Bucket sizes and golden-window count of a SnapshotMetric result."""
+    buckets = dict.fromkeys(SnapshotMetric.BUCKETS, 0)
+    golden = 0
+    for code in codes.values():
+        buckets[SnapshotMetric.BUCKETS[code >> 1]] += 1
+        golden += code & SnapshotMetric.GOLDEN
+    return {"buckets": buckets, "goldenWindow": golden}
+
+def snapshot_changes(prev, cur):
+    """
+    Month-over-month changes between two SnapshotMetric results: customers
+    kept / new / lost, bucket migration of the customers in both (non-zero
+    cells only) and golden-window entries and exits.
+    """
+    buckets = SnapshotMetric.BUCKETS
+    golden = SnapshotMetric.GOLDEN
+    migration = defaultdict(int)
+    both = entered = exited = new_in_window = 0
+    for cid, code in cur.items():
+        before = prev.get(cid)
+        if before is None:
+            new_in_window += code & golden
+            continue
+        both += 1
+        migration[before >> 1, code >> 1] += 1
+        if code & golden and not before & golden:
+            entered += 1
+        elif before & golden and not code & golden:
+            exited += 1
+    return {
+        "customers": {"both": both, "new": len(cur) - both, "lost": len(prev) - both},
+        "bucketMigration": [
+            {"from": buckets[a], "to": buckets[b], "customers": n} for (a, b), n in sorted(migration.items())
+        ],
+        "goldenWindow": {"entered": entered, "exited": exited, "newCustomersInWindow": new_in_window},
+    }
+
+def run_metrics(views, metrics):
+    """The fused pass: feed every customer view to every metric, once."""
+    observers = [m.observe for m in metrics]
+    try:
+        for c in views:
+            for observe in observers:
+                observe(c)
+        return {m.name: m.finish() for m in metrics}
+    finally:
+        for m in metrics:
+            m.close()
+
+def compute_outputs(state, extra_metrics=(), stats=None, results=None, sample_rate=None):
+    """
+    Finalize RUN 1-5 on an ingested state; returns {json file stem: payload}.
+
+    All registered METRICS (plus `extra_metrics`, callables taking a
+    FinalizeContext) share a single pass over the customers. Stage timings are
+    recorded on `stats` (a RunStats) and every metric's raw result is added to
+    the `results` dict, when given. With `sample_rate`, the state holds that
+    share of customers (see sample_rows): payload counts are scaled up and a
+    `sample` payload carries confidence intervals for the headline metrics.
+    """
+    stats = stats or RunStats()
     # Use single bureau date for "months since" (use latest seen)
+    bureau_date_global = state.bureau_date
     if not bureau_date_global:
         bureau_date_global = datetime.now().date()
+    ctx = FinalizeContext(bureau_date_global, sample_rate=sample_rate, ingest_counts=state.ingest_counts)
+
+    with stats.stage("timing_engine", rows=state.tradelines.n_tradelines):
+        timing_engine = TimingEngine(state.tradelines)
+    views = iter_customer_views(state, timing_engine, ctx.bureau_ord)
+    return finalize_views(views, ctx, extra_metrics, stats, results)
+
+def compute_snapshots(states, extra_metrics=(), stats=None, results=None):
+    """
+    Finalize RUN 1-5 on every snapshot of ingest_snapshots(), oldest first.
+
+    Returns ({bureau date: outputs}, trends payload). `extra_metrics` run and
+    `results` are filled for the latest snapshot only. The trends payload has
+    the overview numbers, bucket sizes and golden-window count of each snapshot
+    plus the changes (snapshot_changes, and the overview deltas) between
+    consecutive ones.
+    """
+    stats = stats or RunStats()
+    latest = next(reversed(states))
+    snapshot_outputs = {}
+    snapshots = []
+    changes = []
+    prev = None
+    for bureau_dt, state in states.items():
+        last = bureau_dt == latest
+        snapshot_results = results if last and results is not None else {}
+        outputs = compute_outputs(state, (*extra_metrics, SnapshotMetric) if last else (SnapshotMetric,), stats, snapshot_results)
+        codes = snapshot_results.pop("snapshot")
+        overview = outputs["overview"]
+        snapshots.append(dict(overview, **snapshot_summary(codes)))
+        if prev is not None:
+            prev_overview, prev_codes = prev
+            change = {"from": prev_overview["bureauDate"], "to": overview["bureauDate"]}
+            change.update(snapshot_changes(prev_codes, codes))
+            change["overviewDelta"] = {
+                k: round(v - prev_overview[k], 2) for k, v in overview.items() if isinstance(v, (int, float))
+            }
+            changes.append(change)
+        prev = overview, codes
+        snapshot_outputs[bureau_dt] = outputs
+    return snapshot_outputs, {"snapshots": snapshots, "changes": changes}
+
+def finalize_views(views, ctx, extra_metrics=(), stats=None, results=None, stage="metrics"):
+    """Run the metric pass over `views` and build the payloads (see compute_outputs)."""
+    stats = stats or RunStats()
+    metrics = [cls(ctx) for cls in (*METRICS, *extra_metrics)]
+    with stats.stage(stage) as entry:
+        metric_results = run_metrics(views, metrics)
+        entry["rows"] = metric_results["population"]["n0"]
+    if results is not None:
+        results.update(metric_results)
+    rate = ctx.sample_rate
+    with stats.stage("payloads"):
+        scaled = {m.name: m.scale(metric_results[m.name], rate) for m in metrics} if rate else metric_results
+        outputs = build_payloads(scaled, ctx)
+        if rate:
+            outputs["overview"]["sampleRate"] = rate
+            outputs["sample"] = sample_payload(metric_results, outputs, rate)
+    for m in metrics:
+        if m.output:
+            outputs[m.output] = scaled[m.name]
+    return outputs
+
+Z_95 = 1.959964
+
+def count_interval(k, rate):
+    """
+    95% interval for a customer count estimated as k / rate from k sampled
+    customers (each kept independently with probability `rate`).
+    """
+    estimate = k / rate
+    half = Z_95 * math.sqrt(k * (1 - rate)) / rate
+    high = estimate + half if k else 3 / rate  # rule of three when none were sampled
+    return [max(0, round(estimate - half)), round(high)]
+
+def share_interval(k, n, rate):
+    """95% interval (in %) for the share k / n of sampled customers, with the finite population correction."""
+    if not n:
+        return [0.0, 100.0]
+    share = k / n
+    half = Z_95 * math.sqrt(share * (1 - share) / n * (1 - rate))
+    return [round(100 * max(0.0, share - half), 2), round(100 * min(1.0, share + half), 2)]
+
+def sample_payload(results, outputs, rate):
+    """Headline estimates of a sampled run (values as in overview.json) with 95% confidence intervals."""
+    population = results["population"]
+    ttnp = results["time_to_next_pl"]
+    n0 = population["n0"]
+    sam = monetisation_payload(n0, population["bucket_counts"]["D"], population["thin_file"], results["serviceable"])
+    overview = outputs["overview"]
+    counts = {
+        "totalCustomers": n0,
+        "serviceableBase": sam["tamWaterfall"][-1]["value"],
+        "goldenWindowCurveA": ttnp["golden_window_a"],
+        "goldenWindowCurveB": ttnp["golden_window_b"],
+        "customersInGoldenWindowNow": results["timing"]["timing_flags"]["golden_window"],
+    }
+    estimates = {name: {"value": overview[name], "sampled": k, "ci95": count_interval(k, rate)} for name, k in counts.items()}
+    estimates["plPenetrationRate"] = {
+        "value": overview["plPenetrationRate"],
+        "sampled": population["has_pl"],
+        "ci95": share_interval(population["has_pl"], n0, rate),
+    }
+    return {"sampleRate": rate, "sampledCustomers": n0, "confidence": 0.95, "estimates": estimates}
 
-    # --- RUN 1: Buckets ---
-    bucket_counts = defaultdict(int)
-    lender_type_counts = defaultdict(int)
-    product_mix = defaultdict(int)  # vehicle_only, vehicle_pl, multi
-
-    for cid in cust_tradelines:
-        # Lender type: NBF / PVT / PUB / mixed
-        m_subs = cust_m_sub_ids[cid]
-        nbf = sum(1 for m in m_subs if m == "NBF")
-        pvt = sum(1 for m in m_subs if m == "PVT")
-        pub = sum(1 for m in m_subs if m == "PUB")
-        if nbf and not pvt and not pub:
-            lender_type_counts["NBF"] += 1
-        elif pvt and not nbf and not pub:
-            lender_type_counts["PVT"] += 1
-        elif pub and not nbf and not pvt:
-            lender_type_counts["PUB"] += 1
-        else:
-            lender_type_counts["Mixed"] += 1
-
-        # Product mix
-        has_v = cid in cust_has_vehicle
-        has_pl = cid in cust_has_pl
-        types = cust_acct_types[cid]
-        if has_v and has_pl:
-            product_mix["vehicle_and_pl"] += 1
-        elif has_v:
-            product_mix["vehicle_only"] += 1
-        else:
-            product_mix["other"] += 1
-
-        # Bucket
-        max_dpd = cust_max_dpd[cid]
-        charge_off = cid in cust_has_charge_off
-        write_off = cid in cust_has_write_off
-        has_closed = bool(cust_closed_dt[cid])
-
-        if charge_off or write_off or max_dpd >= 180:
-            bucket = "D"
-        elif max_dpd > 30 and max_dpd < 180:
-            bucket = "C"
-        elif has_closed and max_dpd <= 30:
-            bucket = "B"
+# --- Streaming mode: input sorted by CUSTOMER_ID, one customer in memory at a time ---
+
+SORT_CHUNK_ROWS = 250_000
+
+def _cid_key(row):
+    return row[0].strip()
+
+def last_bureau_date(rows):
+    """The BUREAU_DATE a full ingest would settle on: the last parseable one on a row with a CUSTOMER_ID."""
+    last = None
+    for cid, bureau_s in rows:
+        if cid.strip():
+            bureau_dt = parse_bureau_dt_cached(bureau_s)
+            if bureau_dt:
+                last = bureau_dt
+    return last
+
+def scan_bureau_date(path):
+    """last_bureau_date() of a CSV (or parts), reading only CUSTOMER_ID and BUREAU_DATE."""
+    with open_input(path) as f:
+        return last_bureau_date(iter_projected_rows(f, columns=("CUSTOMER_ID", "BUREAU_DATE")))
+
+class ExternalSort:
+    """
+    External merge sort of a CSV's projected rows by CUSTOMER_ID.
+
+    On enter, the input is read in chunks of `chunk_rows` rows; each chunk is
+    sorted and written to a temporary run file. Iterating then k-way merges the
+    runs. Both sorts are stable, so a customer's rows keep their input order.
+    Memory is bounded by one chunk. The BUREAU_DATE a full ingest would use is
+    recorded on the way through as `bureau_date`. Run files carry each row's
+    input row number, and `position` is that of the row last yielded.
+    """
+
+    def __init__(self, path, tmp_dir=None, chunk_rows=SORT_CHUNK_ROWS):
+        self.path = path
+        self.tmp_dir = tmp_dir
+        self.chunk_rows = chunk_rows
+        self.runs = []
+        self.rows = 0
+        self.bureau_date = None
+        self.position = None
+
+    def __enter__(self):
+        self._tmp = tempfile.TemporaryDirectory(prefix="scrub-sort-", dir=self.tmp_dir)
+        try:
+            self._write_runs()
+        except BaseException:
+            self._tmp.cleanup()
+            raise
+        return self
+
+    def _write_runs(self):
+        with open_input(self.path) as f:
+            rows = iter_projected_rows(f)
+            while True:
+                chunk = [(*row, n) for n, row in zip(range(self.rows, self.rows + self.chunk_rows), rows)]
+                if not chunk:
+                    break
+                self.rows += len(chunk)
+                self.bureau_date = last_bureau_date((row[0], row[2]) for row in chunk) or self.bureau_date
+                chunk.sort(key=_cid_key)
+                run_path = os.path.join(self._tmp.name, f"run{len(self.runs):05d}.csv")
+                with open(run_path, "w", newline="", encoding="utf-8") as out:
+                    csv.writer(out).writerows(chunk)
+                self.runs.append(run_path)
+                del chunk
+
+    def __iter__(self):
+        files = [open(run, "r", newline="", encoding="utf-8") for run in self.runs]
+        try:
+            for row in heapq.merge(*map(csv.reader, files), key=_cid_key):
+                self.position = int(row.pop())
+                yield row
+        finally:
+            for f in files:
+                f.close()
+
+    def __exit__(self, *exc):
+        self._tmp.cleanup()
+
+def _require_sorted(tradelines, path):
+    """
+    Pass-through of tradeline tuples that stops the run at the first CUSTOMER_ID
+    sorting before the one ahead of it: a streamed customer must be complete when
+    its rows end, and sorted input guarantees that without remembering anyone.
+    """
+    prev = ""
+    for row in tradelines:
+        cid = row[0]
+        if cid < prev:
+            raise SystemExit(
+                f"{path}: CUSTOMER_ID {cid!r} comes after {prev!r}; --stream needs input sorted by CUSTOMER_ID "
+                "(use --external-sort)"
+            )
+        prev = cid
+        yield row
+
+def iter_grouped_views(tradelines, bureau_ord, position=None):
+    """
+    Yield a CustomerView per run of consecutive tradeline tuples sharing a
+    CUSTOMER_ID. One scratch CustomerState is cleared and refilled per customer,
+    so only that customer's state is alive at any time. A customer's first_seen
+    is `position()`, called once their first row has been read (ExternalSort's
+    input row number), or else their rank in arrival order.
+    """
+    state = CustomerState()
+    acct_names = state.tradelines.acct_names
+    kinds = TimingEngine.acct_kinds(acct_names)
+    for rank, (_, group) in enumerate(groupby(tradelines, key=itemgetter(0))):
+        # groupby has read exactly the group's first row, and nothing upstream reads ahead
+        first_seen = position() if position else rank
+        state.clear()
+        state.ingest(group)
+        if len(kinds[0]) != len(acct_names):  # account type codes persist across clear()
+            kinds = TimingEngine.acct_kinds(acct_names)
+        yield from iter_customer_views(state, TimingEngine(state.tradelines, kinds), bureau_ord, first_seen)
+
+def stream_csv(
+    path,
+    extra_metrics=(),
+    stats=None,
+    results=None,
+    sort=False,
+    tmp_dir=None,
+    chunk_rows=SORT_CHUNK_ROWS,
+    bureau_date=None,
+    sample=None,
+    gate=None,
+):
+    """
+    Streaming counterpart of ingest_csv() + compute_outputs(): returns
+    (outputs, ingest counts). With sort, the input is put through an
+    ExternalSort first; otherwise it must already be sorted by CUSTOMER_ID and,
+    unless `bureau_date` is given, is read once more up front for BUREAU_DATE.
+    `sample` keeps a share of customers as in ingest_csv(); a QualityGate
+    `gate` checks the column rates and bureau age as rows stream in, and on
+    the final counts.
+    """
+    stats = stats or RunStats()
+    counts = new_ingest_counts()
+    position = None
+    with ExitStack() as stack:
+        if sort:
+            with stats.stage("sort") as entry:
+                rows = sorter = stack.enter_context(ExternalSort(path, tmp_dir, chunk_rows))
+                entry["rows"] = rows.rows
+            bureau_date = bureau_date or rows.bureau_date
+            position = lambda: sorter.position  # noqa: E731
         else:
-            bucket = "A"
+            if bureau_date is None:
+                with stats.stage("scan_bureau_date"):
+                    bureau_date = scan_bureau_date(path)
+            rows = iter_projected_rows(stack.enter_context(open_input(path)))
+        if sample:
+            rows = sample_rows(rows, sample)
+        if gate:
+            gate.bureau_date = bureau_date
+        tradelines = iter_tradelines(rows, counts, gate)
+        if not sort:
+            tradelines = _require_sorted(tradelines, path)
+        outputs = stream_outputs(tradelines, bureau_date, extra_metrics, stats, results, sample, counts, position)
+    if gate:
+        gate.finish(counts)
+    return outputs, counts
+
+def stream_outputs(
+    tradelines, bureau_date, extra_metrics=(), stats=None, results=None, sample_rate=None, ingest_counts=None, position=None
+):
+    """
+    compute_outputs() for tradeline tuples grouped by CUSTOMER_ID, folding each
+    customer into the metrics as soon as its group ends. `bureau_date` must be
+    known up front (see scan_bureau_date / ExternalSort.bureau_date), since
+    timing is resolved per customer. `position` is as for iter_grouped_views.
+    """
+    ctx = FinalizeContext(bureau_date or datetime.now().date(), sample_rate=sample_rate, ingest_counts=ingest_counts)
+    views = iter_grouped_views(tradelines, ctx.bureau_ord, position)
+    return finalize_views(views, ctx, extra_metrics, stats, results, stage="stream")
+
+def monetisation_payload(n0, bucket_d, thin_file, segments, assumptions=RUN5_ASSUMPTIONS):
+    """
+    RUN 5 TAM waterfall, SAM segments, revenue model and AUM projection.
+
+    `segments` holds pl_eligible / lac_eligible / deferred / excluded counts
+    (ServiceableMetric's result) computed under the same `assumptions`.
+    """
+    a = assumptions
+    sam = n0 - bucket_d - thin_file
+    sam = max(0, sam)
 
-        bucket_counts[bucket] += 1
-        cust_bucket[cid] = bucket
+    pl_eligible = segments["pl_eligible"]
+    lac_eligible = segments["lac_eligible"]
+    disbursals_pl = int(pl_eligible * a["demand_rate_pl"] * a["take_rate_pl"])
+    disbursals_lac = int(lac_eligible * a["demand_rate_lac"] * a["take_rate_lac"])
 
-    n0 = len(cust_tradelines)
-    avg_tl = sum(len(v) for v in cust_tradelines.values()) / n0 if n0 else 0
+    pl_aum_year1 = disbursals_pl * a["avg_ticket_pl"] * (a["avg_tenor_pl_months"] / 12.0 * a["prepayment_adj_pl"])
+    pl_revenue_yr1 = pl_aum_year1 * a["net_margin_pl"]
+    lac_aum_year1 = disbursals_lac * a["avg_ticket_lac"] * (a["avg_tenor_lac_months"] / 12.0 * a["prepayment_adj_lac"])
+    lac_revenue_yr1 = lac_aum_year1 * a["net_margin_lac"]
 
-    # --- RUN 2: Time-to-next-PL (Curve A and B) ---
-    # Curve A: all with vehicle + at least one PL after vehicle; delta months = PL_open - vehicle_open (most recent vehicle)
-    # Curve B: first-timers only (first ever tradeline = vehicle)
-    curve_a_months = []  # list of delta months (>0 only, post-vehicle PL)
-    curve_b_months = []
-    golden_window_a = 0
-    golden_window_b = 0
-
-    month0_customers = 0
-    pre_existing_pl_customers = 0
-    vehicle_pl_base = 0
-    first_pl_post_vehicle_month = {}  # cid -> date of first PL after vehicle (delta > 0)
-
-    for cid in cust_has_vehicle:
-        vehicle_dts = sorted(cust_vehicle_open_dts[cid], reverse=True)
-        if not vehicle_dts:
-            continue
-        anchor_dt = vehicle_dts[0]
-        first_timer = cust_first_tradeline_dt.get(cid) == anchor_dt
+    total_aum_year1 = pl_aum_year1 + lac_aum_year1
+    total_net_revenue_yr1 = pl_revenue_yr1 + lac_revenue_yr1
 
-        pls = sorted(cust_pl_open_dts.get(cid, []))
-        if not pls:
-            continue
+    # AUM at month 6, 12, 24 (simplified: 6 = ~50% of year-1 runout, 12 = full year-1, 24 = year-1 + year-2 same volume)
+    aum_month6 = total_aum_year1 * 0.5
+    aum_month12 = total_aum_year1
+    aum_month24 = total_aum_year1 * 2.0
 
-        vehicle_pl_base += 1
+    tam_waterfall = [
+        {"stage": "Total customers (N0)", "value": n0, "type": "start"},
+        {"stage": "Less: Bucket D (bad)", "value": -bucket_d, "type": "minus"},
+        {"stage": f"Less: Thin file (<{a['min_tradelines']} tradelines)", "value": -thin_file, "type": "minus"},
+        {"stage": "Serviceable base (SAM)", "value": sam, "type": "total"},
+    ]
 
-        has_month0 = False
-        has_pre_existing = False
-        best_delta_m = None
-        best_pl_dt = None
+    revenue_model = {
+        "pl": {
+            "avgTicketInr": a["avg_ticket_pl"],
+            "avgTenorMonths": a["avg_tenor_pl_months"],
+            "yieldPct": a["yield_pl_pct"],
+            "creditCostPct": a["credit_cost_pl_pct"],
+            "netMarginPct": round(a["net_margin_pl"] * 100, 1),
+            "prepaymentAdj": a["prepayment_adj_pl"],
+            "disbursalsCount": disbursals_pl,
+            "aumYear1Inr": round(pl_aum_year1, 0),
+            "revenueYear1Inr": round(pl_revenue_yr1, 0),
+        },
+        "lac": {
+            "avgTicketInr": a["avg_ticket_lac"],
+            "avgTenorMonths": a["avg_tenor_lac_months"],
+            "yieldPct": a["yield_lac_pct"],
+            "creditCostPct": a["credit_cost_lac_pct"],
+            "netMarginPct": round(a["net_margin_lac"] * 100, 1),
+            "prepaymentAdj": a["prepayment_adj_lac"],
+            "disbursalsCount": disbursals_lac,
+            "aumYear1Inr": round(lac_aum_year1, 0),
+            "revenueYear1Inr": round(lac_revenue_yr1, 0),
+        },
+        "totalAumYear1Inr": round(total_aum_year1, 0),
+        "totalNetRevenueYear1Inr": round(total_net_revenue_yr1, 0),
+    }
 
-        for pl_dt in pls:
-            delta_days = (pl_dt - anchor_dt).days
-            delta_m = floor(delta_days / 30)
-            if delta_m <= 0:
-                has_pre_existing = True
-                if delta_m == 0:
-                    has_month0 = True
-                continue
-            if best_delta_m is None or delta_m < best_delta_m:
-                best_delta_m = delta_m
-                best_pl_dt = pl_dt
+    sam_segments = {
+        "plEligible": pl_eligible,
+        "lacEligible": lac_eligible,
+        "deferred": segments["deferred"],
+        "excluded": segments["excluded"],
+    }
 
-        if has_month0:
-            month0_customers += 1
-        if has_pre_existing:
-            pre_existing_pl_customers += 1
+    aum_projection = [
+        {"month": 6, "aumInr": round(aum_month6, 0), "label": "Month 6"},
+        {"month": 12, "aumInr": round(aum_month12, 0), "label": "Month 12"},
+        {"month": 24, "aumInr": round(aum_month24, 0), "label": "Month 24"},
+    ]
 
-        if best_delta_m is None or best_pl_dt is None:
-            continue
+    return {
+        "tamWaterfall": tam_waterfall,
+        "samSegments": sam_segments,
+        "revenueModel": revenue_model,
+        "aumProjection": aum_projection,
+    }
 
-        first_pl_post_vehicle_month[cid] = best_pl_dt
+def build_payloads(results, ctx):
+    """Turn metric results into the dashboard JSON payloads."""
+    bureau_date_global = ctx.bureau_date
+    population = results["population"]
+    n0 = population["n0"]
+    avg_tl = population["n_tradelines"] / n0 if n0 else 0
+    bucket_counts = population["bucket_counts"]
+    lender_type_counts = population["lender_type_counts"]
+    product_mix = population["product_mix"]
 
-        curve_a_months.append(best_delta_m)
-        if first_timer:
-            curve_b_months.append(best_delta_m)
-        if 2 <= best_delta_m <= 10:
-            if first_timer:
-                golden_window_b += 1
-            golden_window_a += 1
+    # --- RUN 2: Time-to-next-PL (Curve A and B) ---
+    ttnp = results["time_to_next_pl"]
+    golden_window_a = ttnp["golden_window_a"]
+    golden_window_b = ttnp["golden_window_b"]
+    month0_customers = ttnp["month0_customers"]
+    pre_existing_pl_customers = ttnp["pre_existing_pl_customers"]
+    vehicle_pl_base = ttnp["vehicle_pl_base"]
 
     # Histogram 0..36 months
-    def hist(months_list, max_m=36):
-        h = defaultdict(int)
-        for m in months_list:
-            if m <= max_m:
-                h[m] += 1
-        return [{"months": m, "count": h[m]} for m in range(max_m + 1)]
+    def hist(month_counts, max_m=36):
+        return [{"months": m, "count": month_counts.get(m, 0)} for m in range(max_m + 1)]
 
-    curve_a_hist = hist(curve_a_months)
-    curve_b_hist = hist(curve_b_months)
+    curve_a_hist = hist(ttnp["curve_a"])
+    curve_b_hist = hist(ttnp["curve_b"])
 
     # Repayment quality distribution (buckets 0-60, 60-70, 70-80, 80-90, 90-100)
-    rq_buckets = {"0-60": 0, "60-70": 0, "70-80": 0, "80-90": 0, "90-100": 0}
-    for cid, (on_t, total) in cust_repayment_quality.items():
-        if total == 0:
-            continue
-        pct = 100.0 * on_t / total
-        if pct <= 60:
-            rq_buckets["0-60"] += 1
-        elif pct <= 70:
-            rq_buckets["60-70"] += 1
-        elif pct <= 80:
-            rq_buckets["70-80"] += 1
-        elif pct <= 90:
-            rq_buckets["80-90"] += 1
-        else:
-            rq_buckets["90-100"] += 1
+    repayment = results["repayment"]
+    repayment_quality_dist = [{"bucket": k, "customers": v} for k, v in zip(RQ_BANDS, repayment["rq_bands"])]
+    # Same bands on the most recent RECENT_GRID_MONTHS of each customer's grids
+    recent_repayment_quality_dist = [{"bucket": k, "customers": v} for k, v in zip(RQ_BANDS, repayment["recent_rq_bands"])]
 
-    repayment_quality_dist = [{"bucket": k, "customers": v} for k, v in rq_buckets.items()]
+    # Grid delinquency: longest run of delinquent months and worst DPD bucket per customer
+    delinquent_streak_dist = [{"streak": k, "customers": v} for k, v in repayment["streak_buckets"].items()]
+    worst_dpd_bucket_dist = [{"bucket": b, "customers": v} for b, v in enumerate(repayment["worst_bucket_counts"])]
 
     # Credit velocity: % with 2+ accounts in last 12 months
-    velocity_2plus = sum(1 for cid, c in cust_open_last_12m.items() if c >= 2)
-    velocity_1 = sum(1 for cid, c in cust_open_last_12m.items() if c == 1)
-    velocity_0 = n0 - velocity_1 - velocity_2plus
+    velocity_0, velocity_1, velocity_2plus = results["credit_velocity"]
 
     # --- RUN 3: Risk (simplified composite) ---
-    risk_buckets = {"0-39": 0, "40-69": 0, "70-100": 0}
-    affordability_buckets = {"micro": 0, "mid": 0, "mass": 0, "affluent": 0}
-    cust_risk_score = {}
-
-    for cid in cust_tradelines:
-        score = 50
-        if cust_max_dpd[cid] == 0 and cid not in cust_has_charge_off and cid not in cust_has_write_off:
-            score += 40
-        if cust_repayment_quality.get(cid, (0, 0))[1] and 100.0 * cust_repayment_quality[cid][0] / cust_repayment_quality[cid][1] > 90:
-            score += 20
-        if len(cust_tradelines[cid]) == 1:
-            score -= 10
-        if cid in cust_has_charge_off or cid in cust_has_write_off:
-            score -= 40
-        elif cust_max_dpd[cid] >= 90:
-            score -= 30
-        elif cust_max_dpd[cid] > 0:
-            score -= 10
-        score = max(0, min(100, score))
-        cust_risk_score[cid] = score
-
-        if score < 40:
-            risk_buckets["0-39"] += 1
-        elif score < 70:
-            risk_buckets["40-69"] += 1
-        else:
-            risk_buckets["70-100"] += 1
-
-        cap = cust_max_credit[cid]
-        if cap < 50000:
-            affordability_buckets["micro"] += 1
-        elif cap < 200000:
-            affordability_buckets["mid"] += 1
-        elif cap < 1000000:
-            affordability_buckets["mass"] += 1
-        else:
-            affordability_buckets["affluent"] += 1
-
+    risk_buckets = results["risk"]["risk_buckets"]
     risk_dist = [{"tier": k, "customers": v} for k, v in risk_buckets.items()]
-    affordability_dist = [{"tier": k, "customers": v} for k, v in affordability_buckets.items()]
+    affordability_dist = [{"tier": k, "customers": v} for k, v in results["risk"]["affordability_buckets"].items()]
 
     # --- RUN 4: Timing ---
-    timing_flags = {"golden_window": 0, "milestone": 0, "early": 0, "dormant": 0}
-    months_since_car_hist = defaultdict(int)
-    for cid in cust_has_vehicle:
-        vehicle_dts = sorted(cust_vehicle_open_dts[cid], reverse=True)
-        if not vehicle_dts:
-            continue
-        anchor_dt = vehicle_dts[0]
-        delta_days = (bureau_date_global - anchor_dt).days
-        if delta_days < 0:
-            continue
-        delta_m = floor(delta_days / 30)
-        months_since_car_hist[min(delta_m, 36)] += 1
-        if 2 <= delta_m <= 10:
-            timing_flags["golden_window"] += 1
-        elif 10 < delta_m <= 18:
-            timing_flags["milestone"] += 1
-        elif delta_m < 2:
-            timing_flags["early"] += 1
-        else:
-            timing_flags["dormant"] += 1
-
+    timing_flags = results["timing"]["timing_flags"]
+    months_since_car_hist = results["timing"]["months_since_car_hist"]
     timing_dist = [{"flag": k, "customers": v} for k, v in timing_flags.items()]
     months_since_car_dist = [{"months": m, "customers": months_since_car_hist[m]} for m in range(37)]
 
     # Seasonal: PL open month index (1-12), using only first PL AFTER vehicle per customer
     pl_month_counts = defaultdict(int)
-    for d in first_pl_post_vehicle_month.values():
-        pl_month_counts[d.month] += 1
+    for pl_ord, n in ttnp["first_pl_post_vehicle_ords"].items():
+        pl_month_counts[date.fromordinal(pl_ord).month] += n
     total_pl_opens = sum(pl_month_counts.values()) or 1
     seasonal_index = [{"month": m, "monthName": datetime(2000, m, 1).strftime("%b"), "index": round(12 * pl_month_counts[m] / total_pl_opens, 2)} for m in range(1, 13)]
 
     # --- Data quality summary metrics ---
-    anchor_none = n0 - len(cust_has_vehicle)
-    anchor_inferred = len(cust_has_vehicle)
+    anchor_none = n0 - population["has_vehicle"]
+    anchor_inferred = population["has_vehicle"]
     anchor_confirmed = 0  # we don't have partner code mapping yet
     anchor_ambiguous = 0  # not modelled separately in this bureau-only run
 
@@ -369,21 +3166,13 @@ def main():
     pre_existing_pl_pct = round(100.0 * pre_existing_pl_customers / vehicle_pl_base, 2) if vehicle_pl_base else 0.0
 
     # Bureau freshness: age of BUREAU_DATE vs today
-    today = datetime.now().date()
+    today = ctx.today
     age_days = (today - bureau_date_global).days if bureau_date_global else 0
     bureau_fresh_pct = 0.0 if age_days > 90 else 100.0
 
     # Repayment quality vs Bucket D consistency
-    bucket_d_ids = {cid for cid, b in cust_bucket.items() if b == "D"}
-    high_quality_ids = set()
-    for cid, (on_t, total) in cust_repayment_quality.items():
-        if total == 0:
-            continue
-        pct = 100.0 * on_t / total
-        if pct >= 80.0:
-            high_quality_ids.add(cid)
-    bucket_d_high_quality = len(bucket_d_ids & high_quality_ids)
-    bucket_d_total = len(bucket_d_ids)
+    bucket_d_high_quality = repayment["bucket_d_high_quality"]
+    bucket_d_total = repayment["bucket_d_total"]
     bucket_d_high_quality_pct = round(100.0 * bucket_d_high_quality / bucket_d_total, 2) if bucket_d_total else 0.0
     repayment_bucket_consistent = bucket_d_high_quality_pct < 5.0
 
@@ -466,94 +3255,30 @@ def main():
         "table": data_quality_table,
     }
 
-    # --- RUN 5: TAM Waterfall and P&L ---
-    bucket_d = bucket_counts["D"]
-    thin_file = sum(1 for cid in cust_tradelines if len(cust_tradelines[cid]) < 3)
-    sam = n0 - bucket_d - thin_file
-    sam = max(0, sam)
-
-    sam_cids = {cid for cid in cust_tradelines if cust_bucket.get(cid) != "D" and len(cust_tradelines[cid]) >= 3}
-    pl_eligible = sum(1 for cid in sam_cids if cust_risk_score.get(cid, 0) >= 70)
-    lac_eligible = sum(1 for cid in sam_cids if 40 <= cust_risk_score.get(cid, 0) < 70 and cid in cust_has_vehicle)
-    deferred = sum(1 for cid in sam_cids if 40 <= cust_risk_score.get(cid, 0) < 70 and cid not in cust_has_vehicle)
-    excluded_sam = sum(1 for cid in sam_cids if cust_risk_score.get(cid, 0) < 40)
-
-    demand_rate_pl = 0.32
-    take_rate_pl = 0.25
-    demand_rate_lac = 0.20
-    take_rate_lac = 0.35
-    disbursals_pl = int(pl_eligible * demand_rate_pl * take_rate_pl)
-    disbursals_lac = int(lac_eligible * demand_rate_lac * take_rate_lac)
-
-    # Revenue model (skill: PL 75K, 18mo, yield 24%, credit 5%, opex 3% → net 16%; LAC 1.5L, 24mo, 20%, 2%, net 15%)
-    avg_ticket_pl = 75000
-    avg_tenor_pl_months = 18
-    prepayment_adj_pl = 0.75
-    net_margin_pl = 0.16
-    pl_aum_year1 = disbursals_pl * avg_ticket_pl * (avg_tenor_pl_months / 12.0 * prepayment_adj_pl)
-    pl_revenue_yr1 = pl_aum_year1 * net_margin_pl
-
-    avg_ticket_lac = 150000
-    avg_tenor_lac_months = 24
-    prepayment_adj_lac = 0.80
-    net_margin_lac = 0.15
-    lac_aum_year1 = disbursals_lac * avg_ticket_lac * (avg_tenor_lac_months / 12.0 * prepayment_adj_lac)
-    lac_revenue_yr1 = lac_aum_year1 * net_margin_lac
-
-    total_aum_year1 = pl_aum_year1 + lac_aum_year1
-    total_net_revenue_yr1 = pl_revenue_yr1 + lac_revenue_yr1
-
-    # AUM at month 6, 12, 24 (simplified: 6 = ~50% of year-1 runout, 12 = full year-1, 24 = year-1 + year-2 same volume)
-    aum_month6 = total_aum_year1 * 0.5
-    aum_month12 = total_aum_year1
-    aum_month24 = total_aum_year1 * 2.0
-
-    tam_waterfall = [
-        {"stage": "Total customers (N0)", "value": n0, "type": "start"},
-        {"stage": "Less: Bucket D (bad)", "value": -bucket_d, "type": "minus"},
-        {"stage": "Less: Thin file (<3 tradelines)", "value": -thin_file, "type": "minus"},
-        {"stage": "Serviceable base (SAM)", "value": sam, "type": "total"},
-    ]
-
-    revenue_model = {
-        "pl": {
-            "avgTicketInr": avg_ticket_pl,
-            "avgTenorMonths": avg_tenor_pl_months,
-            "yieldPct": 24,
-            "creditCostPct": 5,
-            "netMarginPct": round(net_margin_pl * 100, 1),
-            "prepaymentAdj": prepayment_adj_pl,
-            "disbursalsCount": disbursals_pl,
-            "aumYear1Inr": round(pl_aum_year1, 0),
-            "revenueYear1Inr": round(pl_revenue_yr1, 0),
-        },
-        "lac": {
-            "avgTicketInr": avg_ticket_lac,
-            "avgTenorMonths": avg_tenor_lac_months,
-            "yieldPct": 20,
-            "creditCostPct": 2,
-            "netMarginPct": round(net_margin_lac * 100, 1),
-            "prepaymentAdj": prepayment_adj_lac,
-            "disbursalsCount": disbursals_lac,
-            "aumYear1Inr": round(lac_aum_year1, 0),
-            "revenueYear1Inr": round(lac_revenue_yr1, 0),
-        },
-        "totalAumYear1Inr": round(total_aum_year1, 0),
-        "totalNetRevenueYear1Inr": round(total_net_revenue_yr1, 0),
-    }
-
-    sam_segments = {
-        "plEligible": pl_eligible,
-        "lacEligible": lac_eligible,
-        "deferred": deferred,
-        "excluded": excluded_sam,
-    }
+    # Per-column blank / unparseable shares of the rows with a CUSTOMER_ID
+    if ctx.ingest_counts:
+        estimates = running_quality(ctx.ingest_counts)
+        column_quality = []
+        for column, suffix in QUALITY_COLUMNS:
+            row = {"column": column}
+            over = False
+            for kind in ("blank", "unparseable"):
+                k, n = estimates[f"{kind}{suffix}Pct"]
+                row[f"{kind}Pct"] = pct = round(100.0 * k / n, 2) if n else 0.0
+                over = over or pct > QUALITY_THRESHOLDS[f"{kind}{suffix}Pct"]
+            column_quality.append(row)
+            data_quality_table.append(
+                {
+                    "metric": f"{column} blank / unparseable",
+                    "value": f"{row['blankPct']}% / {row['unparseablePct']}%",
+                    "status": "CHECK" if over else "OK",
+                }
+            )
+        data_quality["columnQuality"] = column_quality
 
-    aum_projection = [
-        {"month": 6, "aumInr": round(aum_month6, 0), "label": "Month 6"},
-        {"month": 12, "aumInr": round(aum_month12, 0), "label": "Month 12"},
-        {"month": 24, "aumInr": round(aum_month24, 0), "label": "Month 24"},
-    ]
+    # --- RUN 5: TAM Waterfall and P&L ---
+    monetisation = monetisation_payload(n0, bucket_counts["D"], population["thin_file"], results["serviceable"])
+    sam = monetisation["tamWaterfall"][-1]["value"]
 
     # Outreach cohorts (simplified: by risk tier as proxy for priority)
     outreach_immediate = risk_buckets["70-100"]  # top tier
@@ -568,10 +3293,7 @@ def main():
     ]
 
     # ACCT_TYPE distribution (top types)
-    acct_type_counts = defaultdict(int)
-    for cid, types in cust_acct_types.items():
-        for t in types:
-            acct_type_counts[t] += 1
+    acct_type_counts = results["acct_types"]
     acct_type_dist = [{"acctType": k, "tradelines": v} for k, v in sorted(acct_type_counts.items(), key=lambda x: -x[1])[:12]]
 
     # Build payloads
@@ -579,69 +3301,582 @@ def main():
         "totalCustomers": n0,
         "avgTradelinesPerCustomer": round(avg_tl, 2),
         "serviceableBase": sam,
-        "plPenetrationRate": round(100.0 * len(cust_has_pl) / n0, 2) if n0 else 0,
+        "plPenetrationRate": round(100.0 * population["has_pl"] / n0, 2) if n0 else 0,
         "goldenWindowCurveA": golden_window_a,
         "goldenWindowCurveB": golden_window_b,
         "customersInGoldenWindowNow": timing_flags["golden_window"],
         "bureauDate": str(bureau_date_global),
     }
 
-    with open(os.path.join(OUT_DIR, "overview.json"), "w") as f:
-        json.dump(overview, f, indent=2)
-
-    with open(os.path.join(OUT_DIR, "data_quality.json"), "w") as f:
-        json.dump(data_quality, f, indent=2)
-
-    population = {
+    population_payload = {
         "bucketDistribution": [{"bucket": f"Bucket {k}", "customers": v, "pct": round(100.0 * v / n0, 2) if n0 else 0} for k, v in [("A", bucket_counts["A"]), ("B", bucket_counts["B"]), ("C", bucket_counts["C"]), ("D", bucket_counts["D"])]],
         "lenderTypeDistribution": [{"lenderType": k, "customers": v} for k, v in lender_type_counts.items()],
         "productMix": [{"mix": k, "customers": v} for k, v in product_mix.items()],
         "acctTypeDistribution": acct_type_dist,
     }
-    with open(os.path.join(OUT_DIR, "population.json"), "w") as f:
-        json.dump(population, f, indent=2)
 
     behaviour = {
         "timeToNextPLCurveA": curve_a_hist,
         "timeToNextPLCurveB": curve_b_hist,
         "repaymentQualityDistribution": repayment_quality_dist,
         "creditVelocity": [{"segment": "0 accounts (12m)", "customers": velocity_0}, {"segment": "1 account", "customers": velocity_1}, {"segment": "2+ accounts", "customers": velocity_2plus}],
+        "recentRepaymentQualityDistribution": recent_repayment_quality_dist,
     }
-    with open(os.path.join(OUT_DIR, "behaviour.json"), "w") as f:
-        json.dump(behaviour, f, indent=2)
 
     risk = {
         "riskTierDistribution": risk_dist,
         "affordabilityDistribution": affordability_dist,
+        "delinquentStreakDistribution": delinquent_streak_dist,
+        "worstDpdBucketDistribution": worst_dpd_bucket_dist,
     }
-    with open(os.path.join(OUT_DIR, "risk.json"), "w") as f:
-        json.dump(risk, f, indent=2)
 
     timing = {
         "timingFlagDistribution": timing_dist,
         "monthsSinceCarLoan": months_since_car_dist,
         "seasonalIndex": seasonal_index,
     }
-    with open(os.path.join(OUT_DIR, "timing.json"), "w") as f:
-        json.dump(timing, f, indent=2)
-
-    monetisation = {
-        "tamWaterfall": tam_waterfall,
-        "samSegments": sam_segments,
-        "revenueModel": revenue_model,
-        "aumProjection": aum_projection,
-    }
-    with open(os.path.join(OUT_DIR, "monetisation.json"), "w") as f:
-        json.dump(monetisation, f, indent=2)
 
     outreach = {
         "outreachCohortDistribution": outreach_dist,
     }
-    with open(os.path.join(OUT_DIR, "outreach.json"), "w") as f:
-        json.dump(outreach, f, indent=2)
 
-    print("Wrote JSON to", OUT_DIR)
-    print("N0:", n0, "SAM:", sam, "PL penetration %:", overview["plPenetrationRate"])
+    return {
+        "overview": overview,
+        "data_quality": data_quality,
+        "population": population_payload,
+        "behaviour": behaviour,
+        "risk": risk,
+        "timing": timing,
+        "monetisation": monetisation,
+        "outreach": outreach,
+    }
+
+# --- Run statistics (--profile) ---
+
+def _peak_rss_mb(who):
+    """Peak resident set size of this process (or its reaped children) in MB, None if unknown."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(who).ru_maxrss
+    # ru_maxrss is in bytes on macOS, kilobytes elsewhere
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def _top_allocations(limit=10):
+    snapshot = tracemalloc.take_snapshot().filter_traces((tracemalloc.Filter(False, tracemalloc.__file__),))
+    return [
+        {"location": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}", "mb": round(stat.size / (1024 * 1024), 2), "blocks": stat.count}
+        for stat in snapshot.statistics("lineno")[:limit]
+    ]
+
+class RunStats:
+    """
+    Per-stage wall time, throughput and memory of one run, written as run_stats.json.
+
+    Each `with stats.stage(name, rows=N):` block appends a stage record; `rows`
+    can also be filled in inside the block via the yielded dict once known.
+    With trace_malloc, stages also record the Python heap peak and the top
+    allocation sites still live at the end of the stage.
+    """
+
+    def __init__(self, trace_malloc=False):
+        self.stages = []
+        self.counters = {}
+        self.trace_malloc = trace_malloc
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name, rows=None):
+        entry = {"stage": name, "rows": rows}
+        if self.trace_malloc:
+            tracemalloc.reset_peak()
+        t0 = time.perf_counter()
+        cpu0 = time.process_time()
+        try:
+            yield entry
+        finally:
+            elapsed = time.perf_counter() - t0
+            entry["seconds"] = round(elapsed, 4)
+            entry["cpuSeconds"] = round(time.process_time() - cpu0, 4)
+            if entry["rows"] is not None:
+                entry["rowsPerSec"] = round(entry["rows"] / elapsed) if elapsed else None
+            else:
+                del entry["rows"]
+            entry["peakRssMb"] = _peak_rss_mb(resource.RUSAGE_SELF) if resource else None
+            entry["peakChildRssMb"] = _peak_rss_mb(resource.RUSAGE_CHILDREN) if resource else None
+            if self.trace_malloc:
+                entry["tracedPeakMb"] = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 1)
+                entry["topAllocations"] = _top_allocations()
+            self.stages.append(entry)
+
+    def as_dict(self):
+        caches = {}
+        for name, fn in (
+            ("openDt", parse_open_dt_cached),
+            ("bureauDate", parse_bureau_dt_cached),
+            ("daysPastDue", parse_dpd_checked),
+            ("paymentGrid", score_payment_grid),
+            ("dateFromOrdinal", _date_from_ordinal),
+        ):
+            info = fn.cache_info()
+            lookups = info.hits + info.misses
+            caches[name] = {
+                "hits": info.hits,
+                "misses": info.misses,
+                "hitRate": round(info.hits / lookups, 4) if lookups else None,
+                "size": info.currsize,
+            }
+        return {
+            "generatedAt": datetime.now().isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "totalSeconds": round(time.perf_counter() - self._started, 4),
+            "peakRssMb": _peak_rss_mb(resource.RUSAGE_SELF) if resource else None,
+            "peakChildRssMb": _peak_rss_mb(resource.RUSAGE_CHILDREN) if resource else None,
+            "stages": self.stages,
+            "counters": self.counters,
+            # Parser caches of this process only; with --workers most parsing happens in the children
+            "parserCaches": caches,
+        }
+
+def _cprofile_top(profiler, limit=25):
+    """Top `limit` functions of a cProfile run by cumulative time."""
+    import pstats
+
+    rows = sorted(pstats.Stats(profiler).stats.items(), key=lambda kv: kv[1][3], reverse=True)[:limit]
+    return [
+        {
+            "function": f"{os.path.basename(filename)}:{lineno}({func})",
+            "calls": ncalls,
+            "totalSeconds": round(tottime, 4),
+            "cumulativeSeconds": round(cumtime, 4),
+        }
+        for (filename, lineno, func), (_, ncalls, tottime, cumtime, _) in rows
+    ]
+
+# Outputs loaded by the browser as data rather than read by people: no indentation
+COMPACT_OUTPUTS = frozenset({"cube", "distributions"})
+
+def encode_output(name, payload):
+    if name in COMPACT_OUTPUTS:
+        return json.dumps(payload, separators=(",", ":"))
+    return json.dumps(payload, indent=2)
+
+def _write_atomic(path, data):
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+def write_outputs(outputs, out_dir, skip_unchanged=False, bundle=False):
+    """
+    Write each payload to `<out_dir>/<name>.json`, swapped in atomically so a
+    reader never sees a half-written file. With `skip_unchanged`, files whose
+    content is already current are left alone. With `bundle`, also write the
+    hashed bundle the dashboard loads (see write_bundle). Returns the names
+    written.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    written = []
+    for name, payload in outputs.items():
+        path = os.path.join(out_dir, f"{name}.json")
+        data = encode_output(name, payload).encode()
+        if skip_unchanged and os.path.exists(path):
+            with open(path, "rb") as f:
+                if f.read() == data:
+                    continue
+        _write_atomic(path, data)
+        written.append(name)
+    if bundle:
+        write_bundle(outputs, out_dir)
+    return written
+
+MANIFEST_VERSION = 1
+BUNDLE_DIR = "bundle"
+BUNDLE_HASH_CHARS = 12
+# Precompressed siblings of each bundle file, for servers that send them as-is (nginx gzip_static / brotli_static)
+BUNDLE_ENCODINGS = {"gzip": (".gz", lambda data: gzip.compress(data, compresslevel=9, mtime=0))}
+if brotli is not None:
+    BUNDLE_ENCODINGS["br"] = (".br", lambda data: brotli.compress(data, quality=11))
+
+def read_manifest(out_dir):
+    """manifest.json in `out_dir`, None when missing or of another version."""
+    try:
+        with open(os.path.join(out_dir, "manifest.json")) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return manifest if manifest.get("version") == MANIFEST_VERSION else None
+
+def write_bundle(outputs, out_dir):
+    """
+    Write compact copies of `outputs` named by content hash,
+    `<out_dir>/bundle/<name>.<sha256 prefix>.json` plus precompressed
+    siblings, and a manifest.json mapping each payload to its file and sizes.
+    A hashed file never changes, so the dashboard caches it for good and only
+    revalidates the manifest; files already there are not rewritten. Bundle
+    files referenced by neither this manifest nor the one it replaces are
+    removed, so a page opened before a refresh can still load its other views.
+    Returns the manifest.
+    """
+    bundle_dir = os.path.join(out_dir, BUNDLE_DIR)
+    os.makedirs(bundle_dir, exist_ok=True)
+    files = {}
+    for name, payload in outputs.items():
+        data = json.dumps(payload, separators=(",", ":")).encode()
+        file = f"{BUNDLE_DIR}/{name}.{hashlib.sha256(data).hexdigest()[:BUNDLE_HASH_CHARS]}.json"
+        path = os.path.join(out_dir, file)
+        entry = files[name] = {"file": file, "bytes": len(data)}
+        for encoding, (suffix, encode) in BUNDLE_ENCODINGS.items():
+            if not os.path.exists(path + suffix):
+                _write_atomic(path + suffix, encode(data))
+            entry[encoding] = os.path.getsize(path + suffix)
+        if not os.path.exists(path):
+            _write_atomic(path, data)
+    manifest = {"version": MANIFEST_VERSION, "files": files}
+
+    previous = read_manifest(out_dir)
+    if manifest == previous:
+        return manifest
+    _write_atomic(os.path.join(out_dir, "manifest.json"), json.dumps(manifest, indent=2).encode())
+    keep = {entry["file"] for m in (manifest, previous or {"files": {}}) for entry in m["files"].values()}
+    for filename in os.listdir(bundle_dir):
+        file = f"{BUNDLE_DIR}/{filename}"
+        if file not in keep and file.rsplit(".", 1)[0] not in keep:  # the .json or one of its siblings
+            os.remove(os.path.join(bundle_dir, filename))
+    return manifest
+
+def _sample_rate(value):
+    rate = float(value)
+    if not 0 < rate <= 1:
+        raise argparse.ArgumentTypeError(f"{value}: must be in (0, 1]")
+    return rate
+
+def _quality_threshold(item):
+    key, sep, value = item.partition("=")
+    if not sep or key not in QUALITY_THRESHOLDS:
+        raise argparse.ArgumentTypeError(f"{item!r}: expected CHECK=VALUE with CHECK one of {', '.join(QUALITY_THRESHOLDS)}")
+    if value == "off":
+        return key, None
+    try:
+        return key, float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"{item!r}: VALUE must be a number or 'off'") from None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compute bureau scrub dashboard JSON from a tradeline CSV.")
+    parser.add_argument(
+        "--input",
+        default=CSV_PATH,
+        help="tradeline CSV, or a quoted glob of CSV parts, each plain, .gz or .zst (default: AR_sample.csv)",
+    )
+    parser.add_argument("--out-dir", default=OUT_DIR, help="output directory (default: dashboard/public/data)")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="aggregate byte-range chunks of the CSV (or its parts, for a glob / compressed input) in N processes (default: 1)",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        metavar="PATH",
+        help="persist the per-customer aggregate state here after the run (read by --delta)",
+    )
+    parser.add_argument(
+        "--delta",
+        metavar="CSV",
+        help="upsert the customers in CSV into the --checkpoint state instead of re-reading --input; "
+        "the file must hold every current tradeline of each customer it contains",
+    )
+    parser.add_argument(
+        "--cache",
+        nargs="?",
+        const="",
+        metavar="PATH",
+        help="read --input through a binary columnar cache, building it when missing or stale "
+        "(default PATH: <input>.colcache)",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="bounded memory: finalize each customer as soon as its rows end (input must be sorted by CUSTOMER_ID)",
+    )
+    parser.add_argument(
+        "--external-sort",
+        action="store_true",
+        help="with --stream: sort --input by CUSTOMER_ID first, through temporary run files",
+    )
+    parser.add_argument(
+        "--sort-chunk-rows",
+        type=int,
+        default=SORT_CHUNK_ROWS,
+        metavar="N",
+        help=f"rows sorted in memory per run file (default: {SORT_CHUNK_ROWS})",
+    )
+    parser.add_argument("--tmp-dir", metavar="DIR", help="where --external-sort puts run files (default: system temp)")
+    parser.add_argument(
+        "--bureau-date",
+        type=date.fromisoformat,
+        metavar="YYYY-MM-DD",
+        help="with --stream: BUREAU_DATE for timing, skipping the up-front scan of grouped input",
+    )
+    parser.add_argument(
+        "--sample",
+        type=_sample_rate,
+        metavar="RATE",
+        help="quick preview: keep this share of customers (e.g. 0.01, chosen by a hash of CUSTOMER_ID), "
+        "scale the counts up and write confidence intervals to sample.json",
+    )
+    parser.add_argument(
+        "--quality-gate",
+        action="store_true",
+        help="check data quality while ingesting and abort (exit status 3, no JSON written) once a running "
+        "estimate is clearly past its CHECK limit",
+    )
+    parser.add_argument(
+        "--quality-threshold",
+        type=_quality_threshold,
+        action="append",
+        default=[],
+        metavar="CHECK=VALUE",
+        help="with --quality-gate: override a CHECK limit, or 'off' to skip the check (repeatable; checks: "
+        + ", ".join(f"{k} {'off' if v is None else v}" for k, v in QUALITY_THRESHOLDS.items())
+        + ")",
+    )
+    parser.add_argument(
+        "--resume",
+        metavar="PATH",
+        help="save the ingest progress (byte offset and partial state) here every --resume-interval seconds; "
+        "after a crash, the same command continues from it. Removed once the JSON is written",
+    )
+    parser.add_argument(
+        "--resume-interval",
+        type=float,
+        default=RESUME_INTERVAL,
+        metavar="SECONDS",
+        help=f"with --resume: seconds between saves (default: {RESUME_INTERVAL:g})",
+    )
+    parser.add_argument(
+        "--snapshots",
+        action="store_true",
+        help="--input holds several bureau pulls: split it by BUREAU_DATE in one pass. The dashboard JSON is the "
+        "latest snapshot's, every snapshot's goes to <out-dir>/snapshots/<date>/ and trends.json has "
+        "month-over-month changes (bucket migration, golden-window entries/exits)",
+    )
+    parser.add_argument(
+        "--features",
+        metavar="PATH",
+        help="also save the per-customer RUN 5 feature table here (input to scripts/run5_scenarios.py)",
+    )
+    parser.add_argument(
+        "--outreach",
+        metavar="PATH",
+        help="also write the ranked outreach list (one row per customer, with CUSTOMER_ID) as CSV here; "
+        "must be outside --out-dir, which is published with the dashboard",
+    )
+    parser.add_argument(
+        "--outreach-top",
+        type=int,
+        metavar="N",
+        help="with --outreach: keep only the N highest-priority customers (bounded memory)",
+    )
+    parser.add_argument(
+        "--customer-store",
+        metavar="PATH",
+        help="also write every customer's derived state (bucket, risk, timing, ... with CUSTOMER_ID) to an indexed "
+        "SQLite file here, for scripts/query_customer_store.py; must be outside --out-dir",
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="",
+        metavar="PATH",
+        help="write per-stage wall time, rows/sec, peak RSS and ingest counters as JSON "
+        "(default PATH: <out-dir>/run_stats.json)",
+    )
+    parser.add_argument(
+        "--cprofile",
+        action="store_true",
+        help="with --profile: also run under cProfile, dumping run_profile.pstats next to the stats",
+    )
+    parser.add_argument(
+        "--tracemalloc",
+        action="store_true",
+        help="with --profile: also trace Python allocations (per-stage heap peak and top sites; slow)",
+    )
+    args = parser.parse_args(argv)
+    if args.delta and not args.checkpoint:
+        parser.error("--delta requires --checkpoint")
+    if args.delta and (args.cache is not None or args.resume):
+        parser.error("--delta reads its book from --checkpoint: it can't be combined with --cache or --resume")
+    if (args.cprofile or args.tracemalloc) and args.profile is None:
+        parser.error("--cprofile/--tracemalloc require --profile")
+    if (args.external_sort or args.bureau_date) and not args.stream:
+        parser.error("--external-sort/--bureau-date require --stream")
+    if args.stream and (args.checkpoint or args.cache is not None or args.workers > 1):
+        parser.error("--stream keeps no aggregate state: it can't be combined with --checkpoint, --delta, --cache or --workers")
+    if args.quality_threshold and not args.quality_gate:
+        parser.error("--quality-threshold requires --quality-gate")
+    if args.sample and (args.checkpoint or args.cache is not None or args.features):
+        parser.error("--sample is a preview: it can't be combined with --checkpoint, --delta, --cache or --features")
+    if args.snapshots and (
+        args.stream or args.checkpoint or args.cache is not None or args.sample or args.quality_gate
+    ):
+        parser.error("--snapshots can't be combined with --stream, --checkpoint, --delta, --cache, --sample or --quality-gate")
+    if args.resume and (
+        args.stream or args.cache is not None or args.workers > 1 or args.sample or args.snapshots or args.quality_gate
+    ):
+        parser.error(
+            "--resume is for a single-process ingest of --input: it can't be combined with --stream, "
+            "--cache, --workers, --sample, --snapshots or --quality-gate"
+        )
+    if (args.cache is not None or args.resume) and not is_plain_input(resolve_inputs(args.input)):
+        parser.error("--cache and --resume need --input to be a single uncompressed CSV")
+    if args.outreach_top is not None and not args.outreach:
+        parser.error("--outreach-top requires --outreach")
+    if args.outreach_top is not None and args.outreach_top < 1:
+        parser.error("--outreach-top must be at least 1")
+    for option, path in (("--outreach", args.outreach), ("--customer-store", args.customer_store)):
+        if not path:
+            continue
+        out_dir = os.path.realpath(args.out_dir)
+        if os.path.commonpath([out_dir, os.path.realpath(path)]) == out_dir:
+            parser.error(f"{option} holds CUSTOMER_IDs: write it outside --out-dir")
+        if args.sample:
+            parser.error(f"{option} lists every customer: it can't be combined with --sample")
+    if args.customer_store and args.snapshots:
+        parser.error("--customer-store holds one bureau pull: it can't be combined with --snapshots")
+
+    stats = RunStats(trace_malloc=args.tracemalloc)
+    if args.tracemalloc:
+        tracemalloc.start()
+    profiler = None
+    if args.cprofile:
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    extra_metrics = (FeatureTableMetric,) if args.features else ()
+    if args.outreach:
+        extra_metrics += (partial(OutreachMetric, top=args.outreach_top),)
+    if args.customer_store:
+        extra_metrics += (partial(CustomerStoreMetric, path=args.customer_store),)
+    results = {}
+    gate = QualityGate(dict(QUALITY_THRESHOLDS, **dict(args.quality_threshold))) if args.quality_gate else None
+
+    def write_run_stats(counters):
+        if profiler is not None:
+            profiler.disable()
+        stats.counters = counters
+        run_stats = stats.as_dict()
+        if gate:
+            run_stats["qualityGate"] = gate.history
+        stats_path = args.profile or os.path.join(args.out_dir, "run_stats.json")
+        if profiler is not None:
+            pstats_path = os.path.join(os.path.dirname(stats_path) or ".", "run_profile.pstats")
+            profiler.dump_stats(pstats_path)
+            run_stats["cprofile"] = {"pstats": pstats_path, "top": _cprofile_top(profiler)}
+        if args.tracemalloc:
+            tracemalloc.stop()
+        os.makedirs(os.path.dirname(stats_path) or ".", exist_ok=True)
+        with open(stats_path, "w") as f:
+            json.dump(run_stats, f, indent=2)
+        print("Wrote run stats to", stats_path)
+
+    try:
+        if args.stream:
+            outputs, ingest_counts = stream_csv(
+                args.input,
+                extra_metrics,
+                stats=stats,
+                results=results,
+                sort=args.external_sort,
+                tmp_dir=args.tmp_dir,
+                chunk_rows=args.sort_chunk_rows,
+                bureau_date=args.bureau_date,
+                sample=args.sample,
+                gate=gate,
+            )
+        elif args.snapshots:
+            with stats.stage("ingest") as stage:
+                states = ingest_snapshots(args.input, workers=args.workers)
+                ingest_counts = new_ingest_counts()
+                for state in states.values():
+                    for k, v in state.ingest_counts.items():
+                        ingest_counts[k] += v
+                stage["rows"] = ingest_counts["rows"]
+            snapshot_outputs, trends = compute_snapshots(states, extra_metrics, stats=stats, results=results)
+            outputs = dict(snapshot_outputs[next(reversed(snapshot_outputs))], trends=trends)
+        else:
+            with stats.stage("ingest") as stage:
+                if args.delta:
+                    state, *checkpoint_log = read_checkpoint(args.checkpoint)
+                    ingested = ingest_csv(args.delta, workers=args.workers, gate=gate)
+                    state.apply_delta(ingested)
+                elif args.resume:
+                    state, resumed_from = ingest_resumable(args.input, args.resume, interval=args.resume_interval)
+                    ingested = state
+                    if resumed_from is not None:
+                        print(f"Resumed {args.input} from byte {resumed_from} ({args.resume})")
+                elif args.cache is not None:
+                    state = ingested = ingest_cached(
+                        args.input, args.cache or default_cache_path(args.input), workers=args.workers, gate=gate
+                    )
+                else:
+                    state = ingested = ingest_csv(args.input, workers=args.workers, sample=args.sample, gate=gate)
+                ingest_counts = ingested.ingest_counts
+                stage["rows"] = ingest_counts["rows"]
+            if args.checkpoint:
+                with stats.stage("checkpoint"):
+                    if args.delta:
+                        append_checkpoint(state, ingested, args.checkpoint, *checkpoint_log)
+                    else:
+                        save_checkpoint(state, args.checkpoint)
+            outputs = compute_outputs(state, extra_metrics, stats=stats, results=results, sample_rate=args.sample)
+    except QualityGateAbort as e:
+        print(f"Aborted: {e}; no dashboard JSON written", file=sys.stderr)
+        if args.profile is not None:
+            if not gate.history or gate.history[-1]["rows"] != e.rows:  # raised in a worker; its history stayed there
+                gate.history.append({"rows": e.rows, "estimates": {f["check"]: f["value"] for f in e.failures}})
+            gate.history[-1]["failures"] = e.failures
+            write_run_stats({"rows": e.rows, "workers": args.workers})
+        raise SystemExit(3)
+    with stats.stage("write"):
+        if args.features:
+            save_feature_table(results["features"], args.features)
+        if args.outreach:
+            n_outreach = save_outreach_list(results["outreach_export"], args.outreach)
+        write_outputs(outputs, args.out_dir, bundle=True)
+        if args.snapshots:
+            for bureau_dt, snapshot in snapshot_outputs.items():
+                write_outputs(snapshot, os.path.join(args.out_dir, "snapshots", str(bureau_dt)))
+    if args.resume:
+        os.remove(args.resume)
+
+    if args.profile is not None:
+        write_run_stats(
+            dict(
+                ingest_counts,
+                customers=results["population"]["n0"],
+                tradelines=results["population"]["n_tradelines"],
+                workers=args.workers,
+            )
+        )
+
+    overview = outputs["overview"]
+    print("Wrote JSON to", args.out_dir)
+    if args.outreach:
+        print(f"Wrote {n_outreach} ranked customers to {args.outreach}")
+    if args.customer_store:
+        print(f"Wrote {results['customer_store']['customers']} customers to {args.customer_store}")
+    print("N0:", overview["totalCustomers"], "SAM:", overview["serviceableBase"], "PL penetration %:", overview["plPenetrationRate"])
+    if args.snapshots:
+        for snapshot in outputs["trends"]["snapshots"]:
+            print(f"  snapshot {snapshot['bureauDate']}: N0 {snapshot['totalCustomers']}, SAM {snapshot['serviceableBase']}")
+    if args.sample:
+        print(f"Estimates from a {args.sample:.2%} sample of {outputs['sample']['sampledCustomers']} customers (95% CI):")
+        for name, est in outputs["sample"]["estimates"].items():
+            lo, hi = est["ci95"]
+            print(f"  {name:<28} {est['value']:>12}  [{lo}, {hi}]")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Generate a synthetic bureau tradeline CSV with the columns compute_dashboard_data.py reads.
+
+    python3 scripts/generate_synthetic_scrub.py --out synthetic.csv --rows 1000000
+    python3 scripts/generate_synthetic_scrub.py --out synthetic.csv --customers 50000 --tradelines-per-customer 14.7
+
+Output is deterministic for a given seed and roughly follows the shape of the
+real extract: ~21% of customers hold a vehicle loan (241/242), some of them take
+a PL (191) afterwards, lenders are mostly mixed NBF/PVT/PUB, repayment falls into
+buckets A-D at about the AR_sample proportions, and a small share of values is
+malformed (blank CUSTOMER_ID, impossible dates, non-numeric DPD) so the data
+quality paths get exercised. Rows are written grouped by customer.
+"""
+import argparse
+import csv
+import random
+from datetime import date, timedelta
+
+COLUMNS = (
+    "ACCT_ID",
+    "CUSTOMER_ID",
+    "BUREAU_DATE",
+    "ACCT_TYPE_CD",
+    "M_SUB_ID",
+    "OPEN_DT",
+    "CLOSED_DT",
+    "DAYS_PAST_DUE",
+    "CHARGE_OFF_AM",
+    "WRITE_OFF_STATUS_DT",
+    "ORIG_LOAN_AM",
+    "CREDIT_LIMIT_AM",
+    "BALANCE_AM",
+    "PAYMENT_HISTORY_GRID",
+)
+
+# Non-anchor product mix (tradelines per ACCT_TYPE_CD in AR_sample)
+OTHER_ACCT_TYPES = (
+    ("189", 28285),
+    ("123", 23026),
+    ("5", 22336),
+    ("173", 12839),
+    ("47", 11666),
+    ("191", 5000),
+    ("58", 8279),
+    ("999", 5525),
+    ("195", 3526),
+    ("221", 3207),
+    ("172", 3101),
+)
+VEHICLE_CUSTOMER_RATE = 0.21
+PL_AFTER_VEHICLE_RATE = 0.30
+# Repayment bucket shares (A, B, C, D) of customers in AR_sample
+BUCKET_WEIGHTS = (("A", 0.11), ("B", 0.65), ("C", 0.05), ("D", 0.19))
+LENDERS = ("NBF", "PVT", "PUB")
+MIXED_LENDER_RATE = 0.65
+HISTORY_DAYS = 12 * 365
+GRID_MONTHS = 36
+
+def _fmt_ddmmyyyy(d):
+    return f"{d.day:02d}/{d.month:02d}/{d.year}"
+
+class SyntheticScrub:
+    """Seeded row generator; see module docstring for the shape of the data."""
+
+    def __init__(self, seed=7, bureau_date=date(2025, 5, 5), tradelines_per_customer=14.7, dirty_rate=0.01):
+        self.rnd = random.Random(seed)
+        self.bureau_date = bureau_date
+        self.bureau_s = bureau_date.isoformat()
+        self.mean_tradelines = tradelines_per_customer
+        self.dirty_rate = dirty_rate
+        # OPEN_DT strings by days before the bureau date, formatted once
+        self.day_strings = [_fmt_ddmmyyyy(bureau_date - timedelta(days=i)) for i in range(HISTORY_DAYS + 1)]
+        types, weights = zip(*OTHER_ACCT_TYPES)
+        self.other_types = types
+        self.other_cum_weights = [sum(weights[: i + 1]) for i in range(len(weights))]
+        self.buckets, self.bucket_weights = zip(*BUCKET_WEIGHTS)
+        self.acct_id = 0
+        self.customer_seq = 0
+
+    def _n_tradelines(self):
+        # Geometric-ish around the mean, at least one tradeline
+        return max(1, int(self.rnd.expovariate(1 / self.mean_tradelines) + 0.5))
+
+    def _grid(self, months, bucket):
+        rnd = self.rnd
+        if months <= 0:
+            return ""
+        months = min(months, GRID_MONTHS)
+        if bucket in ("A", "B") and rnd.random() < 0.85:
+            return "0" * months
+        cells = []
+        bad = {"A": 0.0, "B": 0.02, "C": 0.15, "D": 0.35}[bucket]
+        worst = {"A": 1, "B": 1, "C": 5, "D": 9}[bucket]
+        for _ in range(months):
+            r = rnd.random()
+            if r < bad:
+                cells.append(str(rnd.randint(1, worst)))
+            elif r < bad + 0.03:
+                cells.append("?")
+            else:
+                cells.append("0")
+        return "".join(cells)
+
+    def _dpd(self, bucket):
+        rnd = self.rnd
+        if bucket == "C":
+            return str(rnd.randint(31, 179)) if rnd.random() < 0.4 else "0"
+        if bucket == "D":
+            return str(rnd.randint(180, 900)) if rnd.random() < 0.3 else "0"
+        return str(rnd.randint(1, 30)) if bucket == "B" and rnd.random() < 0.02 else "0"
+
+    def _dirty(self, value, bad):
+        return bad if self.rnd.random() < self.dirty_rate else value
+
+    def customer_rows(self):
+        """Rows (lists of strings in COLUMNS order) for the next customer."""
+        rnd = self.rnd
+        self.customer_seq += 1
+        cid = self._dirty(f"C{self.customer_seq:09d}", "")
+        bucket = rnd.choices(self.buckets, self.bucket_weights)[0]
+        lenders = LENDERS if rnd.random() < MIXED_LENDER_RATE else (rnd.choice(LENDERS),)
+        n = self._n_tradelines()
+
+        # (days before bureau date, acct type)
+        plan = []
+        if rnd.random() < VEHICLE_CUSTOMER_RATE:
+            anchor = rnd.randint(30, HISTORY_DAYS)
+            plan.append((anchor, rnd.choice(("241", "242"))))
+            if rnd.random() < PL_AFTER_VEHICLE_RATE and anchor > 60:
+                plan.append((rnd.randint(0, anchor - 30), "191"))
+        while len(plan) < n:
+            acct = rnd.choices(self.other_types, cum_weights=self.other_cum_weights)[0]
+            plan.append((rnd.randint(0, HISTORY_DAYS), acct))
+
+        charged_off = bucket == "D" and rnd.random() < 0.25
+        written_off = bucket == "D" and rnd.random() < 0.15
+        rows = []
+        for age, acct in plan:
+            self.acct_id += 1
+            open_s = self._dirty(self.day_strings[age], rnd.choice(("31/02/2020", "2020-01-15", "00/00/0000")))
+            closed_s = self.day_strings[rnd.randint(0, age)] if rnd.random() < 0.35 else ""
+            if acct == "123":
+                orig, limit = "0", str(rnd.choice((25000, 50000, 100000, 200000, 300000)))
+            elif acct in ("241", "242"):
+                orig, limit = str(rnd.randint(300, 1500) * 1000), ""
+            else:
+                orig, limit = str(rnd.randint(10, 800) * 1000), ""
+            rows.append(
+                [
+                    str(self.acct_id),
+                    cid,
+                    self._dirty(self.bureau_s, ""),
+                    acct,
+                    rnd.choice(lenders) if rnd.random() > self.dirty_rate else "",
+                    open_s,
+                    closed_s,
+                    self._dirty(self._dpd(bucket), "abc"),
+                    f"{rnd.randint(1000, 500000)}.00" if charged_off and rnd.random() < 0.3 else "0",
+                    self.day_strings[rnd.randint(0, age)] if written_off and rnd.random() < 0.3 else "",
+                    orig,
+                    limit,
+                    str(rnd.randint(0, 500000)),
+                    self._grid(age // 30, bucket),
+                ]
+            )
+        return rows
+
+def write_csv(path, rows=None, customers=None, seed=7, bureau_date=date(2025, 5, 5), tradelines_per_customer=14.7, dirty_rate=0.01):
+    """
+    Write a synthetic CSV to `path` with `rows` tradelines (the last customer is
+    cut short) or `customers` customers. Returns (customers, tradelines) written.
+    """
+    if (rows is None) == (customers is None):
+        raise ValueError("give exactly one of rows / customers")
+    gen = SyntheticScrub(seed, bureau_date, tradelines_per_customer, dirty_rate)
+    n_customers = n_rows = 0
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(COLUMNS)
+        while (n_rows < rows) if customers is None else (n_customers < customers):
+            batch = gen.customer_rows()
+            if customers is None:
+                batch = batch[: rows - n_rows]
+            w.writerows(batch)
+            n_customers += 1
+            n_rows += len(batch)
+    return n_customers, n_rows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", required=True, help="CSV path to write")
+    size = parser.add_mutually_exclusive_group(required=True)
+    size.add_argument("--rows", type=int, help="number of tradelines to write")
+    size.add_argument("--customers", type=int, help="number of customers to write")
+    parser.add_argument("--tradelines-per-customer", type=float, default=14.7, help="mean tradelines per customer (default: 14.7)")
+    parser.add_argument("--seed", type=int, default=7, help="random seed (default: 7)")
+    parser.add_argument("--bureau-date", type=date.fromisoformat, default=date(2025, 5, 5), help="BUREAU_DATE, YYYY-MM-DD (default: 2025-05-05)")
+    parser.add_argument("--dirty-rate", type=float, default=0.01, help="share of malformed values per field (default: 0.01)")
+    args = parser.parse_args(argv)
+
+    n_customers, n_rows = write_csv(
+        args.out,
+        rows=args.rows,
+        customers=args.customers,
+        seed=args.seed,
+        bureau_date=args.bureau_date,
+        tradelines_per_customer=args.tradelines_per_customer,
+        dirty_rate=args.dirty_rate,
+    )
+    print(f"Wrote {n_rows} tradelines for {n_customers} customers to {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Look up customers in a --customer-store SQLite file without re-reading the CSV.
+
+    python3 scripts/compute_dashboard_data.py --customer-store ~/scrub/customers.db
+    python3 scripts/query_customer_store.py ~/scrub/customers.db CUST00042 CUST00977      # why each is where it is
+    python3 scripts/query_customer_store.py ~/scrub/customers.db --where bucket=D --where timing_flag=golden_window
+    python3 scripts/query_customer_store.py ~/scrub/customers.db --where lender_type=NBF,Mixed --where 'risk_score>=70' --count
+
+A lookup prints the customer's derived state with the rules that put them in
+their bucket, risk score and timing flag. --where filters on any column
+(=, !=, <, <=, >, >=; a comma-separated value after = matches any of them;
+`null` matches a missing value); filters on bucket, timing_flag, risk_score and
+lender_type use the store's indexes.
+"""
+import argparse
+import json
+import re
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+import compute_dashboard_data as cdd  # noqa: E402
+
+COLUMN_KINDS = {name: kind.split()[0] for name, kind in cdd.CUSTOMER_STORE_COLUMNS}
+WHERE = re.compile(r"^(\w+)\s*(>=|<=|!=|=|>|<)\s*(.*)$")
+
+def open_store(path):
+    """Read-only connection to a customer store, checking its version."""
+    if not Path(path).is_file():
+        raise SystemExit(f"{path}: no such customer store; build it with compute_dashboard_data.py --customer-store")
+    db = sqlite3.connect(f"{Path(path).resolve().as_uri()}?mode=ro", uri=True)
+    db.row_factory = sqlite3.Row
+    meta = dict(db.execute("SELECT key, value FROM meta"))
+    if meta.get("version") != str(cdd.CUSTOMER_STORE_VERSION):
+        raise SystemExit(f"{path}: customer store version {meta.get('version')} != {cdd.CUSTOMER_STORE_VERSION}; rebuild it")
+    return db, meta
+
+def _value(column, text):
+    if text.lower() == "null":
+        return None
+    kind = COLUMN_KINDS[column]
+    if kind == "INTEGER":
+        flag = {"true": 1, "false": 0}.get(text.lower())
+        return int(text) if flag is None else flag
+    if kind == "REAL":
+        return float(text)
+    return text
+
+def parse_where(clauses):
+    """SQL condition and parameters for --where clauses like `bucket=C,D` or `risk_score>=70`."""
+    conditions, params = [], []
+    for clause in clauses:
+        m = WHERE.match(clause)
+        if not m or m[1] not in COLUMN_KINDS:
+            raise ValueError(f"bad --where {clause!r}: expected COLUMN<op>VALUE with COLUMN one of {', '.join(COLUMN_KINDS)}")
+        column, op, text = m.groups()
+        try:
+            values = [_value(column, v.strip()) for v in (text.split(",") if op == "=" else [text])]
+        except ValueError:
+            raise ValueError(f"bad --where {clause!r}: {column} is {COLUMN_KINDS[column].lower()}") from None
+        if None in values:
+            if len(values) > 1 or op not in ("=", "!="):
+                raise ValueError(f"bad --where {clause!r}: null only works alone, with = or !=")
+            conditions.append(f"{column} IS {'NOT ' if op == '!=' else ''}NULL")
+        elif len(values) > 1:
+            conditions.append(f"{column} IN ({', '.join('?' * len(values))})")
+            params += values
+        else:
+            conditions.append(f"{column} {op} ?")
+            params += values
+    return " AND ".join(conditions) or "1", params
+
+# What each of cdd.RISK_SCORE_POINTS' rules means, filled from the row
+RISK_RULE_TEXT = {
+    "clean": "no DPD or charge-off/write-off",
+    "highRepaymentQuality": "repayment quality {rq:g}% > {high_rq}",
+    "singleTradeline": "single tradeline",
+    "chargeOffWriteOff": "charge-off/write-off",
+    "severeDpd": "max DPD {dpd} >= {severe_dpd}",
+    "anyDpd": "max DPD {dpd} > 0",
+}
+
+def _timing_windows():
+    """{timing flag: its months-since-anchor range as text}, from cdd.TIMING_WINDOWS."""
+    windows, first = {}, 0
+    for flag, last in cdd.TIMING_WINDOWS:
+        windows[flag] = f"{first}+" if last is None else f"{first}-{last}"
+        first = (last or 0) + 1
+    return windows
+
+def explain(row):
+    """The bucket, risk score and timing rules that apply to a customer row, one line each."""
+    dpd = row["max_dpd"]
+    d_dpd, c_dpd = cdd.BUCKET_D_MIN_DPD, cdd.BUCKET_C_MIN_DPD
+    if row["charge_off"] or row["write_off"] or dpd >= d_dpd:
+        causes = (("charge-off", row["charge_off"]), ("write-off", row["write_off"]), (f"max DPD {dpd} >= {d_dpd}", dpd >= d_dpd))
+        bucket = ", ".join(cause for cause, hit in causes if hit)
+    elif dpd >= c_dpd:
+        bucket = f"max DPD {dpd} is {c_dpd}-{d_dpd - 1}"
+    elif row["has_closed"]:
+        bucket = f"a closed account and max DPD {dpd} < {c_dpd}"
+    else:
+        bucket = f"no closed account and max DPD {dpd} < {c_dpd}"
+
+    values = dict(
+        rq=row["repayment_quality_pct"], dpd=dpd, high_rq=cdd.RISK_SCORE_HIGH_RQ_PCT, severe_dpd=cdd.RISK_SCORE_SEVERE_DPD
+    )
+    parts = [f"{cdd.RISK_SCORE_BASE} base"]
+    for rule in filter(None, row["risk_rules"].split(",")):
+        parts.append(f"{cdd.RISK_SCORE_POINTS[rule]:+d} {RISK_RULE_TEXT[rule].format(**values)}")
+    risk = f"{' '.join(parts)} (clamped to 0-100)"
+
+    if row["anchor_date"] is None:
+        timing = "no dated vehicle loan (anchor)"
+    elif row["months_since_anchor"] is None:
+        timing = f"anchor {row['anchor_date']} is after the bureau date"
+    else:
+        months, flag = row["months_since_anchor"], row["timing_flag"]
+        timing = f"anchor {row['anchor_date']} is {months} months old ({_timing_windows()[flag]} months = {flag})"
+        if row["first_pl_date"]:
+            timing += f"; first PL after it on {row['first_pl_date']} (+{row['first_pl_delta_m']} months)"
+        if row["pre_existing_pl"]:
+            timing += "; already had a PL before anchor + 1 month"
+    return {
+        f"bucket {row['bucket']}": bucket,
+        f"risk score {row['risk_score']} ({row['risk_tier']})": risk,
+        f"timing {row['timing_flag'] or 'none'}": timing,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("store", help="SQLite file written by compute_dashboard_data.py --customer-store")
+    parser.add_argument("customer_ids", nargs="*", metavar="CUSTOMER_ID", help="customers to look up")
+    parser.add_argument("--where", action="append", default=[], metavar="COND", help="segment filter, repeatable (ANDed)")
+    parser.add_argument("--count", action="store_true", help="with --where: print only the number of matching customers")
+    parser.add_argument("--limit", type=int, default=20, help="with --where: customers to print (default: 20, 0 = all)")
+    parser.add_argument("--json", action="store_true", help="print the result as JSON")
+    args = parser.parse_args(argv)
+    if bool(args.customer_ids) == bool(args.where):
+        parser.error("give CUSTOMER_IDs to look up or --where filters for a segment scan")
+    try:
+        condition, params = parse_where(args.where)
+    except ValueError as e:
+        parser.error(str(e))
+
+    db, meta = open_store(args.store)
+    t0 = time.perf_counter()
+    if args.customer_ids:
+        found = {
+            row["customer_id"]: row
+            for row in db.execute(
+                f"SELECT * FROM customers WHERE customer_id IN ({', '.join('?' * len(args.customer_ids))})", args.customer_ids
+            )
+        }
+        result = {cid: dict(found[cid], why=explain(found[cid])) if cid in found else None for cid in args.customer_ids}
+    elif args.count:
+        result = {"customers": db.execute(f"SELECT count(*) FROM customers WHERE {condition}", params).fetchone()[0]}
+    else:
+        limit = f" LIMIT {args.limit}" if args.limit else ""
+        rows = [dict(row) for row in db.execute(f"SELECT * FROM customers WHERE {condition} ORDER BY rowid{limit}", params)]
+        result = {"customers": rows}
+    elapsed_ms = (time.perf_counter() - t0) * 1000
+
+    if args.json:
+        json.dump(dict(result, bureauDate=meta["bureauDate"]), sys.stdout, indent=2)
+        print()
+        return
+    print(f"Bureau date {meta['bureauDate']}, {int(meta['customers']):,} customers; query took {elapsed_ms:.1f} ms")
+    if args.customer_ids:
+        for cid, row in result.items():
+            print()
+            if row is None:
+                print(f"{cid}: not in the store")
+                continue
+            print(cid)
+            for key, why in row.pop("why").items():
+                print(f"  {key:<28} {why}")
+            for key, value in row.items():
+                if key != "customer_id":
+                    print(f"    {key:<24} {value}")
+    elif args.count:
+        print(f"{result['customers']:,} customers")
+    else:
+        rows = result["customers"]
+        columns = ("customer_id", "bucket", "risk_score", "timing_flag", "months_since_anchor", "lender_type", "max_credit")
+        print("  ".join(f"{c:>14}" for c in columns))
+        for row in rows:
+            print("  ".join(f"{'' if row[c] is None else row[c]!s:>14}" for c in columns))
+
+if __name__ == "__main__":
+    main()
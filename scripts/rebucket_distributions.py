@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Re-bucket or read percentiles from distributions.json without re-running the pipeline.
+
+    python3 scripts/rebucket_distributions.py                                   # summary of every distribution
+    python3 scripts/rebucket_distributions.py maxCredit --edges 50000 250000 1000000
+    python3 scripts/rebucket_distributions.py repaymentQualityPct --edges 50 75 90 --right-closed
+    python3 scripts/rebucket_distributions.py riskScore --percentiles 10 25 50 75 90
+    python3 scripts/rebucket_distributions.py --data a/distributions.json --data b/distributions.json maxDpd --edges 30 90 180
+
+Bands are left-closed (value < edge falls below it, as for affordability and
+risk tiers) unless --right-closed (value <= edge, as for the repayment quality
+bands). Several --data files are merged by adding their counts, which is only
+right when they cover disjoint sets of customers (e.g. separate books); a
+customer split across inputs would be counted once per file with partial
+aggregates. Counts are exact whenever every edge is a bin
+edge (see DistributionsMetric in compute_dashboard_data.py); a band marked "~"
+holds a share of a bin that an edge cuts through, split in proportion to width.
+Percentiles interpolate linearly within a bin.
+"""
+import argparse
+import json
+import os
+import sys
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(__file__))
+import compute_dashboard_data as cdd  # noqa: E402
+
+DEFAULT_DATA = os.path.join(cdd.OUT_DIR, "distributions.json")
+
+def load_distributions(paths):
+    """Read and merge distributions.json files: {name: distribution}, bureau dates seen."""
+    merged = {}
+    bureau_dates = []
+    for path in paths:
+        with open(path) as f:
+            doc = json.load(f)
+        if doc.get("version") != cdd.DistributionsMetric.VERSION:
+            raise SystemExit(f"{path}: distributions version {doc.get('version')} != {cdd.DistributionsMetric.VERSION}")
+        if doc["bureauDate"] not in bureau_dates:
+            bureau_dates.append(doc["bureauDate"])
+        for name, d in doc["distributions"].items():
+            merged[name] = merge_distribution(merged[name], d) if name in merged else d
+    return merged, bureau_dates
+
+def merge_distribution(a, b):
+    """Sum of two distributions of the same quantity (counts added bin by bin)."""
+    points = defaultdict(int)
+    ranges = defaultdict(int)
+    for d in (a, b):
+        for v, n in d["points"]:
+            points[v] += n
+        for lo, hi, n in d["ranges"]:
+            ranges[lo, hi] += n
+    return dict(
+        a,
+        customers=a["customers"] + b["customers"],
+        points=[[v, points[v]] for v in sorted(points)],
+        ranges=[[lo, hi, ranges[lo, hi]] for lo, hi in sorted(ranges)],
+    )
+
+def _bins(d):
+    """Points and ranges as (lo, hi, count) in value order; a point is lo == hi and comes before a range starting there."""
+    bins = [(v, v, n) for v, n in d["points"]] + [tuple(r) for r in d["ranges"]]
+    bins.sort(key=lambda b: (b[0], b[1] > b[0], b[1]))
+    return bins
+
+def band_labels(edges, right_closed=False):
+    fmt = "{:g}".format
+    if right_closed:
+        inner = [f"({fmt(lo)}, {fmt(hi)}]" for lo, hi in zip(edges, edges[1:])]
+        return [f"<= {fmt(edges[0])}", *inner, f"> {fmt(edges[-1])}"]
+    inner = [f"[{fmt(lo)}, {fmt(hi)})" for lo, hi in zip(edges, edges[1:])]
+    return [f"< {fmt(edges[0])}", *inner, f">= {fmt(edges[-1])}"]
+
+def rebucket(d, edges, right_closed=False):
+    """
+    Customers per band for sorted `edges`: [(count, exact)], len(edges) + 1 bands.
+
+    A point lands exactly. A range goes whole to the band of its interior unless
+    an edge falls strictly inside it; then it is split in proportion to width.
+    """
+    counts = [0.0] * (len(edges) + 1)
+    exact = [True] * (len(edges) + 1)
+    band_of = bisect_left if right_closed else bisect_right
+    for lo, hi, n in _bins(d):
+        if lo == hi:
+            counts[band_of(edges, lo)] += n
+            continue
+        first, last = bisect_right(edges, lo), bisect_left(edges, hi)
+        if right_closed and first and edges[first - 1] == lo and d.get("lowInRange", True):
+            exact[first - 1] = exact[first] = False  # customers at exactly lo belong below the edge
+        cuts = [lo, *edges[first:last], hi]
+        for i, (a, b) in enumerate(zip(cuts, cuts[1:])):
+            counts[first + i] += n * (b - a) / (hi - lo)
+            if last > first:
+                exact[first + i] = False
+    return [(round(c), e) for c, e in zip(counts, exact)]
+
+def percentile(d, q):
+    """Value at percentile `q` (0-100) of a distribution, None when it is empty."""
+    bins = _bins(d)
+    total = sum(n for _, _, n in bins)
+    if not total:
+        return None
+    target = total * q / 100
+    cum = 0
+    for lo, hi, n in bins:
+        if n and cum + n >= target:
+            return lo if lo == hi else lo + (hi - lo) * max(0.0, target - cum) / n
+        cum += n
+    return bins[-1][1]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("name", nargs="?", help="distribution to query (default: summary of all)")
+    parser.add_argument(
+        "--data",
+        action="append",
+        metavar="PATH",
+        help=f"distributions.json to read, repeatable to merge several (default: {DEFAULT_DATA})",
+    )
+    parser.add_argument("--edges", type=float, nargs="+", metavar="EDGE", help="band edges to count customers in")
+    parser.add_argument("--right-closed", action="store_true", help="an edge belongs to the band below it (value <= edge)")
+    parser.add_argument(
+        "--percentiles",
+        type=float,
+        nargs="+",
+        default=[10, 25, 50, 75, 90],
+        metavar="P",
+        help="percentiles to print (default: 10 25 50 75 90)",
+    )
+    parser.add_argument("--json", action="store_true", help="print the result as JSON")
+    args = parser.parse_args(argv)
+    distributions, bureau_dates = load_distributions(args.data or [DEFAULT_DATA])
+    if args.name and args.name not in distributions:
+        parser.error(f"unknown distribution {args.name!r}; one of {', '.join(distributions)}")
+    if args.edges and not args.name:
+        parser.error("--edges needs a distribution name")
+
+    names = [args.name] if args.name else list(distributions)
+    result = {"bureauDates": bureau_dates, "distributions": {}}
+    for name in names:
+        d = distributions[name]
+        entry = {
+            "customers": d["customers"],
+            "percentiles": {f"p{q:g}": percentile(d, q) for q in args.percentiles},
+        }
+        if args.edges:
+            edges = sorted(set(args.edges))
+            entry["bands"] = [
+                {"band": label, "customers": n, "exact": exact}
+                for label, (n, exact) in zip(band_labels(edges, args.right_closed), rebucket(d, edges, args.right_closed))
+            ]
+        result["distributions"][name] = entry
+
+    if args.json:
+        json.dump(result, sys.stdout, indent=2)
+        print()
+        return
+    print("Bureau date:", ", ".join(bureau_dates))
+    for name, entry in result["distributions"].items():
+        pcts = "  ".join(f"{k} {v:,.4g}" if v is not None else f"{k} -" for k, v in entry["percentiles"].items())
+        print(f"{name:<22} {entry['customers']:>10,} customers  {pcts}")
+        for band in entry.get("bands", ()):
+            print(f"  {band['band']:<24} {band['customers']:>10,}{'' if band['exact'] else ' ~'}")
+
+if __name__ == "__main__":
+    main()
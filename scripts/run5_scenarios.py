@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+RUN 5 what-if scenarios from a saved per-customer feature table, without re-reading the CSV.
+
+    python3 scripts/compute_dashboard_data.py --features features.pkl          # once per data refresh
+    python3 scripts/run5_scenarios.py --features features.pkl \
+        --grid demand_rate_pl='[0.25, 0.32, 0.4]' --grid pl_min_risk_score='[60, 70]'
+    python3 scripts/run5_scenarios.py --features features.pkl --scenarios scenarios.json --out results.json
+
+A scenario overrides any of the RUN5_ASSUMPTIONS in compute_dashboard_data.py
+(rates, tickets, tenors, margins, the SAM risk-score / tradeline thresholds and
+lac_timing_months, an inclusive [lo, hi] window of months since the vehicle
+anchor). --scenarios is a JSON list of override objects (an optional "name"
+labels each); every --grid KEY=JSON_LIST multiplies them by each listed value.
+Each scenario yields the same tamWaterfall / samSegments / revenueModel /
+aumProjection as monetisation.json.
+"""
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(__file__))
+import compute_dashboard_data as cdd  # noqa: E402
+
+MAX_MIN_TRADELINES = 50  # tradeline counts above this share one cell
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and value == value and abs(value) != float("inf")
+
+def validate_assumptions(assumptions):
+    """
+    Raise ValueError naming the first assumption whose value doesn't fit its
+    RUN5_ASSUMPTIONS default: a finite number for numeric ones, and null or an
+    inclusive [lo, hi] pair of month counts for lac_timing_months.
+    """
+    for key, default in cdd.RUN5_ASSUMPTIONS.items():
+        value = assumptions[key]
+        if key == "lac_timing_months":
+            if value is not None and not (
+                isinstance(value, list) and len(value) == 2 and all(map(_is_number, value)) and value[0] <= value[1]
+            ):
+                raise ValueError(f"lac_timing_months must be null or [lo, hi] months with lo <= hi, not {json.dumps(value)}")
+        elif not _is_number(value):
+            raise ValueError(f"{key} must be a number like its default {default}, not {json.dumps(value)}")
+    if assumptions["min_tradelines"] > MAX_MIN_TRADELINES:
+        raise ValueError(f"min_tradelines above {MAX_MIN_TRADELINES} is not supported")
+
+class ScenarioEngine:
+    """
+    Evaluates many assumption sets against one feature table.
+
+    The table is collapsed once into counts per distinct combination of the
+    features SAM segmentation looks at (bucket, tradelines, risk score, vehicle
+    holding, months since anchor); a sweep then classifies each cell for every
+    scenario, so the cost per scenario is independent of the number of customers.
+    """
+
+    def __init__(self, table):
+        cols = table["columns"]
+        self.bureau_date = table["bureauDate"]
+        self.n0 = len(cols["bucket"])
+        has_vehicle = [bool(f & cdd.FeatureTableMetric.HAS_VEHICLE) for f in cols["flags"]]
+        n_tradelines = [min(n, MAX_MIN_TRADELINES) for n in cols["n_tradelines"]]
+        self.tradeline_hist = Counter(n_tradelines)
+        self.bucket_d = cols["bucket"].count(cdd.FeatureTableMetric.BUCKETS.index("D"))
+        self.cells = Counter(zip(cols["bucket"], n_tradelines, cols["risk_score"], has_vehicle, cols["months_since_anchor"]))
+
+    def evaluate(self, scenarios):
+        """
+        Monetisation payloads (see cdd.monetisation_payload) for a list of full
+        assumption dicts; ValueError if one is malformed (see validate_assumptions).
+        """
+        for a in scenarios:
+            validate_assumptions(a)
+        segments = [dict.fromkeys(("pl_eligible", "lac_eligible", "deferred", "excluded"), 0) for _ in scenarios]
+        buckets = cdd.FeatureTableMetric.BUCKETS
+        sam_segment = cdd.sam_segment
+        for (bucket, n_tl, score, vehicle, months), n in self.cells.items():
+            bucket = buckets[bucket]
+            months = None if months < 0 else months
+            for seg_counts, a in zip(segments, scenarios):
+                segment = sam_segment(bucket, n_tl, score, vehicle, months, a)
+                if segment is not None:
+                    seg_counts[segment] += n
+        payloads = []
+        for seg_counts, a in zip(segments, scenarios):
+            thin_file = sum(n for n_tl, n in self.tradeline_hist.items() if n_tl < a["min_tradelines"])
+            payloads.append(cdd.monetisation_payload(self.n0, self.bucket_d, thin_file, seg_counts, a))
+        return payloads
+
+def expand_scenarios(base_overrides, grid):
+    """
+    Cartesian product of the `grid` {key: [values]} applied on top of each
+    override dict; returns [(name, overrides)].
+    """
+    keys = list(grid)
+    out = []
+    for overrides in base_overrides or [{}]:
+        overrides = dict(overrides)
+        label = overrides.pop("name", None) or " ".join(f"{k}={json.dumps(v)}" for k, v in overrides.items())
+        for values in itertools.product(*(grid[k] for k in keys)):
+            swept = dict(zip(keys, values))
+            name = " ".join(filter(None, [label, *(f"{k}={json.dumps(v)}" for k, v in swept.items())]))
+            out.append((name or "base", dict(overrides, **swept)))
+    return out
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--features", required=True, metavar="PATH", help="feature table written by compute_dashboard_data.py --features")
+    parser.add_argument("--scenarios", metavar="JSON", help="JSON file: list of assumption overrides")
+    parser.add_argument(
+        "--grid",
+        action="append",
+        default=[],
+        metavar="KEY=JSON_LIST",
+        help="sweep an assumption over the listed values (repeatable)",
+    )
+    parser.add_argument("--out", metavar="PATH", help="write all scenario payloads as JSON")
+    args = parser.parse_args(argv)
+
+    base_overrides = []
+    if args.scenarios:
+        with open(args.scenarios) as f:
+            base_overrides = json.load(f)
+        if not isinstance(base_overrides, list) or not all(isinstance(o, dict) for o in base_overrides):
+            parser.error("--scenarios must hold a JSON list of objects")
+    grid = {}
+    for item in args.grid:
+        key, sep, values = item.partition("=")
+        if not sep:
+            parser.error(f"--grid {item!r}: expected KEY=JSON_LIST")
+        try:
+            values = json.loads(values)
+        except ValueError:
+            parser.error(f"--grid {item!r}: value is not JSON")
+        grid[key] = values if isinstance(values, list) else [values]
+        if not grid[key]:
+            parser.error(f"--grid {item!r}: list is empty")
+    for key in {k for o in base_overrides for k in o} | set(grid):
+        if key != "name" and key not in cdd.RUN5_ASSUMPTIONS:
+            parser.error(f"unknown assumption {key!r} (see RUN5_ASSUMPTIONS)")
+
+    scenarios = expand_scenarios(base_overrides, grid)
+    engine = ScenarioEngine(cdd.load_feature_table(args.features))
+    t0 = time.perf_counter()
+    try:
+        payloads = engine.evaluate([dict(cdd.RUN5_ASSUMPTIONS, **overrides) for _, overrides in scenarios])
+    except ValueError as e:
+        parser.error(str(e))
+    elapsed = time.perf_counter() - t0
+
+    print(f"{'scenario':<48} {'SAM':>8} {'PL elig':>8} {'LAC elig':>8} {'AUM yr1 (INR)':>16} {'revenue yr1 (INR)':>18}")
+    for (name, _), payload in zip(scenarios, payloads):
+        seg = payload["samSegments"]
+        model = payload["revenueModel"]
+        print(
+            f"{name[:48]:<48} {payload['tamWaterfall'][-1]['value']:>8} {seg['plEligible']:>8} {seg['lacEligible']:>8}"
+            f" {model['totalAumYear1Inr']:>16,.0f} {model['totalNetRevenueYear1Inr']:>18,.0f}"
+        )
+    print(f"{len(scenarios)} scenarios over {engine.n0} customers in {elapsed * 1000:.1f} ms ({len(engine.cells)} feature cells)")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(
+                {
+                    "bureauDate": engine.bureau_date,
+                    "totalCustomers": engine.n0,
+                    "scenarios": [
+                        {"name": name, "assumptions": overrides, **payload} for (name, overrides), payload in zip(scenarios, payloads)
+                    ],
+                },
+                f,
+                indent=2,
+            )
+        print("Wrote", args.out)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+Serve the dashboard data from memory over HTTP, with filtered and RUN 5 queries.
+
+    python3 scripts/serve_dashboard_data.py                          # AR_sample.csv on 127.0.0.1:8765
+    python3 scripts/serve_dashboard_data.py --input big.csv --cache --workers 4
+    python3 scripts/serve_dashboard_data.py --checkpoint state.pkl   # start from a saved state
+    VITE_DATA_URL=http://127.0.0.1:8765/data npm run dev             # point the dashboard at it
+
+Endpoints (GET):
+
+    /data/<name>.json        the same payloads compute_dashboard_data.py writes
+    /api/segments?FILTERS    cube measures and per-dimension customer counts
+    /api/histogram?name=H&FILTERS
+                             one cube histogram (monthsSinceCarLoan, curveA, curveB, plOpenMonth)
+    /api/run5?ASSUMPTIONS    RUN 5 monetisation under RUN5_ASSUMPTIONS overrides
+    /api/status              source, load generation and time, rows, query cache statistics
+
+FILTERS are cube dimensions with comma-separated values, e.g.
+lenderType=NBF,Mixed&bucket=A&timingFlag=golden_window. ASSUMPTIONS values
+are JSON, e.g. demand_rate_pl=0.4&lac_timing_months=[2,10]. POST /api/reload
+re-reads the source; it is also re-read automatically when its size or mtime
+changes. Responses are kept in an LRU cache keyed by the load's generation
+and dropped on every reload.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from itertools import count
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+sys.path.insert(0, os.path.dirname(__file__))
+import compute_dashboard_data as cdd  # noqa: E402
+import run5_scenarios  # noqa: E402
+
+class QueryError(ValueError):
+    """A bad query parameter; answered with HTTP 400."""
+
+class LRUCache:
+    """Thread-safe LRU of encoded responses keyed by canonical query."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.hits = self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value = self.data.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.data.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self.lock:
+            self.data[key] = value
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+    def info(self):
+        with self.lock:
+            return {"size": len(self.data), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+class Dataset:
+    """One loaded book: dashboard payloads, the cube and a RUN 5 scenario engine."""
+
+    _generations = count(1)
+
+    def __init__(self, state, source):
+        results = {}
+        self.outputs = cdd.compute_outputs(state, (cdd.FeatureTableMetric,), results=results)
+        self.cube = self.outputs["cube"]
+        self.engine = run5_scenarios.ScenarioEngine(results["features"])
+        self.source = source
+        self.generation = next(self._generations)  # increases with every load; keys the query cache
+        self.loaded_at = time.time()
+        self.customers = len(state.tradelines)
+        self.tradelines = state.tradelines.n_tradelines
+        dims = self.cube["dimensions"]
+        self.dim_index = {d["name"]: {v: i for i, v in enumerate(d["values"])} for d in dims}
+        self.hist_index = {h["name"]: i for i, h in enumerate(self.cube["histograms"])}
+
+    def parse_filters(self, params):
+        filters = {}
+        for name, value in params.items():
+            if name not in self.dim_index:
+                raise QueryError(f"unknown filter {name!r}; dimensions: {', '.join(self.dim_index)}")
+            index = self.dim_index[name]
+            try:
+                filters[name] = {index[v] for v in value.split(",") if v}
+            except KeyError as e:
+                raise QueryError(f"unknown {name} value {e.args[0]!r}; values: {', '.join(index)}") from None
+        return filters
+
+    def aggregate(self, filters):
+        """Sum the cube cells matching `filters` ({dimension: set of value indexes})."""
+        dims = self.cube["dimensions"]
+        measures = self.cube["measures"]
+        histograms = self.cube["histograms"]
+        n_dims, n_measures = len(dims), len(measures)
+        allowed = [filters.get(d["name"]) for d in dims]
+        measure_sums = [0] * n_measures
+        dim_counts = [[0] * len(d["values"]) for d in dims]
+        hist_sums = [[0] * h["bins"] for h in histograms]
+        for cell in self.cube["cells"]:
+            if any(a is not None and cell[i] not in a for i, a in enumerate(allowed)):
+                continue
+            customers = cell[n_dims]
+            for i in range(n_dims):
+                dim_counts[i][cell[i]] += customers
+            for m in range(n_measures):
+                measure_sums[m] += cell[n_dims + m]
+            for h, sparse in enumerate(cell[n_dims + n_measures :]):
+                for k in range(0, len(sparse), 2):
+                    hist_sums[h][sparse[k]] += sparse[k + 1]
+        return (
+            dict(zip(measures, measure_sums)),
+            {d["name"]: dict(zip(d["values"], counts)) for d, counts in zip(dims, dim_counts)},
+            hist_sums,
+        )
+
+    def query(self, path, params):
+        """Payload for a GET path; raises KeyError for unknown paths."""
+        if path.startswith("/data/") and path.endswith(".json"):
+            return self.outputs[path[len("/data/") : -len(".json")]]
+        if path == "/api/segments":
+            measures, dimensions, _ = self.aggregate(self.parse_filters(params))
+            return {"measures": measures, "dimensions": dimensions}
+        if path == "/api/histogram":
+            params = dict(params)
+            name = params.pop("name", None)
+            if name not in self.hist_index:
+                raise QueryError(f"name must be one of {', '.join(self.hist_index)}")
+            _, _, hists = self.aggregate(self.parse_filters(params))
+            return {"name": name, "counts": hists[self.hist_index[name]]}
+        if path == "/api/run5":
+            overrides = {}
+            for key, value in params.items():
+                if key not in cdd.RUN5_ASSUMPTIONS:
+                    raise QueryError(f"unknown assumption {key!r}")
+                try:
+                    overrides[key] = json.loads(value)
+                except ValueError:
+                    raise QueryError(f"{key}: {value!r} is not JSON") from None
+            assumptions = dict(cdd.RUN5_ASSUMPTIONS, **overrides)
+            try:
+                return dict(self.engine.evaluate([assumptions])[0], assumptions=assumptions)
+            except ValueError as e:
+                raise QueryError(str(e)) from None
+        raise KeyError(path)
+
+class DataSource:
+    """Where the book comes from, and how to (re)load it."""
+
+    def __init__(self, args):
+        self.args = args
+        self.path = args.checkpoint or args.input
+
+    def signature(self):
+        """(path, size, mtime_ns) of each input part (or the checkpoint); raises OSError while one is missing."""
+        try:
+            paths = [self.path] if self.args.checkpoint else cdd.resolve_inputs(self.path)
+        except SystemExit as e:
+            raise FileNotFoundError(str(e)) from None
+        signature = []
+        for path in paths:
+            st = os.stat(path)
+            signature.append((path, st.st_size, st.st_mtime_ns))
+        return tuple(signature)
+
+    def load(self):
+        args = self.args
+        if args.checkpoint:
+            state = cdd.load_checkpoint(args.checkpoint)
+        elif args.cache is not None:
+            state = cdd.ingest_cached(args.input, args.cache or cdd.default_cache_path(args.input), workers=args.workers)
+        else:
+            state = cdd.ingest_csv(args.input, workers=args.workers)
+        return Dataset(state, self.path)
+
+class DashboardServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, source, cache_size):
+        super().__init__(address, QueryHandler)
+        self.source = source
+        self.cache = LRUCache(cache_size)
+        self.reload_lock = threading.Lock()
+        self.signature = source.signature()
+        self.dataset = source.load()
+
+    def reload(self):
+        """Re-read the source and swap it in; queries keep using the old book until then."""
+        with self.reload_lock:
+            signature = self.source.signature()
+            dataset = self.source.load()
+            self.dataset, self.signature = dataset, signature
+            self.cache.clear()
+        return dataset
+
+    def watch(self, interval):
+        """Reload once the source has changed and then stayed the same for one poll (i.e. is fully written)."""
+        pending = None
+        while True:
+            time.sleep(interval)
+            try:
+                signature = self.source.signature()
+            except OSError:
+                continue  # mid-replace; try again next tick
+            if signature == self.signature or signature != pending:
+                pending = None if signature == self.signature else signature
+                continue
+            print(f"{self.source.path} changed, reloading", flush=True)
+            try:
+                self.reload()
+            except Exception as e:  # keep serving the old book
+                print(f"reload failed: {e}", file=sys.stderr, flush=True)
+            pending = None
+
+class QueryHandler(BaseHTTPRequestHandler):
+    server_version = "ScrubData/1"
+
+    def _send(self, status, body):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        # The dashboard dev server runs on another port
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, status, message):
+        self._send(status, json.dumps({"error": message}).encode())
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        params = dict(parse_qsl(url.query))
+        server = self.server
+        dataset = server.dataset
+        if url.path == "/api/status":
+            body = {
+                "source": dataset.source,
+                "generation": dataset.generation,
+                "loadedAt": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(dataset.loaded_at)),
+                "customers": dataset.customers,
+                "tradelines": dataset.tradelines,
+                "queryCache": server.cache.info(),
+            }
+            return self._send(200, json.dumps(body).encode())
+        key = (dataset.generation, url.path, tuple(sorted(params.items())))
+        body = server.cache.get(key)
+        if body is None:
+            try:
+                body = json.dumps(dataset.query(url.path, params)).encode()
+            except QueryError as e:
+                return self._error(400, str(e))
+            except KeyError:
+                return self._error(404, f"no such resource: {url.path}")
+            server.cache.put(key, body)
+        self._send(200, body)
+
+    def do_POST(self):
+        if urlsplit(self.path).path != "/api/reload":
+            return self._error(404, f"no such resource: {self.path}")
+        try:
+            dataset = self.server.reload()
+        except Exception as e:
+            return self._error(500, f"reload failed: {e}")
+        self._send(200, json.dumps({"customers": dataset.customers, "tradelines": dataset.tradelines}).encode())
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--input", default=cdd.CSV_PATH, help="tradeline CSV or quoted glob of parts (default: AR_sample.csv)")
+    parser.add_argument("--checkpoint", metavar="PATH", help="serve a --checkpoint state instead of reading --input")
+    parser.add_argument("--cache", nargs="?", const="", metavar="PATH", help="read --input through the columnar cache (see compute_dashboard_data.py)")
+    parser.add_argument("--workers", type=int, default=1, help="ingest processes (default: 1)")
+    parser.add_argument("--host", default="127.0.0.1", help="bind address (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8765, help="port (default: 8765)")
+    parser.add_argument("--query-cache", type=int, default=256, metavar="N", help="cached query results (default: 256)")
+    parser.add_argument("--poll", type=float, default=5.0, metavar="SECONDS", help="source change check interval, 0 = off (default: 5)")
+    args = parser.parse_args(argv)
+    if not args.checkpoint:
+        paths = cdd.resolve_inputs(args.input)
+        if args.cache is not None and not cdd.is_plain_input(paths):
+            parser.error("--cache needs --input to be a single uncompressed CSV")
+
+    t0 = time.perf_counter()
+    server = DashboardServer((args.host, args.port), DataSource(args), args.query_cache)
+    dataset = server.dataset
+    print(f"Loaded {dataset.customers} customers from {dataset.source} in {time.perf_counter() - t0:.1f}s")
+    if args.poll > 0:
+        threading.Thread(target=server.watch, args=(args.poll,), daemon=True).start()
+    print(f"Serving on http://{args.host}:{args.port}/ (dashboard: VITE_DATA_URL=http://{args.host}:{args.port}/data)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Keep the scrub state warm and refresh the dashboard JSON whenever the input changes.
+
+    python3 scripts/watch_dashboard_data.py                                   # AR_sample.csv
+    python3 scripts/watch_dashboard_data.py --input 'scrub/part-*.csv.gz' --poll 2
+    cd dashboard && npm run dev                                               # reloads when the JSON changes
+
+--input is a CSV or a glob of parts, as for compute_dashboard_data.py. After a
+full ingest, the input is polled every --poll seconds. A change is acted on once
+it has stayed the same for one poll, i.e. the file is fully written:
+
+- rows appended to the last uncompressed part (in glob order) are ingested
+  from the byte offset reached so far (up to the last complete line) and
+  merged into the state;
+- a new part that sorts after the others is ingested on its own and merged;
+- anything else (rows appended to an earlier part, a part removed, truncated,
+  rewritten or compressed and changed) re-ingests everything.
+
+RUN 1-5 are then finalized from the in-memory state, without re-reading the
+CSV, and only the JSON files whose content changed are swapped into --out-dir
+(each atomically). The Vite dev server (dashboard/vite.config.ts) reloads the
+page when they change.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(__file__))
+import compute_dashboard_data as cdd  # noqa: E402
+
+TAIL_BYTES = 64  # bytes before the offset reached that must be unchanged for an append
+
+class Part:
+    """One input file and how far into it the state has read."""
+
+    def __init__(self, path, signature):
+        self.path = path
+        self.plain = not path.endswith(cdd.COMPRESSED_SUFFIXES)
+        self.signature = signature  # (size, mtime_ns) when last read
+        self.offset = signature[0]
+        self.tail = self.read_tail()
+
+    def read_tail(self):
+        if not self.plain:
+            return None
+        with open(self.path, "rb") as f:
+            f.seek(max(0, self.offset - TAIL_BYTES))
+            return f.read(self.offset - f.tell())
+
+    def appended_range(self, size):
+        """(start, end) of whole lines appended since `offset`, None if the part changed otherwise."""
+        if not self.plain or size < self.offset or self.read_tail() != self.tail or not self.tail.endswith(b"\n"):
+            return None
+        with open(self.path, "rb") as f:
+            end = size
+            while end > self.offset:
+                f.seek(max(self.offset, end - (1 << 20)))
+                block = f.read(end - f.tell())
+                newline = block.rfind(b"\n")
+                if newline >= 0:
+                    return self.offset, end - len(block) + newline + 1
+                end -= len(block)
+        return self.offset, self.offset  # no complete line yet
+
+class Watcher:
+    """The warm CustomerState of an --input and the parts it was built from."""
+
+    def __init__(self, pattern, out_dir, workers=1):
+        self.pattern = pattern
+        self.out_dir = out_dir
+        self.workers = workers
+        self.pending = None
+        self.parts = {}
+        self.stale = True  # the state may not match the parts: re-ingest everything
+
+    def snapshot(self):
+        """{path: (size, mtime_ns)} of the input parts now."""
+        try:
+            paths = cdd.resolve_inputs(self.pattern)
+        except SystemExit:
+            return {}
+        signatures = {}
+        for path in paths:
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            signatures[path] = (st.st_size, st.st_mtime_ns)
+        return signatures
+
+    def rebuild(self):
+        before = self.snapshot()
+        self.state = cdd.ingest_csv(self.pattern, workers=self.workers)
+        after = self.snapshot()
+        self.parts = {path: Part(path, signature) for path, signature in after.items()}
+        # Changed while being read: the state may be off, so read it all again once it settles
+        self.stale = before != after
+        return "full ingest"
+
+    def update(self, signatures):
+        """Bring the state up to date with `signatures` (see snapshot); returns what was done."""
+        if self.stale or set(self.parts) - set(signatures):
+            return self.rebuild()
+        done = []
+        for path, signature in signatures.items():
+            part = self.parts.get(path)
+            if part is None:
+                if path < max(self.parts, default=""):
+                    return self.rebuild()  # keep the state in the order a full run would read
+                self.state.merge(cdd.ingest_part([path]))
+                self.parts[path] = Part(path, signature)
+                self.stale = self.snapshot().get(path) != signature
+                done.append(f"new part {path}")
+                continue
+            if signature == part.signature:
+                continue
+            if path != max(self.parts):
+                return self.rebuild()  # rows merged after a later part would be out of input order
+            span = part.appended_range(signature[0])
+            if span is None:
+                return self.rebuild()
+            start, end = span
+            if end > start:
+                with open(path, "rb") as f:
+                    header = f.readline()
+                self.state.merge(cdd.ingest_range(path, header, start, end))
+                done.append(f"{end - start} bytes appended to {path}")
+            part.signature, part.offset = signature, end
+            part.tail = part.read_tail()
+        return "; ".join(done)
+
+    def publish(self):
+        outputs = cdd.compute_outputs(self.state)
+        return cdd.write_outputs(outputs, self.out_dir, skip_unchanged=True, bundle=True)
+
+    def poll(self):
+        """Act on a change once it has settled; returns (what was done, files written) or None."""
+        signatures = self.snapshot()
+        if not signatures:
+            return None
+        current = None if self.stale else {path: part.signature for path, part in self.parts.items()}
+        if signatures == current or signatures != self.pending:
+            self.pending = None if signatures == current else signatures
+            return None
+        self.pending = None
+        try:
+            done = self.update(signatures)
+        except BaseException:
+            self.stale = True
+            raise
+        return done, self.publish() if done else []
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--input", default=cdd.CSV_PATH, help="tradeline CSV or quoted glob of parts (default: AR_sample.csv)")
+    parser.add_argument("--out-dir", default=cdd.OUT_DIR, help="output directory (default: dashboard/public/data)")
+    parser.add_argument("--workers", type=int, default=1, help="ingest processes for full ingests (default: 1)")
+    parser.add_argument("--poll", type=float, default=1.0, metavar="SECONDS", help="input check interval (default: 1)")
+    args = parser.parse_args(argv)
+
+    watcher = Watcher(args.input, args.out_dir, args.workers)
+    t0 = time.perf_counter()
+    watcher.rebuild()
+    written = watcher.publish()
+    print(f"Loaded {len(watcher.state.tradelines)} customers in {time.perf_counter() - t0:.1f}s, wrote {len(written)} files to {args.out_dir}")
+    print(f"Watching {args.input} every {args.poll:g}s (Ctrl-C to stop)", flush=True)
+    try:
+        while True:
+            time.sleep(args.poll)
+            t0 = time.perf_counter()
+            try:
+                result = watcher.poll()
+            except Exception as e:  # keep the last good JSON; re-ingest everything once the input settles
+                print(f"refresh failed: {e}", file=sys.stderr, flush=True)
+                continue
+            if result is None:
+                continue
+            done, written = result
+            if done:
+                changed = ", ".join(written) or "no changes"
+                print(f"{done}: refreshed in {time.perf_counter() - t0:.1f}s ({changed})", flush=True)
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+"""
+sig2_bin(), the two-significant-digit bins of distributions.json, on ordinary
+and degenerate values.
+
+    python3 -m pytest tests
+"""
+import math
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+import compute_dashboard_data as cdd  # noqa: E402
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        (0, (0, 1)),
+        (99.5, (99, 100)),
+        (100, (100, 110)),
+        (49_999.0, (49_000, 50_000)),
+        (50_000, (50_000, 51_000)),
+        (1_234_567, (1_200_000, 1_300_000)),
+    ],
+)
+def test_sig2_bin(value, expected):
+    assert cdd.sig2_bin(value) == expected
+
+@pytest.mark.parametrize("value", [-1.0, -math.inf, math.nan])
+def test_sig2_bin_clamps_low(value):
+    assert cdd.sig2_bin(value) == (0, 1)
+
+@pytest.mark.parametrize("value", [cdd.SIG2_MAX, 1e300, math.inf])
+def test_sig2_bin_clamps_high(value):
+    assert cdd.sig2_bin(value) == (99 * 10**13, cdd.SIG2_MAX)
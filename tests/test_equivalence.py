@@ -0,0 +1,211 @@
+"""
+Every alternative way of building the dashboard JSON must write the same
+payloads as a plain single-process run over the same book.
+
+    python3 -m pytest tests
+
+A small synthetic book (scripts/generate_synthetic_scrub.py, with its share of
+malformed values) is computed once the plain way; each test then builds it
+another way (process pool, columnar cache, an interrupted and resumed ingest,
+--stream over shuffled rows, a --delta upsert, rows appended under the watcher
+to the last part or an earlier one) and compares every payload. The
+--quality-gate must also reach the same verdict through the cache as on the CSV.
+
+The plain run itself is pinned to golden/: the JSON the original single-file
+script (commit e0dd675) wrote for golden/book.csv.gz, a 2k-row synthetic book.
+"""
+import csv
+import json
+import random
+import subprocess
+import sys
+from datetime import date
+from pathlib import Path
+
+import pytest
+
+SCRIPTS = Path(__file__).resolve().parent.parent / "scripts"
+sys.path.insert(0, str(SCRIPTS))
+import compute_dashboard_data as cdd  # noqa: E402
+import generate_synthetic_scrub  # noqa: E402
+import watch_dashboard_data  # noqa: E402
+
+ROWS = 20_000
+GOLDEN = Path(__file__).resolve().parent / "golden"
+# Added since the golden JSON was written: top-level keys, and data_quality.json
+# table rows after the original ones (blank / unparseable rates per column)
+ADDITIVE_FIELDS = {
+    "behaviour.json": ("recentRepaymentQualityDistribution",),
+    "data_quality.json": ("columnQuality",),
+    "risk.json": ("delinquentStreakDistribution", "worstDpdBucketDistribution"),
+}
+ADDITIVE_TABLE_ROWS = ("OPEN_DT blank / unparseable", "BUREAU_DATE blank / unparseable", "DAYS_PAST_DUE blank / unparseable")
+
+def run(*args):
+    """Run compute_dashboard_data.py with `args`; returns its stdout."""
+    result = subprocess.run(
+        [sys.executable, str(SCRIPTS / "compute_dashboard_data.py"), *map(str, args)], capture_output=True, text=True
+    )
+    assert result.returncode == 0, result.stderr
+    return result.stdout
+
+def read_payloads(out_dir):
+    """{file name: parsed JSON} of the payloads in `out_dir` (not manifest.json or bundle/)."""
+    return {p.name: json.loads(p.read_text()) for p in sorted(Path(out_dir).glob("*.json")) if p.name != "manifest.json"}
+
+def assert_same(out_dir, expected):
+    actual = read_payloads(out_dir)
+    assert sorted(actual) == sorted(expected)
+    for name, payload in expected.items():
+        assert actual[name] == payload, f"{name} differs from the plain run"
+
+def read_rows(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        return next(reader), list(reader)
+
+def write_rows(path, header, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(header)
+        w.writerows(rows)
+
+@pytest.fixture(scope="module")
+def book(tmp_path_factory):
+    path = tmp_path_factory.mktemp("book") / "book.csv"
+    generate_synthetic_scrub.write_csv(path, rows=ROWS, seed=11)
+    return path
+
+@pytest.fixture(scope="module")
+def expected(book, tmp_path_factory):
+    out_dir = tmp_path_factory.mktemp("plain")
+    run("--input", book, "--out-dir", out_dir)
+    return read_payloads(out_dir)
+
+def test_golden(tmp_path):
+    run("--input", GOLDEN / "book.csv.gz", "--out-dir", tmp_path)
+    actual = read_payloads(tmp_path)
+    for path in sorted(GOLDEN.glob("*.json")):
+        payload = actual[path.name]
+        for key in ADDITIVE_FIELDS.get(path.name, ()):
+            del payload[key]
+        if path.name == "data_quality.json":
+            added = payload["table"][-len(ADDITIVE_TABLE_ROWS) :]
+            assert [row["metric"] for row in added] == list(ADDITIVE_TABLE_ROWS)
+            del payload["table"][-len(ADDITIVE_TABLE_ROWS) :]
+        assert payload == json.loads(path.read_text()), f"{path.name} differs from the golden JSON"
+
+def test_workers(book, expected, tmp_path):
+    run("--input", book, "--out-dir", tmp_path, "--workers", 2)
+    assert_same(tmp_path, expected)
+
+def test_cache(book, expected, tmp_path):
+    cache = tmp_path / "book.cache"
+    for out_dir in (tmp_path / "build", tmp_path / "read"):  # the first run writes the cache, the second reads it
+        run("--input", book, "--out-dir", out_dir, "--cache", cache)
+        assert cache.exists()
+        assert_same(out_dir, expected)
+
+@pytest.mark.parametrize(
+    "thresholds",
+    [
+        {},
+        {"anchorNonePct": 10},  # fails on the first check's partial state
+        {"unparseableOpenDtPct": 0.8},  # only clearly over on the whole book
+    ],
+)
+def test_cache_gate_verdict(book, tmp_path, monkeypatch, thresholds):
+    monkeypatch.setattr(cdd, "QUALITY_GATE_MIN_ROWS", 2_000)  # so the small book gets a few running checks
+
+    def verdict(ingest):
+        gate = cdd.QualityGate(dict(cdd.QUALITY_THRESHOLDS, **thresholds), min_rows=2_000, today=date(2025, 1, 1))
+        try:
+            ingest(gate)
+        except cdd.QualityGateAbort as e:
+            return (e.rows, e.failures), gate.history
+        return None, gate.history
+
+    expected = verdict(lambda gate: cdd.ingest_csv(str(book), gate=gate))
+    cache = str(tmp_path / "book.cache")
+    for _ in range(2):  # the first run writes the cache, the second reads it
+        assert verdict(lambda gate: cdd.ingest_cached(str(book), cache, gate=gate)) == expected
+
+def test_resume_after_interrupt(book, expected, tmp_path, monkeypatch):
+    resume = tmp_path / "resume.pkl"
+    save_resume_point = cdd.save_resume_point
+
+    def save_and_die(state, path, source, offset):
+        save_resume_point(state, path, source, offset)
+        raise KeyboardInterrupt  # killed right after the first save
+
+    monkeypatch.setattr(cdd, "save_resume_point", save_and_die)
+    with pytest.raises(KeyboardInterrupt):
+        cdd.ingest_resumable(str(book), str(resume), interval=0, chunk_bytes=64 << 10)
+    assert resume.exists()
+    stdout = run("--input", book, "--out-dir", tmp_path / "out", "--resume", resume)
+    assert "Resumed" in stdout
+    assert not resume.exists()
+    assert_same(tmp_path / "out", expected)
+
+def test_stream_of_shuffled_rows(book, tmp_path):
+    header, rows = read_rows(book)
+    random.Random(5).shuffle(rows)
+    shuffled = tmp_path / "shuffled.csv"
+    write_rows(shuffled, header, rows)
+    run("--input", shuffled, "--out-dir", tmp_path / "plain")
+    expected = read_payloads(tmp_path / "plain")  # types and mixes are listed in the shuffled book's first-seen order
+    run(
+        "--input", shuffled, "--out-dir", tmp_path / "stream",
+        "--stream", "--external-sort", "--sort-chunk-rows", 3000, "--tmp-dir", tmp_path,
+    )  # fmt: skip
+    assert_same(tmp_path / "stream", expected)
+
+def test_delta(book, expected, tmp_path):
+    header, rows = read_rows(book)
+    cid = header.index("CUSTOMER_ID")
+    customers = list(dict.fromkeys(row[cid] for row in rows if row[cid]))
+    changed = set(customers[::7])  # in the base without their last tradeline
+    new = set(customers[3::11]) - changed  # not in the base at all
+    last_row = {row[cid]: i for i, row in enumerate(rows)}
+    base = [row for i, row in enumerate(rows) if row[cid] not in new and not (row[cid] in changed and last_row[row[cid]] == i)]
+    write_rows(tmp_path / "base.csv", header, base)
+    checkpoint = tmp_path / "state.pkl"
+    run("--input", tmp_path / "base.csv", "--out-dir", tmp_path / "base", "--checkpoint", checkpoint)
+    for name, cids in (("changed", changed), ("new", new)):  # the second run replays the first from the checkpoint's log
+        write_rows(tmp_path / f"{name}.csv", header, [row for row in rows if row[cid] in cids])
+        run("--delta", tmp_path / f"{name}.csv", "--checkpoint", checkpoint, "--out-dir", tmp_path / "out")
+    assert_same(tmp_path / "out", expected)
+
+def test_watch_append(book, expected, tmp_path):
+    data = book.read_bytes()
+    cut = data.index(b"\n", len(data) // 2) + 1
+    part = tmp_path / "book.csv"
+    part.write_bytes(data[:cut])
+    watcher = watch_dashboard_data.Watcher(str(part), str(tmp_path / "out"))
+    watcher.rebuild()
+    watcher.publish()
+    with open(part, "ab") as f:
+        f.write(data[cut:])
+    assert watcher.poll() is None  # not acted on until it has settled for one poll
+    done, written = watcher.poll()
+    assert done == f"{len(data) - cut} bytes appended to {part}"
+    assert written
+    assert_same(tmp_path / "out", expected)
+
+def test_watch_append_to_earlier_part(book, expected, tmp_path):
+    data = book.read_bytes()
+    header = data[: data.index(b"\n") + 1]
+    held = data.index(b"\n", len(data) // 3) + 1  # rows from here to `cut` are appended to part 1 later
+    cut = data.index(b"\n", len(data) // 2) + 1
+    part1, part2 = tmp_path / "part-1.csv", tmp_path / "part-2.csv"
+    part1.write_bytes(data[:held])
+    part2.write_bytes(header + data[cut:])
+    watcher = watch_dashboard_data.Watcher(str(tmp_path / "part-*.csv"), str(tmp_path / "out"))
+    watcher.rebuild()
+    watcher.publish()
+    with open(part1, "ab") as f:
+        f.write(data[held:cut])
+    assert watcher.poll() is None
+    done, _ = watcher.poll()
+    assert done == "full ingest"  # merged after part 2, the rows would be out of input order
+    assert_same(tmp_path / "out", expected)